@@ -1,17 +1,19 @@
+import uuid
 from typing import Generator, Optional, Union
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.config import settings
 from app.models.user import User
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.ai.cache import AI_CACHE_BYPASS_HEADER, set_cache_bypass
+from app.core.auth_cache import TokenClaims, UserSnapshot, token_cache, user_cache
+from app.core.passwords import pwd_context
 
 # JWT 令牌验证
 security = HTTPBearer()
@@ -38,27 +40,43 @@ def create_access_token(data: dict, expires_delta: Optional[Union[int, timedelta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode.update({"exp": expire})
+    # jti 用于区分同一用户的不同令牌
+    to_encode.update({"exp": expire, "jti": to_encode.get("jti") or uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
 
-def verify_token(token: str) -> Optional[str]:
-    """验证令牌"""
+def decode_token(token: str) -> Optional[TokenClaims]:
+    """验证令牌签名并返回声明，已验证过的令牌直接从缓存读取"""
+    if settings.auth_cache_enabled:
+        claims = token_cache.get(token)
+        if claims is not None:
+            return claims
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
     except JWTError:
         return None
+    
+    subject = payload.get("sub")
+    if subject is None:
+        return None
+    claims = TokenClaims(subject=subject, token_id=payload.get("jti", ""), expires_at=payload.get("exp", 0))
+    if settings.auth_cache_enabled:
+        token_cache.set(token, claims)
+    return claims
+
+
+def verify_token(token: str) -> Optional[str]:
+    """验证令牌"""
+    claims = decode_token(token)
+    return claims.subject if claims else None
 
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
+) -> UserSnapshot:
     """获取当前用户"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -66,20 +84,37 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    email = verify_token(credentials.credentials)
-    if email is None:
+    claims = decode_token(credentials.credentials)
+    if claims is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
+    snapshot = await get_user_snapshot(db, claims)
+    if snapshot is None:
         raise credentials_exception
+    return snapshot
+
+
+async def get_user_snapshot(db: AsyncSession, claims: TokenClaims) -> Optional[UserSnapshot]:
+    """按令牌声明获取用户快照（优先读取缓存），用户不存在时返回 None"""
+    if settings.auth_cache_enabled:
+        snapshot = user_cache.get(claims.subject, claims.token_id)
+        if snapshot is not None:
+            return snapshot
     
-    return user
+    generation = user_cache.generation
+    user = await db.scalar(select(User).where(User.email == claims.subject))
+    if user is None:
+        return None
+    
+    snapshot = UserSnapshot.from_user(user)
+    if settings.auth_cache_enabled:
+        user_cache.set(claims.subject, claims.token_id, snapshot, generation)
+    return snapshot
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -87,11 +122,18 @@ async def get_current_active_user(
 
 
 async def get_current_superuser(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     """获取当前超级用户"""
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user 
\ No newline at end of file
+    return current_user
+
+
+async def apply_ai_cache_policy(request: HTTPConnection) -> None:
+    """根据请求头决定本次请求是否绕过 AI 响应缓存"""
+    bypass_header = request.headers.get(AI_CACHE_BYPASS_HEADER, "").lower()
+    cache_control = request.headers.get("cache-control", "").lower()
+    set_cache_bypass(bypass_header in ("1", "true") or "no-cache" in cache_control)
@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from app.api.deps import apply_ai_cache_policy
 from .auth import router as auth_router
 from .projects import router as projects_router
 from .chat import router as chat_router
+from .jobs import router as jobs_router
 
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(apply_ai_cache_policy)])
 
 api_router.include_router(auth_router, prefix="/auth", tags=["认证"])
 api_router.include_router(projects_router, prefix="/projects", tags=["项目"])
-api_router.include_router(chat_router, prefix="/chat", tags=["聊天"]) 
\ No newline at end of file
+api_router.include_router(chat_router, prefix="/chat", tags=["聊天"])
+api_router.include_router(jobs_router, prefix="/jobs", tags=["任务"]) 
\ No newline at end of file
@@ -1,20 +1,31 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
-from app.api.deps import get_password_hash, verify_password, create_access_token, get_current_active_user
+from app.api.deps import create_access_token, get_current_active_user
+from app.core.passwords import password_hasher, PasswordHasherBusy
 from app.models.user import User
+from app.core.auth_cache import UserSnapshot
 from app.schemas.user import UserCreate, User as UserSchema, UserLogin, Token
 
 router = APIRouter()
 
 
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post("/register", response_model=UserSchema)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """用户注册"""
     # 检查邮箱是否已存在
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -22,15 +33,18 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # 检查用户名是否已存在
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user.username))
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already taken"
         )
     
-    # 创建新用户
-    hashed_password = get_password_hash(user.password)
+    # 创建新用户（哈希在线程池中计算，不阻塞事件循环）
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise _busy_exception()
     db_user = User(
         email=user.email,
         username=user.username,
@@ -39,17 +53,17 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """用户登录"""
     # 查找用户
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+    user = await db.scalar(select(User).where(User.email == user_credentials.email))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,7 +72,11 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
         )
     
     # 验证密码
-    if not verify_password(user_credentials.password, user.hashed_password):
+    try:
+        password_ok = await password_hasher.verify(user_credentials.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise _busy_exception()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -82,6 +100,6 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserSchema)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: UserSnapshot = Depends(get_current_active_user)):
     """获取当前用户信息"""
     return current_user 
\ No newline at end of file
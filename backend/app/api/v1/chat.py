@@ -1,11 +1,26 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-
-from app.database import get_db
-from app.api.deps import get_current_active_user
-from app.models.user import User
-from app.models.project import Project
+import asyncio
+import base64
+import json
+from datetime import datetime
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, delete, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+import structlog
+
+from app.config import settings
+from app.database import get_db, SessionLocal
+from app.api.deps import decode_token, get_current_active_user, get_user_snapshot
+from app.core.ai.base import BaseAIClient
+from app.core.ai.context import context_window
+from app.core.ai.edits import code_change, propose_edits
+from app.core.ai.summarizer import summarizer, get_summary
+from app.core.storage.files import read_file_content
+from app.core.websocket import ChannelClosed, WebSocketChannel, channels
+from app.core.auth_cache import UserSnapshot
+from app.models.project import Project, ProjectFile
 from app.models.chat import ChatSession, ChatMessage
 from app.schemas.chat import (
     ChatSession as ChatSessionSchema,
@@ -13,25 +28,29 @@ from app.schemas.chat import (
     ChatSessionUpdate,
     ChatMessage as ChatMessageSchema,
     ChatMessageCreate,
+    ChatMessagePage,
     ChatRequest,
+    ChatChannelRequest,
     ChatResponse
 )
 
+logger = structlog.get_logger()
+
 router = APIRouter()
 
 
 @router.post("/sessions", response_model=ChatSessionSchema)
 async def create_chat_session(
     session: ChatSessionCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """创建聊天会话"""
     # 验证项目所有权
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == session.project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -47,8 +66,8 @@ async def create_chat_session(
     )
     
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
+    await db.commit()
+    await db.refresh(db_session)
     
     return db_session
 
@@ -56,18 +75,18 @@ async def create_chat_session(
 @router.get("/sessions", response_model=List[ChatSessionSchema])
 async def get_chat_sessions(
     project_id: int = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """获取聊天会话列表"""
-    query = db.query(ChatSession).filter(ChatSession.user_id == current_user.id)
+    query = select(ChatSession).where(ChatSession.user_id == current_user.id)
     
     if project_id:
         # 验证项目所有权
-        project = db.query(Project).filter(
+        project = await db.scalar(select(Project).where(
             Project.id == project_id,
             Project.owner_id == current_user.id
-        ).first()
+        ))
         
         if not project:
             raise HTTPException(
@@ -75,23 +94,23 @@ async def get_chat_sessions(
                 detail="Project not found"
             )
         
-        query = query.filter(ChatSession.project_id == project_id)
+        query = query.where(ChatSession.project_id == project_id)
     
-    sessions = query.all()
+    sessions = (await db.scalars(query)).all()
     return sessions
 
 
 @router.get("/sessions/{session_id}", response_model=ChatSessionSchema)
 async def get_chat_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """获取特定聊天会话"""
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -106,14 +125,14 @@ async def get_chat_session(
 async def update_chat_session(
     session_id: int,
     session_update: ChatSessionUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """更新聊天会话"""
-    db_session = db.query(ChatSession).filter(
+    db_session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not db_session:
         raise HTTPException(
@@ -126,8 +145,8 @@ async def update_chat_session(
     for field, value in update_data.items():
         setattr(db_session, field, value)
     
-    db.commit()
-    db.refresh(db_session)
+    await db.commit()
+    await db.refresh(db_session)
     
     return db_session
 
@@ -135,14 +154,14 @@ async def update_chat_session(
 @router.delete("/sessions/{session_id}")
 async def delete_chat_session(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """删除聊天会话"""
-    db_session = db.query(ChatSession).filter(
+    db_session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not db_session:
         raise HTTPException(
@@ -150,8 +169,11 @@ async def delete_chat_session(
             detail="Chat session not found"
         )
     
-    db.delete(db_session)
-    db.commit()
+    # 批量删除消息，避免把整个会话的消息加载到内存
+    await db.execute(delete(ChatMessage).where(ChatMessage.session_id == session_id))
+    await db.delete(db_session)
+    await db.commit()
+    context_window.invalidate(session_id)
     
     return {"message": "Chat session deleted successfully"}
 
@@ -159,15 +181,15 @@ async def delete_chat_session(
 @router.post("/messages", response_model=ChatMessageSchema)
 async def create_chat_message(
     message: ChatMessageCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """创建聊天消息"""
     # 验证会话所有权
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).where(
         ChatSession.id == message.session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -179,28 +201,49 @@ async def create_chat_message(
         session_id=message.session_id,
         role=message.role,
         content=message.content,
-        metadata=message.metadata
+        message_metadata=message.metadata
     )
     
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    await db.refresh(db_message)
     
     return db_message
 
 
-@router.get("/sessions/{session_id}/messages", response_model=List[ChatMessageSchema])
+def _encode_cursor(message: ChatMessage) -> str:
+    """把消息的 (created_at, id) 编码为不透明游标"""
+    raw = json.dumps({"t": message.created_at.isoformat(), "id": message.id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), int(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("/sessions/{session_id}/messages", response_model=ChatMessagePage)
 async def get_chat_messages(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    cursor: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
-    """获取聊天消息列表"""
+    """获取聊天消息列表（按时间正序的游标分页）"""
     # 验证会话所有权
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     
     if not session:
         raise HTTPException(
@@ -208,28 +251,39 @@ async def get_chat_messages(
             detail="Chat session not found"
         )
     
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.created_at).all()
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if cursor:
+        created_at, message_id = _decode_cursor(cursor)
+        query = query.where(or_(
+            ChatMessage.created_at > created_at,
+            and_(ChatMessage.created_at == created_at, ChatMessage.id > message_id)
+        ))
     
-    return messages
+    # 多取一条用于判断是否还有下一页
+    messages = (await db.scalars(
+        query.order_by(ChatMessage.created_at, ChatMessage.id).limit(limit + 1)
+    )).all()
+    
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = _encode_cursor(messages[-1])
+    
+    return ChatMessagePage(items=messages, next_cursor=next_cursor)
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_with_ai(
+async def _get_or_create_chat_session(
+    db: AsyncSession,
     chat_request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """与 AI 聊天"""
-    from app.core.ai.factory import AIClientFactory
-    
+    current_user: UserSnapshot
+) -> ChatSession:
+    """获取或创建 AI 聊天所用的会话"""
     if chat_request.session_id:
         # 验证会话所有权
-        session = db.query(ChatSession).filter(
+        session = await db.scalar(select(ChatSession).where(
             ChatSession.id == chat_request.session_id,
             ChatSession.user_id == current_user.id
-        ).first()
+        ))
         
         if not session:
             raise HTTPException(
@@ -244,34 +298,161 @@ async def chat_with_ai(
             title="新对话"
         )
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
     
-    # 获取聊天历史
-    history = []
-    if chat_request.session_id:
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session.id
-        ).order_by(ChatMessage.created_at).limit(10).all()
-        
-        for msg in messages:
-            history.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+    return session
+
+
+async def _get_chat_history(db: AsyncSession, chat_request: ChatRequest, session: ChatSession) -> List[Dict[str, str]]:
+    """获取聊天历史：会话摘要 + 摘要之后的最近消息（按 token 预算截断）"""
+    if not chat_request.session_id:
+        return []
+    
+    summary, summary_upto_id = get_summary(session)
+    history = await context_window.get_history(db, session.id, after_id=summary_upto_id)
+    if summary:
+        history.insert(0, {"role": "system", "content": summary})
+    return history
+
+
+async def _get_edit_target(
+    db: AsyncSession,
+    chat_request: ChatRequest,
+    session: ChatSession
+) -> Optional[Tuple[int, int, str, int, str]]:
+    """context 中指定要修改的文件（须属于会话所属项目），返回 (项目 id, 文件 id, 路径, 版本, 当前内容)"""
+    file_id = (chat_request.context or {}).get("file_id")
+    if file_id is None:
+        return None
+    
+    db_file = await db.scalar(select(ProjectFile).where(
+        ProjectFile.id == file_id,
+        ProjectFile.project_id == session.project_id
+    ))
+    
+    if not db_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    content = await read_file_content(db_file) or ""
+    return session.project_id, db_file.id, db_file.file_path, db_file.version, content
+
+
+async def _propose_code_changes(
+    ai_client: BaseAIClient,
+    target: Optional[Tuple[int, int, str, int, str]],
+    message: str
+) -> List[Dict[str, Any]]:
+    """按消息修改目标文件，返回 code_changes（不写入文件）；修改失败时为空"""
+    if target is None:
+        return []
+    project_id, file_id, file_path, version, content = target
+    try:
+        _, hunks = await propose_edits(ai_client, content, message, file_path, project_id)
+    except Exception as e:
+        # 修改失败不影响聊天回复
+        logger.warning("Chat code edit failed", file_id=file_id, error=str(e))
+        return []
+    return [code_change(file_id, file_path, version, hunks)] if hunks else []
+
+
+async def _chat_turn(
+    session_id: int,
+    message: str,
+    history: List[Dict[str, str]],
+    target: Optional[Tuple[int, int, str, int, str]]
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """流式生成一轮回复（用户消息须已提交），逐步产出 (事件名, 数据)
+    
+    事件：token（多次）、生成失败时 error、指定了文件时 code_changes（修改片段与回复并行生成，
+    生成后立即产出）、最后 done（已保存的 AI 消息）。调用方提前停止时取消修改片段的生成，不保存回复。
+    """
+    from app.core.ai.factory import AIClientFactory
+    
+    chunks = []
+    edits: Optional[asyncio.Task] = None
+    code_changes: Optional[List[Dict[str, Any]]] = None
+    try:
+        ai_client = AIClientFactory.get_default_client()
+        edits = asyncio.create_task(_propose_code_changes(ai_client, target, message))
+        async for chunk in ai_client.stream_chat(message, history):
+            chunks.append(chunk)
+            yield "token", {"delta": chunk}
+            if code_changes is None and edits.done():
+                code_changes = edits.result()
+                if code_changes:
+                    yield "code_changes", {"code_changes": code_changes}
+    except Exception as e:
+        error = f"AI 响应生成失败：{str(e)}"
+        chunks.append(error)
+        yield "error", {"detail": error}
+    except BaseException:
+        # 客户端断开或取消时不再生成修改片段
+        if edits is not None:
+            edits.cancel()
+        raise
+    if code_changes is None:
+        code_changes = await edits if edits is not None else []
+        if code_changes:
+            yield "code_changes", {"code_changes": code_changes}
+    
+    # 流结束后再保存完整的 AI 消息
+    async with SessionLocal() as stream_db:
+        ai_message = ChatMessage(
+            session_id=session_id,
+            role="assistant",
+            content="".join(chunks)
+        )
+        stream_db.add(ai_message)
+        await stream_db.commit()
+        await stream_db.refresh(ai_message)
+    summarizer.schedule(session_id)
     
-    # 保存用户消息
+    yield "done", {
+        "message": ChatMessageSchema.model_validate(ai_message).model_dump(mode="json"),
+        "session_id": session_id,
+        "code_changes": code_changes
+    }
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化 Server-Sent Events 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_ai(
+    chat_request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """与 AI 聊天"""
+    from app.core.ai.factory import AIClientFactory
+    
+    session = await _get_or_create_chat_session(db, chat_request, current_user)
+    history = await _get_chat_history(db, chat_request, session)
+    target = await _get_edit_target(db, chat_request, session)
+    
+    # 先提交用户消息，生成回复与修改片段期间不占用数据库连接
     user_message = ChatMessage(
         session_id=session.id,
         role="user",
         content=chat_request.message
     )
     db.add(user_message)
+    await db.commit()
     
+    code_changes: List[Dict[str, Any]] = []
     try:
-        # 使用 AI 客户端生成响应
+        # 使用 AI 客户端生成响应，指定了文件时同时生成修改片段
         ai_client = AIClientFactory.get_default_client()
-        ai_response = await ai_client.chat(chat_request.message, history)
+        ai_response, code_changes = await asyncio.gather(
+            ai_client.chat(chat_request.message, history),
+            _propose_code_changes(ai_client, target, chat_request.message)
+        )
     except Exception as e:
         ai_response = f"AI 响应生成失败：{str(e)}"
     
@@ -283,12 +464,208 @@ async def chat_with_ai(
     )
     db.add(ai_message)
     
-    db.commit()
-    db.refresh(ai_message)
+    await db.commit()
+    await db.refresh(ai_message)
+    summarizer.schedule(session.id)
     
     return ChatResponse(
         message=ai_message,
         session_id=session.id,
         suggestions=["您可以尝试...", "我建议..."],
-        code_changes=[]
-    ) 
\ No newline at end of file
+        code_changes=code_changes
+    )
+
+
+@router.post("/chat/stream")
+async def stream_chat_with_ai(
+    chat_request: ChatRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """与 AI 聊天（Server-Sent Events 流式响应）
+    
+    事件顺序：session -> token（多次）-> done；生成失败时发送 error。
+    指定了文件时修改片段与回复并行生成，生成后发送 code_changes，并随 done 事件的 code_changes 返回。
+    """
+    session = await _get_or_create_chat_session(db, chat_request, current_user)
+    session_id = session.id
+    history = await _get_chat_history(db, chat_request, session)
+    target = await _get_edit_target(db, chat_request, session)
+    
+    # 先提交用户消息，流式生成期间不占用数据库连接
+    user_message = ChatMessage(
+        session_id=session_id,
+        role="user",
+        content=chat_request.message
+    )
+    db.add(user_message)
+    await db.commit()
+    
+    async def event_stream() -> AsyncIterator[str]:
+        yield _sse_event("session", {"session_id": session_id})
+        async for event, data in _chat_turn(session_id, chat_request.message, history, target):
+            yield _sse_event(event, data)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+async def _run_channel_turn(
+    channel: WebSocketChannel,
+    current_user: UserSnapshot,
+    chat_request: ChatChannelRequest
+) -> None:
+    """在 WebSocket 连接上进行一轮对话，事件帧带有 request_id 与 session_id"""
+    frame: Dict[str, Any] = {"request_id": chat_request.request_id, "session_id": chat_request.session_id}
+    session_id: Optional[int] = None
+    try:
+        async with SessionLocal() as db:
+            session = await _get_or_create_chat_session(db, chat_request, current_user)
+            if not channels.claim_session(session.id):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Chat session is busy"
+                )
+            session_id = session.id
+            frame["session_id"] = session_id
+            
+            history = await _get_chat_history(db, chat_request, session)
+            target = await _get_edit_target(db, chat_request, session)
+            db.add(ChatMessage(
+                session_id=session_id,
+                role="user",
+                content=chat_request.message
+            ))
+            await db.commit()
+        
+        await channel.send({"type": "session", **frame})
+        async for event, data in _chat_turn(session_id, chat_request.message, history, target):
+            await channel.send({"type": event, **frame, **data})
+    except HTTPException as e:
+        await channel.send({"type": "error", **frame, "detail": e.detail})
+    except ChannelClosed:
+        pass
+    except asyncio.CancelledError:
+        channel.try_send({"type": "cancelled", **frame})
+        raise
+    except Exception as e:
+        # 不影响同一连接上的其他会话
+        logger.error("Chat channel turn failed", request_id=chat_request.request_id, error=str(e))
+        channel.try_send({"type": "error", **frame, "detail": "Chat request failed"})
+    finally:
+        if session_id is not None:
+            channels.release_session(session_id)
+
+
+def _handle_channel_frame(channel: WebSocketChannel, current_user: UserSnapshot, text: str) -> None:
+    """处理客户端发来的一帧
+    
+    在读取循环中执行，回复（pong 与错误）用 try_send 排队：客户端不读取导致队列已满时丢弃回复，
+    不阻塞读取（否则连 cancel 与连接关闭都无法处理）。
+    """
+    try:
+        frame = json.loads(text)
+        kind = frame.get("type")
+    except (ValueError, AttributeError):
+        channel.try_send({"type": "error", "detail": "Invalid frame"})
+        return
+    
+    if kind == "ping":
+        channel.try_send({"type": "pong"})
+    elif kind == "pong":
+        pass
+    elif kind == "cancel":
+        request_id = str(frame.get("request_id"))
+        if not channel.cancel(request_id):
+            channel.try_send({"type": "error", "request_id": request_id, "detail": "Request not found"})
+    elif kind == "chat":
+        try:
+            chat_request = ChatChannelRequest.model_validate(frame)
+        except ValidationError as e:
+            channel.try_send({
+                "type": "error",
+                "request_id": frame.get("request_id"),
+                "detail": e.errors(include_url=False, include_context=False)
+            })
+            return
+        if channel.has_task(chat_request.request_id):
+            detail = "Duplicate request_id"
+        elif chat_request.session_id is not None and channels.session_busy(chat_request.session_id):
+            detail = "Chat session is busy"
+        elif channel.active >= settings.chat_ws_max_active_turns:
+            detail = "Too many active requests"
+        else:
+            channel.spawn(
+                chat_request.request_id,
+                _run_channel_turn(channel, current_user, chat_request)
+            )
+            return
+        channel.try_send({
+            "type": "error",
+            "request_id": chat_request.request_id,
+            "session_id": chat_request.session_id,
+            "detail": detail
+        })
+    else:
+        channel.try_send({"type": "error", "detail": f"Unknown frame type: {kind}"})
+
+
+@router.websocket("/ws")
+async def chat_channel(websocket: WebSocket):
+    """聊天 WebSocket：连接时认证一次，在一个连接上同时进行多个会话的流式对话
+    
+    客户端帧（JSON 文本）：
+    - {"type": "auth", "token": "..."}：连接后的第一帧，超时或令牌无效时以 1008 关闭连接
+    - {"type": "chat", "request_id": "...", "session_id": 1, "message": "...", "context": {...}}：
+      开始一轮对话（字段同 /chat/stream），不同会话可以同时进行，同一会话同时只能有一轮（包括其他连接上的）
+    - {"type": "cancel", "request_id": "..."}：取消进行中的一轮，不保存回复
+    - {"type": "ping"} / {"type": "pong"}：心跳，任何帧都会刷新连接的活跃时间
+    
+    服务端帧：认证成功后 ready；每轮对话依次为 session、token（多次）、code_changes、done，
+    失败时为 error，取消时为 cancelled，这些帧带有 request_id 与 session_id；另有心跳 ping 与 pong。
+    客户端读取慢时服务端暂停生成，积压的 token 帧合并发送；发送队列已满时对客户端帧的回复（pong 与错误）被丢弃。
+    """
+    await websocket.accept()
+    try:
+        auth = json.loads(await asyncio.wait_for(websocket.receive_text(), settings.chat_ws_auth_timeout))
+        token = auth.get("token") if isinstance(auth, dict) and auth.get("type") == "auth" else None
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError, KeyError):
+        token = None
+    claims = decode_token(token) if isinstance(token, str) else None
+    current_user = None
+    if claims is not None:
+        async with SessionLocal() as db:
+            current_user = await get_user_snapshot(db, claims)
+    if current_user is None or not current_user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    
+    channel = WebSocketChannel(websocket, expires_at=claims.expires_at)
+    channels.add(channel)
+    try:
+        await channel.send({"type": "ready", "user_id": current_user.id})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            channel.touch()
+            text = message.get("text")
+            if text is None:
+                text = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+            if len(text) > settings.chat_ws_max_frame_size:
+                channel.try_send({"type": "error", "detail": "Frame too large"})
+                continue
+            _handle_channel_frame(channel, current_user, text)
+    except ChannelClosed:
+        pass
+    finally:
+        channels.discard(channel)
+        await channel.close()
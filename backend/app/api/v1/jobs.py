@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db, SessionLocal
+from app.api.deps import get_current_active_user
+from app.core.auth_cache import UserSnapshot
+from app.models.project import Project
+from app.models.job import Job
+from app.schemas.job import Job as JobSchema, JobCreate
+from app.core.jobs.handlers import REQUIRED_PAYLOAD_FIELDS
+from app.core.jobs.queue import job_queue, FINISHED_STATUSES
+
+router = APIRouter()
+
+
+@router.post("/", response_model=JobSchema, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    job: JobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """提交后台任务，立即返回任务 id"""
+    missing = [name for name in REQUIRED_PAYLOAD_FIELDS[job.kind] if not job.payload.get(name)]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Missing payload fields: {', '.join(missing)}"
+        )
+    
+    # 任务中引用的项目必须属于当前用户
+    project_id = job.payload.get("project_id")
+    if project_id is not None:
+        project = await db.scalar(select(Project.id).where(
+            Project.id == project_id,
+            Project.owner_id == current_user.id
+        ))
+        if project is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+    
+    try:
+        db_job = await job_queue.submit(db, current_user.id, job.kind, job.payload, job.priority)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    
+    return db_job
+
+
+@router.get("/{job_id}", response_model=JobSchema)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=30, description="任务未结束时最多等待的秒数（长轮询）"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """获取任务状态与结果"""
+    job = await db.scalar(select(Job).where(
+        Job.id == job_id,
+        Job.user_id == current_user.id
+    ))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    if wait > 0 and job.status not in FINISHED_STATUSES:
+        # 等待期间不占用数据库连接，结束后用新的会话重新读取
+        await db.close()
+        await job_queue.wait(job_id, wait)
+        async with SessionLocal() as fresh_db:
+            job = await fresh_db.get(Job, job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+    
+    return job
@@ -1,19 +1,58 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import mimetypes
+import os
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.config import settings
+from app.database import SessionLocal, get_db
 from app.api.deps import get_current_active_user
-from app.models.user import User
-from app.models.project import Project, ProjectFile
+from app.core.auth_cache import UserSnapshot
+from app.models.project import Project, ProjectFile, ProjectFileVersion
+from app.models.chat import ChatSession, ChatMessage
 from app.schemas.project import (
     Project as ProjectSchema,
     ProjectCreate,
     ProjectUpdate,
     ProjectFile as ProjectFileSchema,
     ProjectFileCreate,
-    ProjectFileUpdate
+    ProjectFileUpdate,
+    ProjectFileVersion as ProjectFileVersionSchema,
+    ProjectImportResult,
+    ProjectFileBatch,
+    ProjectFileOperationResult,
+    ProjectFileEdit,
+    ProjectFilePatch,
+    ProjectFileEditResult,
+    ProjectGenerate,
+    ProjectSearchResult
 )
+from app.core.storage.archive import (
+    ARCHIVE_MEDIA_TYPES,
+    ArchiveError,
+    export_project_archive,
+    import_project_archive
+)
+from app.core.storage.blobs import blob_store
+from app.core.storage.files import (
+    FileOperation,
+    apply_file_operations,
+    list_file_versions,
+    read_file_content,
+    read_file_version,
+    write_file_content
+)
+from app.core.ai.edits import CodeEditError, code_change, propose_edits
+from app.core.ai.pipeline import GenerationError, generate_project_files
+from app.core.ai.retrieval import code_retriever
+from app.core.storage.patch import AppliedHunk, DiffFormatError, EditHunk, PatchError, apply_hunks, parse_unified_diff
+from app.core.storage.search import SEARCH_AVAILABLE, SearchQueryError, remove_project, search_files
 
 router = APIRouter()
 
@@ -21,8 +60,8 @@ router = APIRouter()
 @router.post("/", response_model=ProjectSchema)
 async def create_project(
     project: ProjectCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """创建新项目"""
     db_project = Project(
@@ -34,8 +73,8 @@ async def create_project(
     )
     
     db.add(db_project)
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     
     return db_project
 
@@ -44,13 +83,15 @@ async def create_project(
 async def get_projects(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """获取用户的项目列表"""
-    projects = db.query(Project).filter(
-        Project.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
+    projects = (await db.scalars(
+        select(Project).where(
+            Project.owner_id == current_user.id
+        ).offset(skip).limit(limit)
+    )).all()
     
     return projects
 
@@ -58,14 +99,14 @@ async def get_projects(
 @router.get("/{project_id}", response_model=ProjectSchema)
 async def get_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """获取特定项目"""
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -80,14 +121,14 @@ async def get_project(
 async def update_project(
     project_id: int,
     project_update: ProjectUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """更新项目"""
-    db_project = db.query(Project).filter(
+    db_project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not db_project:
         raise HTTPException(
@@ -103,8 +144,8 @@ async def update_project(
         else:
             setattr(db_project, field, value)
     
-    db.commit()
-    db.refresh(db_project)
+    await db.commit()
+    await db.refresh(db_project)
     
     return db_project
 
@@ -112,14 +153,14 @@ async def update_project(
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """删除项目"""
-    db_project = db.query(Project).filter(
+    db_project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not db_project:
         raise HTTPException(
@@ -127,26 +168,85 @@ async def delete_project(
             detail="Project not found"
         )
     
-    db.delete(db_project)
-    db.commit()
+    # 会话消息与文件版本不随父对象加载，先批量删除
+    await db.execute(delete(ChatMessage).where(
+        ChatMessage.session_id.in_(
+            select(ChatSession.id).where(ChatSession.project_id == project_id)
+        )
+    ))
+    await db.execute(delete(ProjectFileVersion).where(
+        ProjectFileVersion.file_id.in_(
+            select(ProjectFile.id).where(ProjectFile.project_id == project_id)
+        )
+    ))
+    await remove_project(db, project_id)
+    await db.delete(db_project)
+    await db.commit()
+    code_retriever.invalidate(project_id)
     
     return {"message": "Project deleted successfully"}
 
 
 # 项目文件相关路由
+def _check_file_size(content: Optional[str]) -> None:
+    if content is not None and len(content.encode("utf-8")) > settings.max_file_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="File too large"
+        )
+
+
+def _file_response(db_file: ProjectFile, content: Optional[str]) -> ProjectFileSchema:
+    return ProjectFileSchema.model_validate(db_file).model_copy(update={"content": content})
+
+
+async def _get_project_file(
+    db: AsyncSession,
+    project_id: int,
+    file_id: int,
+    current_user: UserSnapshot
+) -> ProjectFile:
+    """验证项目所有权并查找文件"""
+    project = await db.scalar(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    db_file = await db.scalar(select(ProjectFile).where(
+        ProjectFile.id == file_id,
+        ProjectFile.project_id == project_id
+    ))
+    
+    if not db_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+    
+    return db_file
+
+
 @router.post("/{project_id}/files", response_model=ProjectFileSchema)
 async def create_project_file(
     project_id: int,
     file: ProjectFileCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """创建项目文件"""
+    _check_file_size(file.content)
+    
     # 验证项目所有权
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -158,30 +258,38 @@ async def create_project_file(
         project_id=project_id,
         file_path=file.file_path,
         file_name=file.file_name,
-        content=file.content,
         file_type=file.file_type,
         language=file.language
     )
     
     db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
+    try:
+        if file.content is not None:
+            await write_file_content(db, db_file, file.content)
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File already exists"
+        )
+    await db.refresh(db_file)
     
-    return db_file
+    return _file_response(db_file, file.content)
 
 
 @router.get("/{project_id}/files", response_model=List[ProjectFileSchema])
 async def get_project_files(
     project_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    include_content: bool = Query(False, description="是否同时返回文件内容"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
-    """获取项目文件列表"""
+    """获取项目文件列表（默认只返回元数据）"""
     # 验证项目所有权
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -189,27 +297,41 @@ async def get_project_files(
             detail="Project not found"
         )
     
-    files = db.query(ProjectFile).filter(
-        ProjectFile.project_id == project_id
-    ).all()
+    files = (await db.scalars(
+        select(ProjectFile).where(
+            ProjectFile.project_id == project_id
+        )
+    )).all()
+    
+    if not include_content:
+        return files
     
-    return files
+    contents = await asyncio.gather(*(read_file_content(f) for f in files))
+    return [_file_response(f, content) for f, content in zip(files, contents)]
 
 
-@router.put("/{project_id}/files/{file_id}", response_model=ProjectFileSchema)
-async def update_project_file(
+@router.post("/{project_id}/files/batch", response_model=List[ProjectFileOperationResult])
+async def batch_project_files(
     project_id: int,
-    file_id: int,
-    file_update: ProjectFileUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    batch: ProjectFileBatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
-    """更新项目文件"""
+    """按路径批量创建、更新、删除项目文件，在一个事务中完成并返回每个文件的结果"""
+    paths = [op.file_path for op in batch.operations]
+    if len(set(paths)) != len(paths):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Duplicate file_path in operations"
+        )
+    for op in batch.operations:
+        _check_file_size(op.content)
+    
     # 验证项目所有权
-    project = db.query(Project).filter(
+    project = await db.scalar(select(Project).where(
         Project.id == project_id,
         Project.owner_id == current_user.id
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(
@@ -217,33 +339,417 @@ async def update_project_file(
             detail="Project not found"
         )
     
-    # 查找文件
-    db_file = db.query(ProjectFile).filter(
-        ProjectFile.id == file_id,
-        ProjectFile.project_id == project_id
-    ).first()
+    try:
+        results = await apply_file_operations(
+            db, project_id, [FileOperation(**op.dict()) for op in batch.operations]
+        )
+        await db.commit()
+    except IntegrityError:
+        # 并发请求同时创建了相同路径的文件
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Files were modified concurrently"
+        )
     
-    if not db_file:
+    return results
+
+
+@router.get("/{project_id}/search", response_model=List[ProjectSearchResult])
+async def search_project_files(
+    project_id: int,
+    q: str = Query(..., min_length=1, max_length=500, description="搜索词，空白分隔的词需全部命中，双引号内为短语"),
+    language: Optional[str] = Query(None, description="按文件语言过滤"),
+    path: Optional[str] = Query(None, max_length=500, description="路径 GLOB 模式，如 src/*.tsx"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """全文搜索项目文件，返回按相关度排序的文件与高亮片段"""
+    if not SEARCH_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search is not available"
+        )
+    
+    # 验证项目所有权
+    project = await db.scalar(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    
+    if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found"
+            detail="Project not found"
         )
     
+    try:
+        return await search_files(db, project_id, q, language=language, path=path, limit=limit, offset=offset)
+    except SearchQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/{project_id}/files/{file_id}", response_model=ProjectFileSchema)
+async def get_project_file(
+    project_id: int,
+    file_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """获取项目文件及其内容"""
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    return _file_response(db_file, await read_file_content(db_file))
+
+
+@router.get("/{project_id}/files/{file_id}/raw")
+async def download_project_file(
+    project_id: int,
+    file_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """流式下载文件内容，以内容哈希作为 ETag"""
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    
+    if db_file.content_hash is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    
+    etag = f'"{db_file.content_hash}"'
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    return StreamingResponse(
+        blob_store.stream(db_file.content_hash),
+        media_type=mimetypes.guess_type(db_file.file_name)[0] or "text/plain",
+        headers={"ETag": etag, "Content-Length": str(db_file.size)}
+    )
+
+
+@router.put("/{project_id}/files/{file_id}", response_model=ProjectFileSchema)
+async def update_project_file(
+    project_id: int,
+    file_id: int,
+    file_update: ProjectFileUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """更新项目文件，内容变化时追加新版本"""
+    _check_file_size(file_update.content)
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    
     # 更新字段
     update_data = file_update.dict(exclude_unset=True)
+    content = update_data.pop("content", None)
     for field, value in update_data.items():
         setattr(db_file, field, value)
+    if content is not None:
+        await write_file_content(db, db_file, content)
     
-    db.commit()
-    db.refresh(db_file)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 同一文件的并发更新争用同一个版本号
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File was modified concurrently"
+        )
+    await db.refresh(db_file)
+    
+    if content is None:
+        content = await read_file_content(db_file)
+    return _file_response(db_file, content)
+
+
+async def _save_edit(
+    db_file: ProjectFile,
+    content: str,
+    hunks: List[AppliedHunk],
+    apply: bool = True
+) -> ProjectFileEditResult:
+    """在新的会话中写入修改后的内容（apply 为 false 时不写入）并返回修改结果
     
-    return db_file 
+    db_file 为读取原内容时的文件记录，请求的会话可以已经关闭；文件在此期间被修改时返回 409，不覆盖别人的修改。
+    """
+    base_version = db_file.version
+    _check_file_size(content)
+    applied = apply and bool(hunks)
+    if applied:
+        async with SessionLocal() as db:
+            current = await db.get(ProjectFile, db_file.id)
+            if current is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="File not found"
+                )
+            if current.version != base_version:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="File was modified concurrently"
+                )
+            await write_file_content(db, current, content)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # 同一文件的并发更新争用同一个版本号
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="File was modified concurrently"
+                )
+            await db.refresh(current)
+        db_file = current
+    else:
+        content = await read_file_content(db_file)
+    
+    return ProjectFileEditResult(
+        file=_file_response(db_file, content),
+        applied=applied,
+        code_changes=[code_change(db_file.id, db_file.file_path, base_version, hunks)]
+    )
+
+
+@router.post("/{project_id}/files/{file_id}/edit", response_model=ProjectFileEditResult)
+async def edit_project_file(
+    project_id: int,
+    file_id: int,
+    edit: ProjectFileEdit,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """按要求修改文件：模型只返回修改片段，在服务端校验并应用，内容变化时追加新版本"""
+    from app.core.ai.factory import AIClientFactory
+    
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    content = await read_file_content(db_file) or ""
+    # 模型生成修改（可能重新请求）期间不占用数据库连接，写入时使用新的会话并检查版本
+    await db.close()
+    
+    try:
+        ai_client = AIClientFactory.get_default_client()
+        new_content, hunks = await propose_edits(ai_client, content, edit.instruction, db_file.file_path, project_id)
+    except CodeEditError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=str(e)
+        )
+    
+    return await _save_edit(db_file, new_content, hunks, edit.apply)
+
+
+@router.post("/{project_id}/files/{file_id}/patch", response_model=ProjectFileEditResult)
+async def patch_project_file(
+    project_id: int,
+    file_id: int,
+    patch: ProjectFilePatch,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """把修改片段或统一差异格式应用到文件当前内容上，任何片段无法定位时整个补丁不应用"""
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    content = await read_file_content(db_file) or ""
+    
+    try:
+        if patch.diff is not None:
+            edits = parse_unified_diff(patch.diff)
+        else:
+            edits = [EditHunk(hunk.search, hunk.replace) for hunk in patch.hunks]
+        new_content, hunks = await asyncio.to_thread(apply_hunks, content, edits)
+    except DiffFormatError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except PatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    
+    return await _save_edit(db_file, new_content, hunks)
+
+
+@router.get("/{project_id}/files/{file_id}/versions", response_model=List[ProjectFileVersionSchema])
+async def get_project_file_versions(
+    project_id: int,
+    file_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """获取文件的版本历史（不含内容）"""
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    return await list_file_versions(db, db_file.id)
+
+
+@router.get("/{project_id}/files/{file_id}/versions/{version}", response_model=ProjectFileVersionSchema)
+async def get_project_file_version(
+    project_id: int,
+    file_id: int,
+    version: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """获取文件某个历史版本的内容"""
+    db_file = await _get_project_file(db, project_id, file_id, current_user)
+    
+    record = await db.scalar(select(ProjectFileVersion).where(
+        ProjectFileVersion.file_id == db_file.id,
+        ProjectFileVersion.version == version
+    ))
+    
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Version not found"
+        )
+    
+    content = await read_file_version(db, db_file, version)
+    return ProjectFileVersionSchema.model_validate(record).model_copy(update={"content": content})
+
+
+@router.get("/{project_id}/export")
+async def export_project(
+    project_id: int,
+    archive_format: Literal["zip", "tar.gz"] = Query("zip", alias="format"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """以 zip 或 tar.gz 流式下载项目的全部文件"""
+    project = await db.scalar(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    filename = f"{project.name}.{archive_format}"
+    # 导出过程使用自己的数据库会话，请求的会话在流式响应结束前不再使用，先释放连接
+    await db.close()
+    return StreamingResponse(
+        export_project_archive(project_id, archive_format),
+        media_type=ARCHIVE_MEDIA_TYPES[archive_format],
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=\"project-{project_id}.{archive_format}\"; "
+                f"filename*=UTF-8''{quote(filename)}"
+            )
+        }
+    )
+
+
+def _upload_size(upload: UploadFile) -> int:
+    """上传文件的大小；请求中没有给出大小时按已接收（暂存）的字节数计算"""
+    if upload.size is not None:
+        return upload.size
+    upload.file.seek(0, os.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(0)
+    return size
+
+
+@router.post("/{project_id}/import", response_model=ProjectImportResult)
+async def import_project(
+    project_id: int,
+    archive: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """从 zip 或 tar 归档导入文件，按路径创建或更新项目文件"""
+    project = await db.scalar(select(Project).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    if _upload_size(archive) > settings.project_archive_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Archive too large"
+        )
+    
+    try:
+        result = await import_project_archive(db, project_id, archive.file)
+    except ArchiveError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return result
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """格式化 Server-Sent Events 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/{project_id}/generate")
+async def generate_project(
+    project_id: int,
+    request: Optional[ProjectGenerate] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """按文件依赖关系并发生成项目文件并写入项目（Server-Sent Events 流式进度）
+    
+    事件顺序：analysis -> plan -> 每个文件的 file_started 与 file_generated / file_failed / file_skipped -> done；
+    分析或规划失败时发送 error。
+    """
+    from app.core.ai.factory import AIClientFactory
+    
+    project = await db.scalar(select(Project.id).where(
+        Project.id == project_id,
+        Project.owner_id == current_user.id
+    ))
+    
+    if project is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+    
+    request = request or ProjectGenerate()
+    # 生成过程使用自己的数据库会话，请求的会话在流式响应结束前不再使用，先释放连接
+    await db.close()
+    
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            ai_client = AIClientFactory.get_default_client()
+            async for event, data in generate_project_files(
+                ai_client, project_id, request.prompt, request.concurrency
+            ):
+                yield _sse_event(event, data)
+        except GenerationError as e:
+            yield _sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"项目生成失败：{str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @router.post("/analyze")
 async def analyze_project_requirements(
     request: dict,
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """分析项目需求"""
     from app.core.ai.factory import AIClientFactory
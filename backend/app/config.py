@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -13,11 +13,30 @@ class Settings(BaseSettings):
     
     # 数据库配置
     database_url: str = Field(default="sqlite:///./kidvibe.db", env="DATABASE_URL")
+    # 服务器数据库连接池
+    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, env="DB_MAX_OVERFLOW")
+    db_pool_pre_ping: bool = Field(default=True, env="DB_POOL_PRE_PING")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")  # 秒
+    # SQLite PRAGMA（WAL 模式下读写互不阻塞）
+    sqlite_journal_mode: str = Field(default="WAL", env="SQLITE_JOURNAL_MODE")
+    sqlite_synchronous: str = Field(default="NORMAL", env="SQLITE_SYNCHRONOUS")
+    sqlite_mmap_size: int = Field(default=256 * 1024 * 1024, env="SQLITE_MMAP_SIZE")  # 字节
+    sqlite_cache_size: int = Field(default=-64000, env="SQLITE_CACHE_SIZE")  # 负数表示 KiB
+    sqlite_busy_timeout: int = Field(default=5000, env="SQLITE_BUSY_TIMEOUT")  # 毫秒
     
     # 安全配置
     secret_key: str = Field(env="SECRET_KEY")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # 认证缓存：已验证令牌 LRU 与用户快照（短 TTL，用户修改时失效）
+    auth_cache_enabled: bool = Field(default=True, env="AUTH_CACHE_ENABLED")
+    auth_token_cache_size: int = Field(default=4096, env="AUTH_TOKEN_CACHE_SIZE")
+    auth_user_cache_size: int = Field(default=4096, env="AUTH_USER_CACHE_SIZE")
+    auth_user_cache_ttl: float = Field(default=30.0, env="AUTH_USER_CACHE_TTL")  # 秒
+    # 密码哈希线程池：并发计算数与排队上限（超过上限的登录/注册请求返回 503）
+    password_hash_workers: int = Field(default=4, env="PASSWORD_HASH_WORKERS")
+    password_hash_max_pending: int = Field(default=128, env="PASSWORD_HASH_MAX_PENDING")
     
     # CORS 配置 - 使用简单的字符串列表
     cors_origins: List[str] = ["http://localhost:3000"]
@@ -26,17 +45,121 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
     gemini_api_key: Optional[str] = Field(default=None, env="GEMINI_API_KEY")
     ollama_base_url: str = Field(default="http://localhost:11434", env="OLLAMA_BASE_URL")
+    gemini_model: str = Field(default="gemini-1.5-pro", env="GEMINI_MODEL")
+    gemini_base_url: str = Field(
+        default="https://generativelanguage.googleapis.com/v1beta", env="GEMINI_BASE_URL"
+    )
+    openai_model: str = Field(default="gpt-4o-mini", env="OPENAI_MODEL")
+    openai_base_url: str = Field(default="https://api.openai.com/v1", env="OPENAI_BASE_URL")
+    ollama_model: str = Field(default="llama3", env="OLLAMA_MODEL")
+    # 启用的服务提供方（按优先级），为空时使用已配置密钥的 gemini/openai；多于一个时通过路由客户端调用
+    ai_providers: List[str] = Field(default=[], env="AI_PROVIDERS")
+    
+    # AI 路由配置：滑动窗口大小、熔断阈值与冷却时间、对冲请求
+    ai_router_window: int = Field(default=100, env="AI_ROUTER_WINDOW")
+    ai_router_min_samples: int = Field(default=10, env="AI_ROUTER_MIN_SAMPLES")
+    ai_router_failure_threshold: int = Field(default=5, env="AI_ROUTER_FAILURE_THRESHOLD")  # 连续失败次数
+    ai_router_error_rate_threshold: float = Field(default=0.5, env="AI_ROUTER_ERROR_RATE_THRESHOLD")
+    ai_router_cooldown: float = Field(default=30.0, env="AI_ROUTER_COOLDOWN")  # 秒
+    ai_router_hedge: bool = Field(default=True, env="AI_ROUTER_HEDGE")
+    ai_router_hedge_min_delay: float = Field(default=1.0, env="AI_ROUTER_HEDGE_MIN_DELAY")  # 秒
+    
+    # AI 客户端连接池配置
+    ai_max_concurrency: int = Field(default=64, env="AI_MAX_CONCURRENCY")  # 同时进行的上游调用上限
+    ai_max_connections: int = Field(default=100, env="AI_MAX_CONNECTIONS")
+    ai_max_keepalive_connections: int = Field(default=20, env="AI_MAX_KEEPALIVE_CONNECTIONS")
+    ai_keepalive_expiry: float = Field(default=30.0, env="AI_KEEPALIVE_EXPIRY")  # 秒
+    ai_request_timeout: float = Field(default=120.0, env="AI_REQUEST_TIMEOUT")  # 秒
+    ai_http2: bool = Field(default=True, env="AI_HTTP2")
+    # 结构化输出中缺失或不符合要求的字段单独重新生成的次数
+    ai_structured_retries: int = Field(default=1, env="AI_STRUCTURED_RETRIES")
+    
+    # 聊天上下文窗口配置
+    chat_history_max_messages: int = Field(default=50, env="CHAT_HISTORY_MAX_MESSAGES")
+    chat_history_token_budget: int = Field(default=6000, env="CHAT_HISTORY_TOKEN_BUDGET")
+    chat_context_cache_size: int = Field(default=1024, env="CHAT_CONTEXT_CACHE_SIZE")  # 缓存窗口的会话数
+    # 未摘要消息超过阈值后在后台压缩为摘要，最近若干条保留原文；每次摘要调用的输入（已有摘要 + 新消息）不超过批量上限
+    chat_summary_enabled: bool = Field(default=True, env="CHAT_SUMMARY_ENABLED")
+    chat_summary_threshold_tokens: int = Field(default=3000, env="CHAT_SUMMARY_THRESHOLD_TOKENS")
+    chat_summary_keep_recent: int = Field(default=10, env="CHAT_SUMMARY_KEEP_RECENT")
+    chat_summary_batch_tokens: int = Field(default=8000, env="CHAT_SUMMARY_BATCH_TOKENS")
+    # 聊天 WebSocket：认证等待时间、心跳间隔与超时、每个连接的发送队列长度（队列满时生成暂停）、
+    # 每个连接同时进行的对话数与单帧大小上限
+    chat_ws_auth_timeout: float = Field(default=10.0, env="CHAT_WS_AUTH_TIMEOUT")  # 秒
+    chat_ws_heartbeat_interval: float = Field(default=20.0, env="CHAT_WS_HEARTBEAT_INTERVAL")  # 秒
+    chat_ws_heartbeat_timeout: float = Field(default=60.0, env="CHAT_WS_HEARTBEAT_TIMEOUT")  # 秒
+    chat_ws_send_queue_size: int = Field(default=256, env="CHAT_WS_SEND_QUEUE_SIZE")  # 帧
+    chat_ws_max_active_turns: int = Field(default=8, env="CHAT_WS_MAX_ACTIVE_TURNS")
+    chat_ws_max_frame_size: int = Field(default=256 * 1024, env="CHAT_WS_MAX_FRAME_SIZE")  # 字符
+    # 生成代码时检索项目中的相关代码片段加入提示（哈希 n-gram 稀疏向量，按项目缓存在进程内）
+    rag_enabled: bool = Field(default=True, env="RAG_ENABLED")
+    rag_top_k: int = Field(default=8, env="RAG_TOP_K")
+    rag_token_budget: int = Field(default=2000, env="RAG_TOKEN_BUDGET")
+    rag_chunk_lines: int = Field(default=40, env="RAG_CHUNK_LINES")
+    rag_cache_size: int = Field(default=16, env="RAG_CACHE_SIZE")  # 缓存索引的项目数
+    # 生成项目文件：按文件依赖关系并发生成，同时生成的文件数、清单文件数上限与每个依赖文件加入提示的行数
+    generation_concurrency: int = Field(default=4, env="GENERATION_CONCURRENCY")
+    generation_max_files: int = Field(default=50, env="GENERATION_MAX_FILES")
+    generation_dependency_max_lines: int = Field(default=200, env="GENERATION_DEPENDENCY_MAX_LINES")
     
     # Redis 配置
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
     
+    # AI 响应缓存配置
+    ai_cache_enabled: bool = Field(default=True, env="AI_CACHE_ENABLED")
+    ai_cache_redis_enabled: bool = Field(default=True, env="AI_CACHE_REDIS_ENABLED")
+    ai_cache_memory_size: int = Field(default=1024, env="AI_CACHE_MEMORY_SIZE")
+    # 各端点的缓存时间（秒），0 表示不缓存
+    ai_cache_ttls: Dict[str, int] = {
+        "analyze_requirements": 24 * 3600,
+        "generate_code": 3600,
+        "plan_files": 3600,
+        "edit_code": 3600,
+        "suggest_improvements": 3600,
+        "chat": 0,
+    }
+    # 近似提示匹配的相似度阈值，0 表示关闭
+    ai_cache_similarity_threshold: float = Field(default=0.0, env="AI_CACHE_SIMILARITY_THRESHOLD")
+    # 合并同时进行的相同 AI 请求（single-flight）
+    ai_singleflight_enabled: bool = Field(default=True, env="AI_SINGLEFLIGHT_ENABLED")
+    
+    # 后台任务配置
+    # memory：进程内队列；eager：提交时立即执行（测试用）；celery：使用 Redis 作为 broker
+    job_backend: str = Field(default="memory", env="JOB_BACKEND")
+    job_workers: int = Field(default=4, env="JOB_WORKERS")  # memory 后端的并发 worker 数
+    job_max_retries: int = Field(default=3, env="JOB_MAX_RETRIES")
+    job_retry_backoff: float = Field(default=2.0, env="JOB_RETRY_BACKOFF")  # 首次重试等待（秒），之后按指数增长
+    job_retry_backoff_max: float = Field(default=60.0, env="JOB_RETRY_BACKOFF_MAX")
+    # 一次执行的最长时间（秒），也是执行中任务的租约：超过后其他进程可以重新领取
+    job_lease_timeout: float = Field(default=1800.0, env="JOB_LEASE_TIMEOUT")
+    # 各 AI 服务提供方同时执行的任务上限（进程内；使用路由客户端的任务按实际调用的后端计算）
+    job_provider_concurrency: Dict[str, int] = {
+        "gemini": 4,
+        "openai": 4,
+        "ollama": 2,
+    }
+    
     # 文件存储配置
     upload_dir: str = Field(default="./uploads", env="UPLOAD_DIR")
     max_file_size: int = Field(default=10 * 1024 * 1024, env="MAX_FILE_SIZE")  # 10MB
+    # 对象存储使用 zstd 压缩（需安装 zstandard，未安装时不压缩）
+    blob_compression: bool = Field(default=True, env="BLOB_COMPRESSION")
+    blob_compression_level: int = Field(default=3, env="BLOB_COMPRESSION_LEVEL")
+    # 每隔多少个版本保存一次完整内容，其余版本保存相对上一版本的差量
+    file_version_keyframe_interval: int = Field(default=20, env="FILE_VERSION_KEYFRAME_INTERVAL")
+    # 项目归档导入：上传大小上限与最多导入的文件数
+    project_archive_max_size: int = Field(default=200 * 1024 * 1024, env="PROJECT_ARCHIVE_MAX_SIZE")  # 200MB
+    project_import_max_files: int = Field(default=20000, env="PROJECT_IMPORT_MAX_FILES")
+    # 文件全文搜索（仅 SQLite，需要 FTS5 trigram 分词）；超过大小上限的文件只按路径索引
+    search_enabled: bool = Field(default=True, env="SEARCH_ENABLED")
+    search_index_max_file_size: int = Field(default=1024 * 1024, env="SEARCH_INDEX_MAX_FILE_SIZE")  # 1MB
     
     # 日志配置
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     
+    # 指标配置（/metrics 以 Prometheus 文本格式输出）
+    metrics_enabled: bool = Field(default=True, env="METRICS_ENABLED")
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,5 +1,25 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+from app.config import settings
+from .prompts import Prompt, render_prompt
+from .structured import CodeEditPlan, ProjectPlan, RequirementsAnalysis, model_schema, parse_structured
+
+
+class AIErrorMessage(str):
+    """AI 调用失败时返回给调用方的错误文本，不会被缓存"""
+    pass
+
+
+def is_error_result(value: Any) -> bool:
+    """AI 客户端的返回值是否表示调用失败"""
+    if isinstance(value, AIErrorMessage):
+        return True
+    if isinstance(value, dict):
+        return "error" in value
+    if isinstance(value, list):
+        return any(isinstance(item, AIErrorMessage) for item in value)
+    return False
 
 
 class BaseAIClient(ABC):
@@ -15,6 +35,22 @@ class BaseAIClient(ABC):
         """分析需求"""
         pass
     
+    @abstractmethod
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """根据需求与分析结果规划项目文件清单"""
+        pass
+    
+    @abstractmethod
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """按要求修改代码，返回搜索/替换形式的修改片段；related_code 为项目中其他文件的相关片段"""
+        pass
+    
     @abstractmethod
     async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
         """建议改进"""
@@ -24,6 +60,179 @@ class BaseAIClient(ABC):
     async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
         """聊天对话"""
         pass
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """流式聊天对话，逐段产出回复文本
+        
+        默认实现一次性产出完整回复，支持流式生成的客户端应覆盖此方法。
+        """
+        yield await self.chat(message, history)
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        """把新增对话合并进已有摘要
+        
+        默认实现通过 chat 完成，客户端可覆盖以使用更直接的调用。
+        """
+        return await self.chat(render_prompt("summarize", summary=summary, history=history).user, [])
+    
+    async def aclose(self) -> None:
+        """释放客户端持有的资源，由 AIClientFactory 在应用关闭时调用"""
+        pass
+
+
+class TextGenerationClient(BaseAIClient):
+    """基于文本生成接口的客户端基类
+    
+    子类只需实现 _generate（以及可选的 _stream_generate），提示构建与错误处理在此统一完成。
+    提示由 app.core.ai.prompts 中的模板渲染，prompt_variant 为优先使用的模板变体。
+    """
+    prompt_variant: Optional[str] = None
+    
+    def _prompt(self, name: str, **context: Any) -> Prompt:
+        return render_prompt(name, self.prompt_variant, **context)
+    
+    @abstractmethod
+    async def _generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> str:
+        """发送提示（system 作为系统指令）并返回完整文本；给出 schema 时以 JSON 模式生成，输出受该 JSON Schema 约束"""
+        pass
+    
+    async def _stream_generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """发送提示并逐段产出文本，默认一次性产出完整结果"""
+        yield await self._generate(prompt, schema)
+    
+    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
+        """生成代码"""
+        try:
+            full_prompt = self._prompt(
+                "generate_code",
+                prompt=prompt,
+                tech_stack=context.get('tech_stack', 'Next.js + FastAPI'),
+                project_type=context.get('project_type', 'Web应用'),
+                project_description=context.get('project_description'),
+                related_code=context.get('related_code'),
+                file_path=context.get('file_path', '')
+            )
+            
+            return await self._generate(full_prompt)
+        except Exception as e:
+            return AIErrorMessage(f"代码生成失败：{str(e)}")
+    
+    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
+        """分析需求
+        
+        按 RequirementsAnalysis 的 JSON Schema 流式生成，字段完整后立即校验；
+        无效或缺失的字段只针对这些字段重新生成，不重新生成整个结果。
+        """
+        try:
+            async def retry(fields: List[str]) -> str:
+                return await self._generate(
+                    self._prompt("analyze_requirements", description=description, fields=fields),
+                    model_schema(RequirementsAnalysis, fields)
+                )
+            
+            analysis = await parse_structured(
+                RequirementsAnalysis,
+                self._stream_generate(
+                    self._prompt("analyze_requirements", description=description, fields=None),
+                    model_schema(RequirementsAnalysis)
+                ),
+                retry,
+                settings.ai_structured_retries
+            )
+            return analysis.model_dump()
+        except Exception as e:
+            return {
+                "error": f"需求分析失败：{str(e)}",
+                "tech_stack": {"frontend": "nextjs", "backend": "fastapi"},
+                "features": [],
+                "complexity": "未知"
+            }
+    
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """规划项目文件清单（按 ProjectPlan 的 JSON Schema 生成）"""
+        try:
+            prompt = self._prompt(
+                "plan_files",
+                description=description,
+                tech_stack=analysis.get("tech_stack") or {},
+                features=analysis.get("features") or []
+            )
+            
+            async def retry(fields: List[str]) -> str:
+                return await self._generate(prompt, model_schema(ProjectPlan, fields))
+            
+            plan = await parse_structured(
+                ProjectPlan,
+                self._stream_generate(prompt, model_schema(ProjectPlan)),
+                retry,
+                settings.ai_structured_retries
+            )
+            return plan.model_dump()
+        except Exception as e:
+            return {"error": f"文件规划失败：{str(e)}", "files": []}
+    
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """修改代码（按 CodeEditPlan 的 JSON Schema 生成），输出大小取决于修改的大小而不是文件大小"""
+        try:
+            prompt = self._prompt(
+                "edit_code", code=code, instruction=instruction, file_path=file_path, related_code=related_code
+            )
+            
+            async def retry(fields: List[str]) -> str:
+                return await self._generate(prompt, model_schema(CodeEditPlan, fields))
+            
+            plan = await parse_structured(
+                CodeEditPlan,
+                self._stream_generate(prompt, model_schema(CodeEditPlan)),
+                retry,
+                settings.ai_structured_retries
+            )
+            return plan.model_dump()
+        except Exception as e:
+            return {"error": f"代码修改失败：{str(e)}", "edits": []}
+    
+    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
+        """建议改进"""
+        try:
+            prompt = self._prompt("suggest_improvements", code=code, feedback=feedback)
+            
+            response = await self._generate(prompt)
+            
+            # 将响应分割成建议列表
+            suggestions = response.split('\n')
+            return [s.strip() for s in suggestions if s.strip()]
+        except Exception as e:
+            return [AIErrorMessage(f"改进建议生成失败：{str(e)}")]
+    
+    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
+        """聊天对话"""
+        try:
+            full_prompt = self._prompt("chat", message=message, history=history)
+            return await self._generate(full_prompt)
+        except Exception as e:
+            return AIErrorMessage(f"聊天回复失败：{str(e)}")
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """流式聊天对话"""
+        try:
+            full_prompt = self._prompt("chat", message=message, history=history)
+            async for chunk in self._stream_generate(full_prompt):
+                yield chunk
+        except Exception as e:
+            yield AIErrorMessage(f"聊天回复失败：{str(e)}")
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        """合并对话摘要"""
+        try:
+            return await self._generate(self._prompt("summarize", summary=summary, history=history))
+        except Exception as e:
+            return AIErrorMessage(f"摘要生成失败：{str(e)}")
 
 
 class Requirements:
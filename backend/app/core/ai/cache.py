@@ -0,0 +1,359 @@
+"""AI 响应缓存
+
+两级缓存：进程内带 TTL 的 LRU + Redis。缓存键由端点、模型、规范化后的提示与上下文计算哈希，
+可选地按字符 n-gram 向量的余弦相似度匹配近似重复的提示。
+"""
+import hashlib
+import json
+import math
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import settings
+from app.core.metrics import registry
+from .base import BaseAIClient, is_error_result
+
+logger = structlog.get_logger()
+
+# 请求头中携带此标记或 Cache-Control: no-cache 时绕过缓存
+AI_CACHE_BYPASS_HEADER = "X-AI-Cache-Bypass"
+
+_cache_bypass: ContextVar[bool] = ContextVar("ai_cache_bypass", default=False)
+
+_MISSING = object()
+
+
+def set_cache_bypass(bypass: bool) -> None:
+    """设置当前请求是否绕过缓存"""
+    _cache_bypass.set(bypass)
+
+
+def normalize_prompt(text: str) -> str:
+    """规范化提示：统一 Unicode 形式、折叠空白
+    
+    不忽略大小写：代码中的标识符与文件名区分大小写（userName 与 username、README 与 readme），
+    只在大小写上不同的请求不能共享结果。
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.split())
+
+
+def make_cache_key(endpoint: str, model: str, prompt: str, context: Any = None) -> str:
+    """计算缓存键"""
+    payload = json.dumps(
+        {"endpoint": endpoint, "model": model, "prompt": normalize_prompt(prompt), "context": context},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return "ai:cache:" + hashlib.sha256(payload.encode()).hexdigest()
+
+
+def ngram_vector(text: str, n: int = 3, dims: int = 1024) -> Dict[int, float]:
+    """字符 n-gram 哈希向量（稀疏、已归一化）"""
+    text = normalize_prompt(text)
+    counts: Dict[int, float] = {}
+    for i in range(max(len(text) - n + 1, 1)):
+        bucket = hash(text[i:i + n]) % dims
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def cosine_similarity(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class TTLCache:
+    """进程内带过期时间的 LRU 缓存"""
+    
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+    
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass
+class CacheStats:
+    """单个端点的缓存命中统计"""
+    memory_hits: int = 0
+    redis_hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.redis_hits + self.similar_hits
+
+
+class ResponseCache:
+    """两级 AI 响应缓存"""
+    
+    # Redis 出错后暂停使用的时间（秒），避免每次请求都等待连接超时
+    REDIS_BACKOFF = 30.0
+    
+    def __init__(
+        self,
+        redis: Any = None,
+        memory_size: Optional[int] = None,
+        ttls: Optional[Dict[str, int]] = None,
+        similarity_threshold: Optional[float] = None,
+    ):
+        self.redis = redis
+        self.memory = TTLCache(memory_size or settings.ai_cache_memory_size)
+        self.ttls = ttls if ttls is not None else settings.ai_cache_ttls
+        self.similarity_threshold = (
+            similarity_threshold if similarity_threshold is not None
+            else settings.ai_cache_similarity_threshold
+        )
+        self.stats: Dict[str, CacheStats] = {}
+        self._similar: Dict[str, Deque[Tuple[Dict[int, float], str]]] = {}
+        self._redis_retry_at = 0.0
+    
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint, 0)
+    
+    def _stats(self, endpoint: str) -> CacheStats:
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats[endpoint] = CacheStats()
+        return stats
+    
+    async def _redis_get(self, key: str) -> Any:
+        if self.redis is None or time.monotonic() < self._redis_retry_at:
+            return _MISSING
+        try:
+            raw = await self.redis.get(key)
+        except Exception as e:
+            self._redis_retry_at = time.monotonic() + self.REDIS_BACKOFF
+            logger.warning("AI cache redis get failed", error=str(e))
+            return _MISSING
+        return _MISSING if raw is None else json.loads(raw)["value"]
+    
+    async def _redis_set(self, key: str, value: Any, ttl: int) -> None:
+        if self.redis is None or time.monotonic() < self._redis_retry_at:
+            return
+        try:
+            await self.redis.set(key, json.dumps({"value": value}, ensure_ascii=False), ex=ttl)
+        except Exception as e:
+            self._redis_retry_at = time.monotonic() + self.REDIS_BACKOFF
+            logger.warning("AI cache redis set failed", error=str(e))
+    
+    def _find_similar(self, bucket: str, vector: Dict[int, float]) -> Optional[str]:
+        best_key, best_score = None, self.similarity_threshold
+        for candidate, key in self._similar.get(bucket, ()):
+            score = cosine_similarity(vector, candidate)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+    
+    async def get_or_call(
+        self,
+        endpoint: str,
+        model: str,
+        prompt: str,
+        context: Any,
+        call: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """命中缓存时直接返回，否则调用上游并写入缓存"""
+        ttl = self.ttl_for(endpoint)
+        stats = self._stats(endpoint)
+        if ttl <= 0:
+            return await call()
+        if _cache_bypass.get():
+            stats.bypassed += 1
+            return await call()
+        
+        key = make_cache_key(endpoint, model, prompt, context)
+        value = self.memory.get(key)
+        if value is not _MISSING:
+            stats.memory_hits += 1
+            return value
+        
+        value = await self._redis_get(key)
+        if value is not _MISSING:
+            stats.redis_hits += 1
+            self.memory.set(key, value, ttl)
+            return value
+        
+        # 近似匹配只在同一端点、模型和上下文内进行
+        vector, bucket = None, None
+        if self.similarity_threshold > 0:
+            bucket = make_cache_key(endpoint, model, "", context)
+            vector = ngram_vector(prompt)
+            similar_key = self._find_similar(bucket, vector)
+            if similar_key is not None:
+                value = self.memory.get(similar_key)
+                if value is not _MISSING:
+                    stats.similar_hits += 1
+                    return value
+        
+        stats.misses += 1
+        value = await call()
+        if not cacheable(value):
+            return value
+        
+        self.memory.set(key, value, ttl)
+        await self._redis_set(key, value, ttl)
+        if vector is not None:
+            entries = self._similar.setdefault(bucket, deque(maxlen=self.memory.max_size))
+            entries.append((vector, key))
+        return value
+    
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """各端点的命中统计"""
+        return {
+            endpoint: {
+                "hits": stats.hits,
+                "memory_hits": stats.memory_hits,
+                "redis_hits": stats.redis_hits,
+                "similar_hits": stats.similar_hits,
+                "misses": stats.misses,
+                "bypassed": stats.bypassed,
+            }
+            for endpoint, stats in self.stats.items()
+        }
+    
+    async def aclose(self) -> None:
+        if self.redis is not None:
+            await self.redis.close()
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取进程内共享的响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        redis = None
+        if settings.ai_cache_redis_enabled:
+            from redis.asyncio import Redis
+            redis = Redis.from_url(settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        _response_cache = ResponseCache(redis=redis)
+    return _response_cache
+
+
+def _cache_metrics() -> Dict[Tuple[str, ...], float]:
+    if _response_cache is None:
+        return {}
+    return {
+        (endpoint, result): value
+        for endpoint, stats in _response_cache.snapshot().items()
+        for result, value in stats.items()
+    }
+
+
+registry.gauge(
+    "kidvibe_ai_cache_requests",
+    "AI response cache lookups by endpoint and result",
+    ("endpoint", "result"),
+    _cache_metrics,
+)
+
+
+async def close_response_cache() -> None:
+    global _response_cache
+    if _response_cache is not None:
+        await _response_cache.aclose()
+    _response_cache = None
+
+
+def _is_cacheable(value: Any) -> bool:
+    """失败结果不写入缓存"""
+    return not is_error_result(value)
+
+
+class CachedAIClient(BaseAIClient):
+    """带响应缓存的 AI 客户端包装"""
+    
+    def __init__(self, client: BaseAIClient, cache: Optional[ResponseCache] = None):
+        self.client = client
+        self.cache = cache or get_response_cache()
+        self.model_name = getattr(client, "model_name", type(client).__name__)
+    
+    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
+        return await self.cache.get_or_call(
+            "generate_code", self.model_name, prompt, context,
+            lambda: self.client.generate_code(prompt, context), _is_cacheable,
+        )
+    
+    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
+        return await self.cache.get_or_call(
+            "analyze_requirements", self.model_name, description, None,
+            lambda: self.client.analyze_requirements(description), _is_cacheable,
+        )
+    
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.cache.get_or_call(
+            "plan_files", self.model_name, description, analysis,
+            lambda: self.client.plan_files(description, analysis), _is_cacheable,
+        )
+    
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await self.cache.get_or_call(
+            "edit_code", self.model_name, instruction,
+            {"file_path": file_path, "code": code, "related_code": related_code},
+            lambda: self.client.edit_code(code, instruction, file_path, related_code), _is_cacheable,
+        )
+    
+    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
+        return await self.cache.get_or_call(
+            "suggest_improvements", self.model_name, feedback, code,
+            lambda: self.client.suggest_improvements(code, feedback), _is_cacheable,
+        )
+    
+    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
+        return await self.cache.get_or_call(
+            "chat", self.model_name, message, history,
+            lambda: self.client.chat(message, history), _is_cacheable,
+        )
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        # 流式响应不经过缓存
+        async for chunk in self.client.stream_chat(message, history):
+            yield chunk
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        return await self.client.summarize(summary, history)
+    
+    async def aclose(self) -> None:
+        await self.client.aclose()
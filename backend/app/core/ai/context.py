@@ -0,0 +1,118 @@
+"""聊天上下文窗口管理
+
+按会话取最近 N 条消息并按 token 预算截断。每个会话的窗口缓存在进程内，
+后续轮次只查询上次之后新增的消息（按自增 id），再从窗口头部淘汰超出预算的旧消息。
+"""
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.chat import ChatMessage
+
+
+def estimate_tokens(text: str) -> int:
+    """快速估算 token 数：ASCII 约 4 个字符一个 token，CJK 等多字节字符约一个字符一个 token"""
+    if not text:
+        return 0
+    chars = len(text)
+    # UTF-8 下 CJK 字符占 3 字节，用字节数差值估算非 ASCII 字符数，避免逐字符遍历
+    non_ascii = min((len(text.encode("utf-8")) - chars) // 2, chars)
+    return (chars - non_ascii) // 4 + non_ascii + 1
+
+
+@dataclass
+class _WindowEntry:
+    id: int
+    role: str
+    content: str
+    tokens: int
+
+
+@dataclass
+class _SessionWindow:
+    entries: Deque[_WindowEntry] = field(default_factory=deque)
+    total_tokens: int = 0
+    last_message_id: int = 0
+
+
+class ContextWindowManager:
+    """会话历史窗口管理器"""
+    
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        max_sessions: Optional[int] = None,
+    ):
+        self.max_messages = max_messages or settings.chat_history_max_messages
+        self.token_budget = token_budget or settings.chat_history_token_budget
+        self.max_sessions = max_sessions or settings.chat_context_cache_size
+        self._windows: "OrderedDict[int, _SessionWindow]" = OrderedDict()
+    
+    async def _fetch_recent(self, db: AsyncSession, session_id: int) -> List[ChatMessage]:
+        """按倒序索引取最近 N 条消息，返回时间正序"""
+        messages = (await db.scalars(
+            select(ChatMessage).where(
+                ChatMessage.session_id == session_id
+            ).order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(self.max_messages)
+        )).all()
+        return list(reversed(messages))
+    
+    async def _fetch_delta(self, db: AsyncSession, session_id: int, after_id: int) -> List[ChatMessage]:
+        """取窗口之后新增的消息"""
+        return (await db.scalars(
+            select(ChatMessage).where(
+                ChatMessage.session_id == session_id,
+                ChatMessage.id > after_id
+            ).order_by(ChatMessage.created_at, ChatMessage.id).limit(self.max_messages + 1)
+        )).all()
+    
+    def _append(self, window: _SessionWindow, messages: List[ChatMessage]) -> None:
+        for message in messages:
+            entry = _WindowEntry(message.id, message.role, message.content, estimate_tokens(message.content))
+            window.entries.append(entry)
+            window.total_tokens += entry.tokens
+            window.last_message_id = max(window.last_message_id, message.id)
+        
+        # 淘汰最旧的消息，至少保留最新一条
+        while len(window.entries) > 1 and (
+            len(window.entries) > self.max_messages or window.total_tokens > self.token_budget
+        ):
+            window.total_tokens -= window.entries.popleft().tokens
+    
+    async def get_history(self, db: AsyncSession, session_id: int, after_id: int = 0) -> List[Dict[str, str]]:
+        """获取会话在预算内的最近历史，after_id 之前（已被摘要）的消息不返回"""
+        window = self._windows.get(session_id)
+        if window is not None:
+            delta = await self._fetch_delta(db, session_id, window.last_message_id)
+            if len(delta) > self.max_messages:
+                # 新增消息已超过窗口大小，直接重建
+                window = None
+            else:
+                self._append(window, delta)
+                self._windows.move_to_end(session_id)
+        
+        if window is None:
+            window = _SessionWindow()
+            self._append(window, await self._fetch_recent(db, session_id))
+            self._windows[session_id] = window
+            while len(self._windows) > self.max_sessions:
+                self._windows.popitem(last=False)
+        
+        return [
+            {"role": entry.role, "content": entry.content}
+            for entry in window.entries
+            if entry.id > after_id
+        ]
+    
+    def invalidate(self, session_id: int) -> None:
+        """会话被删除或消息被修改时丢弃缓存的窗口"""
+        self._windows.pop(session_id, None)
+
+
+# 全局上下文窗口管理器
+context_window = ContextWindowManager()
@@ -0,0 +1,64 @@
+"""增量修改代码
+
+请求模型只返回搜索/替换形式的修改片段（输出大小取决于修改的大小而不是文件大小），
+在服务端校验并应用到文件当前内容上。片段无法应用（原文找不到或有歧义）时，把错误告诉模型重新请求。
+"""
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import settings
+from app.core.storage.patch import AppliedHunk, EditHunk, PatchError, apply_hunks
+from .base import BaseAIClient, is_error_result
+from .retrieval import related_code
+
+logger = structlog.get_logger()
+
+# 片段无法应用时重新请求的次数
+EDIT_APPLY_RETRIES = 1
+
+
+class CodeEditError(Exception):
+    """模型未能给出可以应用的修改"""
+    pass
+
+
+async def propose_edits(
+    client: BaseAIClient,
+    content: str,
+    instruction: str,
+    file_path: str,
+    project_id: Optional[int] = None,
+) -> Tuple[str, List[AppliedHunk]]:
+    """请求修改片段并应用到 content 上，返回修改后的内容与已应用的片段（不写入文件）
+    
+    给出 project_id 且启用代码检索时，项目中其他文件的相关片段随修改要求一起发送（重新请求时沿用）。
+    """
+    related = None
+    if project_id is not None and settings.rag_enabled:
+        related = await related_code(project_id, f"{file_path}\n{instruction}", [file_path])
+    request = instruction
+    error: Optional[PatchError] = None
+    for _ in range(EDIT_APPLY_RETRIES + 1):
+        result = await client.edit_code(content, request, file_path, related)
+        if is_error_result(result):
+            raise CodeEditError(str(result["error"]))
+        hunks = [EditHunk(edit["search"], edit["replace"]) for edit in result.get("edits") or []]
+        try:
+            return apply_hunks(content, hunks)
+        except PatchError as e:
+            error = e
+            logger.info("Model edits did not apply, retrying", file_path=file_path, error=str(e))
+            request = f"{instruction}\n\n（上一次返回的修改无法应用：{e}。search 必须从文件中逐字复制，并且在文件中唯一。）"
+    raise CodeEditError(f"修改无法应用到文件：{error}")
+
+
+def code_change(file_id: int, file_path: str, base_version: int, hunks: List[AppliedHunk]) -> Dict[str, Any]:
+    """一个文件的修改（ChatResponse.code_changes 中的一项）；base_version 为修改所基于的文件版本"""
+    return {
+        "file_id": file_id,
+        "file_path": file_path,
+        "base_version": base_version,
+        "hunks": [asdict(hunk) for hunk in hunks],
+    }
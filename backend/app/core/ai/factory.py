@@ -1,34 +1,121 @@
-from typing import Optional
+import threading
+from typing import Optional, Dict, List, Tuple
 from .base import BaseAIClient
 from .gemini import GeminiClient
+from .openai import OpenAIClient
+from .ollama import OllamaClient
+from .router import RouterAIClient
+from .cache import CachedAIClient, close_response_cache
+from .instrumented import InstrumentedAIClient
+from .singleflight import SingleFlightAIClient
+from .transport import close_http_client
 from app.config import settings
 
 
 class AIClientFactory:
-    """AI 客户端工厂"""
+    """AI 客户端工厂
+    
+    进程内按 (provider, model, key) 维护客户端注册表：首次使用时创建，之后跨请求复用，
+    应用关闭时统一释放。配置了多个服务提供方时，默认客户端为按延迟与健康状况路由的 "router"。
+    """
+    
+    _clients: Dict[Tuple[str, str, str], BaseAIClient] = {}
+    # 创建路由客户端时会递归创建各服务提供方的客户端，需要可重入锁
+    _lock = threading.RLock()
+    
+    @staticmethod
+    def get_providers() -> List[str]:
+        """启用的服务提供方（按优先级）"""
+        if settings.ai_providers:
+            return list(settings.ai_providers)
+        providers = []
+        if settings.gemini_api_key:
+            providers.append("gemini")
+        if settings.openai_api_key:
+            providers.append("openai")
+        return providers
+    
+    @classmethod
+    def _client_key(cls, model_type: str) -> Tuple[str, str, str]:
+        """注册表键"""
+        if model_type == "gemini":
+            return model_type, settings.gemini_model, settings.gemini_api_key or ""
+        elif model_type == "openai":
+            return model_type, settings.openai_model, settings.openai_api_key or ""
+        elif model_type == "ollama":
+            return model_type, settings.ollama_model, settings.ollama_base_url
+        elif model_type == "router":
+            return model_type, ",".join(cls.get_providers()), ""
+        return model_type, "", ""
     
     @staticmethod
-    def get_client(model_type: str = "gemini") -> BaseAIClient:
-        """获取 AI 客户端"""
+    def _create_client(model_type: str) -> BaseAIClient:
+        """创建新的 AI 客户端实例"""
         if model_type == "gemini":
             return GeminiClient()
         elif model_type == "openai":
-            # TODO: 实现 OpenAI 客户端
-            raise NotImplementedError("OpenAI 客户端尚未实现")
+            return OpenAIClient()
         elif model_type == "ollama":
-            # TODO: 实现 Ollama 客户端
-            raise NotImplementedError("Ollama 客户端尚未实现")
+            return OllamaClient()
         else:
             raise ValueError(f"不支持的模型类型：{model_type}")
     
-    @staticmethod
-    def get_default_client() -> BaseAIClient:
+    @classmethod
+    def _create_provider_client(cls, model_type: str) -> BaseAIClient:
+        """创建服务提供方客户端，按配置包装指标统计"""
+        client = cls._create_client(model_type)
+        if settings.metrics_enabled:
+            client = InstrumentedAIClient(client, model_type)
+        return client
+    
+    @classmethod
+    def get_client(cls, model_type: str = "gemini") -> BaseAIClient:
+        """获取 AI 客户端（复用已创建的实例）"""
+        key = cls._client_key(model_type)
+        client = cls._clients.get(key)
+        if client is None:
+            with cls._lock:
+                client = cls._clients.get(key)
+                if client is None:
+                    if model_type == "router":
+                        # 响应缓存包在路由之外，各后端只统计指标
+                        client = RouterAIClient({
+                            provider: cls._create_provider_client(provider)
+                            for provider in cls.get_providers()
+                        })
+                    else:
+                        client = cls._create_provider_client(model_type)
+                    # 缓存未命中的相同并发请求合并为一次上游调用
+                    if settings.ai_singleflight_enabled:
+                        client = SingleFlightAIClient(client)
+                    if settings.ai_cache_enabled:
+                        client = CachedAIClient(client)
+                    cls._clients[key] = client
+        return client
+    
+    @classmethod
+    def get_default_provider(cls) -> str:
+        """获取默认 AI 服务提供方"""
+        providers = cls.get_providers()
+        if not providers:
+            raise ValueError("未配置任何 AI API 密钥")
+        if len(providers) > 1:
+            return "router"
+        return providers[0]
+    
+    @classmethod
+    def get_default_client(cls) -> BaseAIClient:
         """获取默认 AI 客户端"""
-        # 优先使用 Gemini
-        if settings.gemini_api_key:
-            return GeminiClient()
-        elif settings.openai_api_key:
-            # TODO: 返回 OpenAI 客户端
-            raise NotImplementedError("OpenAI 客户端尚未实现")
-        else:
-            raise ValueError("未配置任何 AI API 密钥") 
\ No newline at end of file
+        return cls.get_client(cls.get_default_provider())
+    
+    @classmethod
+    async def close_all(cls) -> None:
+        """关闭所有已创建的客户端及共享连接池"""
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        
+        for client in clients:
+            await client.aclose()
+        await close_response_cache()
+        await close_http_client()
@@ -1,141 +1,74 @@
-import google.generativeai as genai
-from typing import Dict, Any, List
-import asyncio
-from .base import BaseAIClient
+import json
+from typing import Dict, Any, AsyncIterator, Optional
+from .base import TextGenerationClient
+from .prompts import Prompt
+from .transport import limited
 from app.config import settings
 
 
-class GeminiClient(BaseAIClient):
-    """Gemini AI 客户端"""
+class GeminiClient(TextGenerationClient):
+    """Gemini AI 客户端
+    
+    直接调用 Gemini REST API，所有请求通过共享的异步连接池发送，不占用线程。
+    系统指令通过 systemInstruction 发送，位于请求最前，相同前缀可命中 Gemini 的隐式上下文缓存。
+    """
+    prompt_variant = "gemini"
     
     def __init__(self):
         if not settings.gemini_api_key:
             raise ValueError("GEMINI_API_KEY 未配置")
         
-        genai.configure(api_key=settings.gemini_api_key)
-        # 使用正确的模型名称
-        self.model = genai.GenerativeModel('gemini-1.5-pro')
+        self.api_key = settings.gemini_api_key
+        self.model_name = settings.gemini_model
+        self.base_url = settings.gemini_base_url.rstrip("/")
     
-    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
-        """生成代码"""
-        try:
-            # 构建完整的提示
-            full_prompt = f"""
-            请根据以下需求生成代码：
-            
-            需求：{prompt}
-            
-            上下文信息：
-            - 技术栈：{context.get('tech_stack', 'Next.js + FastAPI')}
-            - 项目类型：{context.get('project_type', 'Web应用')}
-            - 文件路径：{context.get('file_path', '')}
-            
-            请生成完整、可运行的代码，并添加必要的注释。
-            """
-            
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt
-            )
-            
-            return response.text
-        except Exception as e:
-            return f"代码生成失败：{str(e)}"
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"x-goog-api-key": self.api_key}
     
-    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
-        """分析需求"""
-        try:
-            prompt = f"""
-            请分析以下项目需求，并提供技术栈建议：
-            
-            需求描述：{description}
-            
-            请以 JSON 格式返回分析结果，包含：
-            - tech_stack: 推荐的技术栈
-            - features: 主要功能列表
-            - complexity: 复杂度评估（简单/中等/复杂）
-            - estimated_time: 预估开发时间
-            """
-            
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                prompt
-            )
-            
-            # 这里应该解析 JSON 响应
-            # 暂时返回模拟数据
-            return {
-                "tech_stack": {
-                    "frontend": "nextjs",
-                    "backend": "fastapi",
-                    "database": "sqlite",
-                    "styling": "tailwind"
-                },
-                "features": ["用户认证", "项目管理", "聊天功能"],
-                "complexity": "中等",
-                "estimated_time": "2-3周"
-            }
-        except Exception as e:
-            return {
-                "error": f"需求分析失败：{str(e)}",
-                "tech_stack": {"frontend": "nextjs", "backend": "fastapi"},
-                "features": [],
-                "complexity": "未知"
-            }
+    def _request_body(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt.user}]}]}
+        if prompt.system:
+            body["systemInstruction"] = {"parts": [{"text": prompt.system}]}
+        if schema is not None:
+            # JSON 模式，输出受 responseSchema 约束
+            body["generationConfig"] = {"responseMimeType": "application/json", "responseSchema": schema}
+        return body
     
-    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
-        """建议改进"""
-        try:
-            prompt = f"""
-            请分析以下代码并提供改进建议：
-            
-            代码：
-            {code}
-            
-            反馈：
-            {feedback}
-            
-            请提供具体的改进建议。
-            """
-            
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                prompt
-            )
-            
-            # 将响应分割成建议列表
-            suggestions = response.text.split('\n')
-            return [s.strip() for s in suggestions if s.strip()]
-        except Exception as e:
-            return [f"改进建议生成失败：{str(e)}"]
+    @staticmethod
+    def _extract_text(data: Dict[str, Any]) -> str:
+        """从响应中提取文本，被安全策略拦截时没有候选内容"""
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
     
-    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
-        """聊天对话"""
-        try:
-            # 构建对话历史
-            chat_history = []
-            for msg in history:
-                if msg['role'] == 'user':
-                    chat_history.append(f"用户：{msg['content']}")
-                else:
-                    chat_history.append(f"助手：{msg['content']}")
-            
-            # 构建完整提示
-            history_text = '\n'.join(chat_history)
-            full_prompt = f"""
-            对话历史：
-            {history_text}
-            
-            用户新消息：{message}
-            
-            请作为 AI 编程助手回复，帮助用户解决编程问题。
-            """
-            
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                full_prompt
+    async def _generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> str:
+        """调用 generateContent 并返回完整文本"""
+        async with limited() as client:
+            response = await client.post(
+                f"{self.base_url}/models/{self.model_name}:generateContent",
+                headers=self._headers,
+                json=self._request_body(prompt, schema),
             )
-            
-            return response.text
-        except Exception as e:
-            return f"聊天回复失败：{str(e)}" 
\ No newline at end of file
+        response.raise_for_status()
+        return self._extract_text(response.json())
+    
+    async def _stream_generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """调用 streamGenerateContent（SSE）并逐段产出文本"""
+        async with limited() as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/models/{self.model_name}:streamGenerateContent",
+                params={"alt": "sse"},
+                headers=self._headers,
+                json=self._request_body(prompt, schema),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    text = self._extract_text(json.loads(line[5:]))
+                    if text:
+                        yield text
@@ -0,0 +1,127 @@
+"""带指标统计的 AI 客户端包装
+
+包在具体服务提供方的客户端外层（响应缓存之内），只统计真正发往上游的调用。
+"""
+import json
+import time
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional
+
+from app.core.metrics import (
+    LLM_ERRORS,
+    LLM_PROMPT_BYTES,
+    LLM_REQUEST_DURATION,
+    LLM_RESPONSE_BYTES,
+    LLM_TIME_TO_FIRST_TOKEN,
+    add_request_time,
+)
+from .base import BaseAIClient, AIErrorMessage, is_error_result
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+class InstrumentedAIClient(BaseAIClient):
+    """统计调用耗时、首字延迟、提示与响应大小以及错误数"""
+    
+    def __init__(self, client: BaseAIClient, provider: str):
+        self.client = client
+        self.provider = provider
+        self.model_name = getattr(client, "model_name", type(client).__name__)
+    
+    async def _observe(self, operation: str, prompt_size: int, call: Awaitable[Any]) -> Any:
+        labels = (self.provider, operation)
+        LLM_PROMPT_BYTES.observe(prompt_size, labels)
+        start = time.perf_counter()
+        try:
+            result = await call
+        except Exception:
+            LLM_ERRORS.inc(labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            LLM_REQUEST_DURATION.observe(elapsed, labels)
+            add_request_time("llm", elapsed)
+        
+        if is_error_result(result):
+            LLM_ERRORS.inc(labels)
+        else:
+            LLM_RESPONSE_BYTES.observe(_size(result), labels)
+        return result
+    
+    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
+        return await self._observe(
+            "generate_code", _size(prompt) + _size(context), self.client.generate_code(prompt, context)
+        )
+    
+    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
+        return await self._observe(
+            "analyze_requirements", _size(description), self.client.analyze_requirements(description)
+        )
+    
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._observe(
+            "plan_files", _size(description) + _size(analysis), self.client.plan_files(description, analysis)
+        )
+    
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await self._observe(
+            "edit_code",
+            _size(code) + _size(instruction) + _size(related_code or []),
+            self.client.edit_code(code, instruction, file_path, related_code)
+        )
+    
+    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
+        return await self._observe(
+            "suggest_improvements", _size(code) + _size(feedback), self.client.suggest_improvements(code, feedback)
+        )
+    
+    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
+        return await self._observe(
+            "chat", _size(message) + _size(history), self.client.chat(message, history)
+        )
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        labels = (self.provider, "stream_chat")
+        LLM_PROMPT_BYTES.observe(_size(message) + _size(history), labels)
+        start = time.perf_counter()
+        first_chunk = True
+        response_size = 0
+        failed = False
+        try:
+            async for chunk in self.client.stream_chat(message, history):
+                if first_chunk:
+                    LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, labels)
+                    first_chunk = False
+                if isinstance(chunk, AIErrorMessage):
+                    failed = True
+                else:
+                    response_size += _size(chunk)
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            LLM_REQUEST_DURATION.observe(elapsed, labels)
+            add_request_time("llm", elapsed)
+            if failed:
+                LLM_ERRORS.inc(labels)
+            else:
+                LLM_RESPONSE_BYTES.observe(response_size, labels)
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        return await self._observe(
+            "summarize", _size(summary) + _size(history), self.client.summarize(summary, history)
+        )
+    
+    async def aclose(self) -> None:
+        await self.client.aclose()
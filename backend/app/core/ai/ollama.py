@@ -0,0 +1,63 @@
+import json
+from typing import Dict, Any, AsyncIterator, Optional
+from .base import TextGenerationClient
+from .prompts import Prompt
+from .transport import limited
+from app.config import settings
+
+
+class OllamaClient(TextGenerationClient):
+    """Ollama AI 客户端
+    
+    调用本地或自建 Ollama 服务的 /api/generate 接口，与其他客户端共用异步连接池。
+    系统指令通过 system 字段发送；本地模型上下文较小，使用 templates/ollama/ 下更短的系统指令。
+    """
+    prompt_variant = "ollama"
+    
+    def __init__(self):
+        self.model_name = settings.ollama_model
+        self.base_url = settings.ollama_base_url.rstrip("/")
+    
+    def _request_body(
+        self,
+        prompt: Prompt,
+        stream: bool = False,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"model": self.model_name, "prompt": prompt.user, "stream": stream}
+        if prompt.system:
+            body["system"] = prompt.system
+        if schema is not None:
+            # format 接受 JSON Schema，输出受其约束
+            body["format"] = schema
+        return body
+    
+    async def _generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> str:
+        """调用 /api/generate 并返回完整文本"""
+        async with limited() as client:
+            response = await client.post(
+                f"{self.base_url}/api/generate",
+                json=self._request_body(prompt, schema=schema),
+            )
+        response.raise_for_status()
+        return response.json().get("response", "")
+    
+    async def _stream_generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """流式调用 /api/generate（每行一个 JSON 对象）并逐段产出文本"""
+        async with limited() as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/api/generate",
+                json=self._request_body(prompt, stream=True, schema=schema),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
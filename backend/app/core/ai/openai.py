@@ -0,0 +1,79 @@
+import json
+from typing import Dict, Any, AsyncIterator, Optional
+from .base import TextGenerationClient
+from .prompts import Prompt
+from .transport import limited
+from app.config import settings
+
+
+class OpenAIClient(TextGenerationClient):
+    """OpenAI AI 客户端
+    
+    调用 Chat Completions REST API（兼容 OpenAI 协议的服务可通过 OPENAI_BASE_URL 指定），
+    与其他客户端共用异步连接池。系统指令作为 system 消息放在最前，相同前缀可命中自动提示缓存。
+    """
+    prompt_variant = "openai"
+    
+    def __init__(self):
+        if not settings.openai_api_key:
+            raise ValueError("OPENAI_API_KEY 未配置")
+        
+        self.api_key = settings.openai_api_key
+        self.model_name = settings.openai_model
+        self.base_url = settings.openai_base_url.rstrip("/")
+    
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}"}
+    
+    def _request_body(
+        self,
+        prompt: Prompt,
+        stream: bool = False,
+        schema: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        messages = [{"role": "user", "content": prompt.user}]
+        if prompt.system:
+            messages.insert(0, {"role": "system", "content": prompt.system})
+        body: Dict[str, Any] = {"model": self.model_name, "messages": messages, "stream": stream}
+        if schema is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": schema},
+            }
+        return body
+    
+    async def _generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> str:
+        """调用 chat/completions 并返回完整文本"""
+        async with limited() as client:
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers,
+                json=self._request_body(prompt, schema=schema),
+            )
+        response.raise_for_status()
+        choices = response.json().get("choices") or []
+        if not choices:
+            return ""
+        return choices[0].get("message", {}).get("content") or ""
+    
+    async def _stream_generate(self, prompt: Prompt, schema: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """以 SSE 流式调用 chat/completions 并逐段产出文本"""
+        async with limited() as client:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._headers,
+                json=self._request_body(prompt, stream=True, schema=schema),
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    text = choices[0].get("delta", {}).get("content") if choices else None
+                    if text:
+                        yield text
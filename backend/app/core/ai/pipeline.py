@@ -0,0 +1,228 @@
+"""项目脚手架生成流水线
+
+先分析需求并规划文件清单（每个文件列出它引用的清单中其他文件），按依赖关系组成有向无环图：
+每个文件在它依赖的文件全部生成后立即开始生成，互不依赖的文件并发生成（同时进行的生成数受
+generation_concurrency 限制），总耗时取决于依赖链的长度而不是文件数。已生成的依赖文件内容作为
+相关代码加入提示，启用代码检索时再加入项目中已有文件的相关片段。生成过程中逐个文件产出进度事件，结束后通过 apply_file_operations 一次写入项目。
+"""
+import asyncio
+import posixpath
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.project import Project
+from app.core.storage.archive import LANGUAGES_BY_EXTENSION
+from app.core.storage.files import FileOperation, apply_file_operations
+from .base import BaseAIClient, is_error_result
+from .retrieval import related_code
+
+logger = structlog.get_logger()
+
+# (事件名, 数据)
+PipelineEvent = Tuple[str, Dict[str, Any]]
+
+# 每个文件以其中一个事件结束
+FILE_FINISHED_EVENTS = ("file_generated", "file_failed", "file_skipped")
+
+_CODE_BLOCK_PATTERN = re.compile(r"```[^\n`]*\n(.*?)```", re.DOTALL)
+
+
+class GenerationError(Exception):
+    """项目不存在，或需求分析、文件规划失败"""
+    pass
+
+
+@dataclass
+class FileTask:
+    """清单中的一个文件；depth 为依赖链上它之前的文件数"""
+    file_path: str
+    description: str
+    depends_on: List[str]
+    depth: int = 0
+
+
+def _clean_path(path: str) -> Optional[str]:
+    path = posixpath.normpath(str(path).replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../"):
+        return None
+    return path
+
+
+def build_file_graph(files: Sequence[Dict[str, Any]], max_files: Optional[int] = None) -> List[FileTask]:
+    """整理规划出的文件清单，按深度排序返回
+    
+    规范化路径，去掉重复的文件、越出项目目录的路径与清单外的依赖；存在循环依赖时，
+    去掉环上未满足依赖最少的文件的这些依赖。
+    """
+    max_files = max_files or settings.generation_max_files
+    tasks: Dict[str, FileTask] = {}
+    for item in files:
+        path = _clean_path(item.get("file_path") or "")
+        if path is None or path in tasks:
+            continue
+        if len(tasks) >= max_files:
+            break
+        tasks[path] = FileTask(path, item.get("description") or "", list(item.get("depends_on") or []))
+    
+    for task in tasks.values():
+        depends_on = []
+        for dependency in task.depends_on:
+            dependency = _clean_path(dependency)
+            if dependency in tasks and dependency != task.file_path and dependency not in depends_on:
+                depends_on.append(dependency)
+        task.depends_on = depends_on
+    
+    # 逐轮放入依赖已全部放入的文件
+    placed: Dict[str, FileTask] = {}
+    remaining = list(tasks.values())
+    while remaining:
+        ready = [task for task in remaining if all(dep in placed for dep in task.depends_on)]
+        if not ready:
+            task = min(remaining, key=lambda t: sum(dep not in placed for dep in t.depends_on))
+            logger.warning(
+                "Dropped cyclic file dependencies",
+                file_path=task.file_path,
+                dropped=[dep for dep in task.depends_on if dep not in placed]
+            )
+            task.depends_on = [dep for dep in task.depends_on if dep in placed]
+            ready = [task]
+        for task in ready:
+            task.depth = max((placed[dep].depth + 1 for dep in task.depends_on), default=0)
+            placed[task.file_path] = task
+        remaining = [task for task in remaining if task.file_path not in placed]
+    return sorted(placed.values(), key=lambda task: task.depth)
+
+
+def extract_code(text: str) -> str:
+    """取出回复中的代码：有 Markdown 代码块时取最长的一个，否则为整段回复"""
+    blocks = _CODE_BLOCK_PATTERN.findall(text)
+    if blocks:
+        return max(blocks, key=len)
+    return text.strip() + "\n"
+
+
+def _dependency_context(file_path: str, code: str) -> Dict[str, Any]:
+    """已生成的依赖文件，格式与检索到的相关代码一致（过长时只保留开头）"""
+    lines = code.splitlines(keepends=True)[:settings.generation_dependency_max_lines]
+    return {"file_path": file_path, "start_line": 1, "end_line": len(lines), "content": "".join(lines)}
+
+
+async def generate_project_files(
+    client: BaseAIClient,
+    project_id: int,
+    prompt: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[PipelineEvent]:
+    """生成项目文件并写入项目，逐步产出进度事件
+    
+    prompt 默认为项目的 initial_prompt；项目已设置技术栈时以它代替分析结果中的推荐。事件依次为：
+    analysis、plan、每个文件的 file_started 与 file_generated / file_failed / file_skipped（依赖的文件失败），
+    最后是 done（写入结果）。分析或规划失败时抛出 GenerationError。
+    """
+    async with SessionLocal() as db:
+        project = (await db.execute(
+            select(Project.initial_prompt, Project.tech_stack).where(Project.id == project_id)
+        )).first()
+    if project is None:
+        raise GenerationError(f"项目 {project_id} 不存在")
+    description = prompt or project.initial_prompt
+    
+    analysis = await client.analyze_requirements(description)
+    if is_error_result(analysis):
+        raise GenerationError(str(analysis["error"]))
+    analysis = dict(analysis)
+    if project.tech_stack:
+        analysis["tech_stack"] = project.tech_stack
+    yield "analysis", analysis
+    
+    plan = await client.plan_files(description, analysis)
+    if is_error_result(plan):
+        raise GenerationError(str(plan["error"]))
+    tasks = build_file_graph(plan.get("files") or [])
+    if not tasks:
+        raise GenerationError("文件清单为空")
+    yield "plan", {"depth": tasks[-1].depth + 1, "files": [asdict(task) for task in tasks]}
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    generated: Dict[str, asyncio.Future] = {task.file_path: loop.create_future() for task in tasks}
+    semaphore = asyncio.Semaphore(concurrency or settings.generation_concurrency)
+    tech_stack = " + ".join(str(value) for value in (analysis.get("tech_stack") or {}).values())
+    
+    async def run(task: FileTask) -> None:
+        code = None
+        try:
+            dependencies = {dep: await generated[dep] for dep in task.depends_on}
+            failed = [dep for dep, dep_code in dependencies.items() if dep_code is None]
+            if failed:
+                events.put_nowait(("file_skipped", {"file_path": task.file_path, "failed_dependencies": failed}))
+                return
+            
+            related = [_dependency_context(dep, dep_code) for dep, dep_code in dependencies.items()]
+            if settings.rag_enabled:
+                # 项目中已有的相关代码（依赖文件已完整加入，不再检索）
+                related += await related_code(project_id, f"{task.file_path}\n{task.description}", task.depends_on)
+            context = {
+                "tech_stack": tech_stack,
+                "project_description": description,
+                "file_path": task.file_path,
+                "related_code": related,
+            }
+            async with semaphore:
+                events.put_nowait(("file_started", {"file_path": task.file_path}))
+                result = await client.generate_code(task.description, context)
+            if is_error_result(result):
+                events.put_nowait(("file_failed", {"file_path": task.file_path, "error": str(result)}))
+                return
+            
+            result = extract_code(result)
+            size = len(result.encode("utf-8"))
+            if size > settings.max_file_size:
+                events.put_nowait(("file_failed", {"file_path": task.file_path, "error": "生成的文件过大"}))
+                return
+            code = result
+            events.put_nowait(("file_generated", {"file_path": task.file_path, "size": size}))
+        except Exception as e:
+            events.put_nowait(("file_failed", {"file_path": task.file_path, "error": str(e) or type(e).__name__}))
+        finally:
+            # 依赖这个文件的任务据此继续或跳过
+            generated[task.file_path].set_result(code)
+    
+    workers = [asyncio.create_task(run(task)) for task in tasks]
+    try:
+        finished = 0
+        while finished < len(tasks):
+            event = await events.get()
+            if event[0] in FILE_FINISHED_EVENTS:
+                finished += 1
+            yield event
+    finally:
+        # 调用方提前停止（如客户端断开）时取消未完成的生成
+        for worker in workers:
+            worker.cancel()
+    
+    operations = [
+        FileOperation(
+            action="upsert",
+            file_path=task.file_path,
+            content=generated[task.file_path].result(),
+            language=LANGUAGES_BY_EXTENSION.get(posixpath.splitext(task.file_path)[1].lower())
+        )
+        for task in tasks
+        if generated[task.file_path].result() is not None
+    ]
+    results = []
+    if operations:
+        async with SessionLocal() as db:
+            results = await apply_file_operations(db, project_id, operations)
+            await db.commit()
+    yield "done", {
+        "files": [asdict(result) for result in results],
+        "failed": [task.file_path for task in tasks if generated[task.file_path].result() is None],
+    }
@@ -0,0 +1,110 @@
+"""提示模板
+
+提示以 Jinja2 模板保存在 templates/ 目录，加载时规范化模板文本中的空白（去掉行尾空白与多余空行，
+块标签所在行不产生输出），渲染时变量原样插入，不改动代码内容。模板编译一次后常驻内存。
+
+每个提示分为两部分：system 为所有调用逐字相同的系统指令（templates/system.j2），user 为本次调用的内容。
+user 模板先写该操作固定的说明，再写同一会话或项目中不常变化的内容（文件内容、对话历史），
+最后才是每次调用都不同的内容（修改要求、新消息），使相邻调用共享尽可能长的前缀，
+服务提供方的提示前缀缓存可以复用。服务提供方可以在 templates/<变体>/ 下覆盖任意模板，找不到时使用默认模板。
+"""
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, List, Optional
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template
+
+from app.core.metrics import LLM_PROMPT_TOKENS
+from .context import estimate_tokens
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TEMPLATE_SUFFIX = ".j2"
+
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """渲染后的提示"""
+    system: str
+    user: str
+    
+    @property
+    def text(self) -> str:
+        """合并为一段文本"""
+        return f"{self.system}\n\n{self.user}" if self.system else self.user
+
+
+def _normalize(source: str) -> str:
+    """去掉模板文本的行尾空白、首尾空行，连续空行合并为一行"""
+    source = "\n".join(line.rstrip() for line in source.splitlines())
+    return _BLANK_LINES.sub("\n\n", source).strip("\n") + "\n"
+
+
+class _NormalizingLoader(FileSystemLoader):
+    """读取模板时规范化空白，规范化只作用于模板文本本身"""
+    
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        return _normalize(source), filename, uptodate
+
+
+_environment = Environment(
+    loader=_NormalizingLoader(TEMPLATE_DIR),
+    undefined=StrictUndefined,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=False,
+    auto_reload=False,
+    cache_size=-1,
+)
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str, variant: Optional[str] = None) -> Template:
+    """取得编译后的模板，variant 不为空时优先使用该变体的模板"""
+    names = [f"{name}{TEMPLATE_SUFFIX}"]
+    if variant:
+        names.insert(0, f"{variant}/{name}{TEMPLATE_SUFFIX}")
+    return _environment.select_template(names)
+
+
+def template_names() -> List[str]:
+    """所有默认模板的名称（不含系统指令）"""
+    return sorted(
+        name[:-len(TEMPLATE_SUFFIX)]
+        for name in _environment.list_templates(extensions=[TEMPLATE_SUFFIX[1:]])
+        if "/" not in name and name != f"system{TEMPLATE_SUFFIX}"
+    )
+
+
+def template_variants() -> List[str]:
+    """模板目录中的服务提供方变体"""
+    return sorted({name.split("/", 1)[0] for name in _environment.list_templates() if "/" in name})
+
+
+def precompile() -> int:
+    """启动时编译所有模板及其变体，返回模板数"""
+    count = 0
+    for variant in [None, *template_variants()]:
+        for name in ["system", *template_names()]:
+            get_template(name, variant)
+            count += 1
+        system_prompt(variant)
+    return count
+
+
+@lru_cache(maxsize=None)
+def system_prompt(variant: Optional[str] = None) -> str:
+    """系统指令（不含变量，只渲染一次）"""
+    return get_template("system", variant).render()
+
+
+def render_prompt(name: str, variant: Optional[str] = None, **context: Any) -> Prompt:
+    """渲染提示，并按模板记录估算的 token 数"""
+    prompt = Prompt(system=system_prompt(variant), user=get_template(name, variant).render(**context))
+    LLM_PROMPT_TOKENS.observe(estimate_tokens(prompt.system), (name, "system"))
+    LLM_PROMPT_TOKENS.observe(estimate_tokens(prompt.user), (name, "user"))
+    return prompt
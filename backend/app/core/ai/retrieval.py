@@ -0,0 +1,410 @@
+"""项目代码检索（生成代码时的相关上下文）
+
+文件内容按行切分为不重叠的片段（尽量在空行处断开），每个片段连同文件路径表示为哈希 n-gram 向量：
+标识符按驼峰与下划线拆分为小写词，取词与相邻词对哈希到 2^18 维，词频取对数后归一化。
+每个片段只有几十到几百个非零维，按项目以按维度排序的稀疏形式（倒排，行号为 int32、值为 float16）
+保存在 NumPy 数组中，检索只读取查询中出现的维度；片段文本不常驻内存，命中后再从对象存储读取。
+
+索引缓存在进程内（按最近使用淘汰）。每次检索先查询项目文件的 content_hash，只重新向量化新增或
+变化的文件并删除已不存在文件的行；相似度按索引中各维的文档频率做 IDF 加权，取前 k 个片段，
+在 token 预算内加入提示。
+"""
+import asyncio
+import re
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import structlog
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.project import ProjectFile
+from app.core.storage.blobs import BlobStore, blob_store
+from .context import estimate_tokens
+
+logger = structlog.get_logger()
+
+# 哈希维数：足够大使不同特征几乎不会落入同一维
+HASH_DIM = 1 << 18
+# 超过此大小的文件（通常是生成或压缩后的代码）不参与检索
+MAX_INDEXED_FILE_SIZE = 256 * 1024
+# 新增或变化的文件每批读取的数量
+LOAD_BATCH_FILES = 500
+# 相关度低于最佳片段这个比例的片段不加入提示
+MIN_RELATIVE_SCORE = 0.2
+# 索引段数上限与失效行比例上限，超过时合并
+MAX_SEGMENTS = 8
+MAX_DEAD_RATIO = 0.25
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]+|[0-9]+|[^\x00-\x7f\s]")
+_SUBWORD_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % HASH_DIM
+
+
+def _features(text: str) -> List[int]:
+    """文本的特征：完整标识符、拆分后的词与相邻词对（单个字母的变量名不计）"""
+    buckets: List[int] = []
+    previous: Optional[str] = None
+    for token in _TOKEN_PATTERN.findall(text):
+        lowered = token.lower()
+        parts = [part.lower() for part in _SUBWORD_PATTERN.findall(token)] or [lowered]
+        if len(parts) > 1:
+            buckets.append(_bucket(lowered))
+        for part in parts:
+            buckets.append(_bucket(part))
+            if previous is not None:
+                buckets.append(_bucket(previous + " " + part))
+            previous = part
+    return buckets
+
+
+def embed(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """文本向量化，返回稀疏向量的维度（升序）与归一化后的值"""
+    features, counts = np.unique(np.asarray(_features(text), dtype=np.int32), return_counts=True)
+    values = np.log1p(counts.astype(np.float32))
+    norm = np.linalg.norm(values)
+    if norm > 0:
+        values /= norm
+    return features, values
+
+
+def chunk_lines(content: str, max_lines: Optional[int] = None) -> List[Tuple[int, int, str]]:
+    """按行切分为不重叠的片段，返回 (起始行, 结束行, 文本)，行号从 1 开始"""
+    max_lines = max_lines or settings.rag_chunk_lines
+    lines = content.splitlines(keepends=True)
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end = min(start + max_lines, len(lines))
+        if end < len(lines):
+            # 在后半段中找最后一个空行断开，避免切断函数
+            for i in range(end, start + max_lines // 2, -1):
+                if not lines[i - 1].strip():
+                    end = i
+                    break
+        text = "".join(lines[start:end])
+        if text.strip():
+            chunks.append((start + 1, end, text))
+        start = end
+    return chunks
+
+
+@dataclass
+class _IndexedFile:
+    file_path: str
+    content_hash: str
+
+
+@dataclass
+class CodeChunkHit:
+    """检索到的片段"""
+    file_id: int
+    file_path: str
+    content_hash: str
+    start_line: int
+    end_line: int
+    score: float
+
+
+@dataclass
+class _Segment:
+    """按维度排序的一批非零元素（倒排）：维度 f 的元素位于 [indptr[f], indptr[f + 1])"""
+    indptr: np.ndarray
+    rows: np.ndarray
+    values: np.ndarray
+    
+    @classmethod
+    def build(cls, rows: np.ndarray, features: np.ndarray, values: np.ndarray) -> "_Segment":
+        order = np.argsort(features, kind="stable")
+        indptr = np.zeros(HASH_DIM + 1, dtype=np.int32)
+        np.cumsum(np.bincount(features, minlength=HASH_DIM), out=indptr[1:])
+        return cls(indptr, rows[order], values[order])
+    
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.rows.nbytes + self.values.nbytes
+    
+    def features(self) -> np.ndarray:
+        """每个元素的维度"""
+        return np.repeat(np.arange(HASH_DIM, dtype=np.int32), np.diff(self.indptr))
+    
+    def features_at(self, positions: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.indptr, positions, side="right") - 1
+    
+    def lookup(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """查询维度对应的元素位置，以及每个位置属于第几个查询维度"""
+        starts = self.indptr[features]
+        lengths = self.indptr[features + 1] - starts
+        which = np.repeat(np.arange(len(features)), lengths)
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+        return positions, which
+
+
+class ProjectCodeIndex:
+    """单个项目的片段向量索引
+    
+    每个片段一行（file_ids、lines），非零元素按维度排序保存在若干段中。新增文件追加一段，
+    删除只把行标记为失效；段数过多时合并新增的段，失效行过多时整体重建。
+    """
+    
+    def __init__(self):
+        self.file_ids = np.zeros(0, dtype=np.int64)
+        self.lines = np.zeros((0, 2), dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.dead_rows = 0
+        self.segments: List[_Segment] = []
+        # 各维出现过的（有效）片段数，用于 IDF
+        self.document_frequency = np.zeros(HASH_DIM, dtype=np.int32)
+        self.files: Dict[int, _IndexedFile] = {}
+        # 同步时项目文件的（数量、最大 id、最后更新时间），未变化时跳过逐个比对
+        self.fingerprint: Optional[Tuple[Any, ...]] = None
+    
+    def __len__(self) -> int:
+        return len(self.file_ids) - self.dead_rows
+    
+    @property
+    def nbytes(self) -> int:
+        """索引占用的字节数"""
+        return sum(segment.nbytes for segment in self.segments) + sum(a.nbytes for a in (
+            self.file_ids, self.lines, self.alive, self.document_frequency
+        ))
+    
+    def remove(self, file_ids: Sequence[int]) -> None:
+        if not file_ids:
+            return
+        removed = np.isin(self.file_ids, np.asarray(file_ids, dtype=np.int64)) & self.alive
+        for file_id in file_ids:
+            self.files.pop(file_id, None)
+        if not removed.any():
+            return
+        for segment in self.segments:
+            positions = np.flatnonzero(removed[segment.rows])
+            if len(positions):
+                self.document_frequency -= np.bincount(
+                    segment.features_at(positions), minlength=HASH_DIM
+                ).astype(np.int32)
+        self.alive &= ~removed
+        self.dead_rows += int(removed.sum())
+        if self.dead_rows > len(self.file_ids) * MAX_DEAD_RATIO:
+            self._compact()
+    
+    def add(self, files: Sequence[Tuple[int, str, str, str]]) -> None:
+        """加入文件 (file_id, file_path, content_hash, content)，同一文件需先 remove"""
+        file_ids: List[int] = []
+        lines: List[Tuple[int, int]] = []
+        rows: List[np.ndarray] = []
+        features: List[np.ndarray] = []
+        values: List[np.ndarray] = []
+        row = len(self.file_ids)
+        for file_id, file_path, digest, content in files:
+            self.files[file_id] = _IndexedFile(file_path, digest)
+            for start, end, text in chunk_lines(content):
+                chunk_features, chunk_values = embed(f"{file_path}\n{text}")
+                file_ids.append(file_id)
+                lines.append((start, end))
+                rows.append(np.full(len(chunk_features), row, dtype=np.int32))
+                features.append(chunk_features)
+                values.append(chunk_values.astype(np.float16))
+                row += 1
+        if not file_ids:
+            return
+        new_features = np.concatenate(features)
+        self.document_frequency += np.bincount(new_features, minlength=HASH_DIM).astype(np.int32)
+        self.file_ids = np.concatenate([self.file_ids, np.asarray(file_ids, dtype=np.int64)])
+        self.lines = np.concatenate([self.lines, np.asarray(lines, dtype=np.int32)])
+        self.alive = np.concatenate([self.alive, np.ones(len(file_ids), dtype=bool)])
+        self.segments.append(_Segment.build(np.concatenate(rows), new_features, np.concatenate(values)))
+        if len(self.segments) > MAX_SEGMENTS:
+            # 保留第一段（通常是首次建立的大段），合并之后追加的小段
+            self.segments[1:] = [self._merge(self.segments[1:])]
+    
+    def _merge(self, segments: List[_Segment], renumber: Optional[np.ndarray] = None) -> _Segment:
+        """合并若干段，只保留有效行的元素；renumber 为行号的重新编号"""
+        rows, features, values = [], [], []
+        for segment in segments:
+            keep = self.alive[segment.rows]
+            segment_rows = segment.rows[keep]
+            rows.append(segment_rows if renumber is None else renumber[segment_rows])
+            features.append(segment.features()[keep])
+            values.append(segment.values[keep])
+        return _Segment.build(np.concatenate(rows), np.concatenate(features), np.concatenate(values))
+    
+    def _compact(self) -> None:
+        """去掉失效行并把所有段合并为一段"""
+        renumber = (np.cumsum(self.alive) - 1).astype(np.int32)
+        self.segments = [self._merge(self.segments, renumber)] if self.segments else []
+        self.file_ids = self.file_ids[self.alive]
+        self.lines = self.lines[self.alive]
+        self.alive = np.ones(len(self.file_ids), dtype=bool)
+        self.dead_rows = 0
+    
+    def search(self, query: str, k: int, exclude: Sequence[str] = ()) -> List[CodeChunkHit]:
+        """按 IDF 加权的相似度取前 k 个片段，只读取查询中出现的维度；exclude 中的文件路径不参与排序"""
+        features, values = embed(query)
+        if not len(self) or not len(features) or k <= 0:
+            return []
+        idf = np.log((1 + len(self)) / (1 + self.document_frequency[features])) + 1
+        weights = (values * idf).astype(np.float32)
+        scores = np.zeros(len(self.file_ids), dtype=np.float64)
+        for segment in self.segments:
+            positions, which = segment.lookup(features)
+            scores += np.bincount(
+                segment.rows[positions],
+                weights=segment.values[positions] * weights[which],
+                minlength=len(self.file_ids)
+            )
+        scores[~self.alive] = 0
+        if exclude:
+            excluded = [file_id for file_id, indexed in self.files.items() if indexed.file_path in exclude]
+            scores[np.isin(self.file_ids, np.asarray(excluded, dtype=np.int64))] = 0
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for row in top:
+            if scores[row] <= 0 or scores[row] < scores[top[0]] * MIN_RELATIVE_SCORE:
+                break
+            file_id = int(self.file_ids[row])
+            indexed = self.files[file_id]
+            hits.append(CodeChunkHit(
+                file_id=file_id,
+                file_path=indexed.file_path,
+                content_hash=indexed.content_hash,
+                start_line=int(self.lines[row, 0]),
+                end_line=int(self.lines[row, 1]),
+                score=float(scores[row]),
+            ))
+        return hits
+
+
+class CodeRetriever:
+    """按项目缓存片段索引并检索相关代码"""
+    
+    def __init__(
+        self,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        max_projects: Optional[int] = None,
+        store: BlobStore = blob_store,
+    ):
+        self.top_k = top_k or settings.rag_top_k
+        self.token_budget = token_budget or settings.rag_token_budget
+        self.max_projects = max_projects or settings.rag_cache_size
+        self.store = store
+        self._indexes: "OrderedDict[int, ProjectCodeIndex]" = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = {}
+    
+    def _get_index(self, project_id: int) -> ProjectCodeIndex:
+        index = self._indexes.get(project_id)
+        if index is None:
+            index = self._indexes[project_id] = ProjectCodeIndex()
+            while len(self._indexes) > self.max_projects:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._locks.pop(evicted, None)
+        else:
+            self._indexes.move_to_end(project_id)
+        return index
+    
+    async def _read(self, digest: str) -> str:
+        return (await self.store.get(digest)).decode("utf-8")
+    
+    async def sync(self, db: AsyncSession, project_id: int) -> ProjectCodeIndex:
+        """把项目索引与数据库中的文件同步（只处理新增、变化与删除的文件）"""
+        index = self._get_index(project_id)
+        conditions = (
+            ProjectFile.project_id == project_id,
+            ProjectFile.content_hash.is_not(None),
+            ProjectFile.size <= MAX_INDEXED_FILE_SIZE,
+        )
+        # 内容变化会更新 updated_at、新增文件会增大 id、删除会减少数量，三者都没变时无需比对
+        fingerprint = tuple((await db.execute(
+            select(func.count(), func.max(ProjectFile.id), func.max(ProjectFile.updated_at)).where(*conditions)
+        )).one())
+        if fingerprint == index.fingerprint:
+            return index
+        
+        current = {
+            row.id: row
+            for row in (await db.execute(
+                select(ProjectFile.id, ProjectFile.file_path, ProjectFile.content_hash).where(*conditions)
+            )).all()
+        }
+        stale = [
+            file_id for file_id, indexed in index.files.items()
+            if file_id not in current
+            or current[file_id].content_hash != indexed.content_hash
+            or current[file_id].file_path != indexed.file_path
+        ]
+        # 索引的更新在线程中进行，避免阻塞事件循环
+        await asyncio.to_thread(index.remove, stale)
+        changed = [row for file_id, row in current.items() if file_id not in index.files]
+        for start in range(0, len(changed), LOAD_BATCH_FILES):
+            batch = changed[start:start + LOAD_BATCH_FILES]
+            contents = await asyncio.gather(*(self._read(row.content_hash) for row in batch))
+            await asyncio.to_thread(index.add, [
+                (row.id, row.file_path, row.content_hash, content) for row, content in zip(batch, contents)
+            ])
+        index.fingerprint = fingerprint
+        return index
+    
+    async def retrieve(
+        self,
+        db: AsyncSession,
+        project_id: int,
+        query: str,
+        exclude: Sequence[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """检索与 query 相关的片段，按相关度排列，总长度不超过 token 预算；exclude 为已在提示中的文件路径"""
+        lock = self._locks.setdefault(project_id, asyncio.Lock())
+        async with lock:
+            index = await self.sync(db, project_id)
+            hits = await asyncio.to_thread(index.search, query, self.top_k, frozenset(exclude))
+        
+        contents: Dict[str, List[str]] = {}
+        related: List[Dict[str, Any]] = []
+        used = 0
+        for hit in hits:
+            if hit.content_hash not in contents:
+                contents[hit.content_hash] = (await self._read(hit.content_hash)).splitlines(keepends=True)
+            text = "".join(contents[hit.content_hash][hit.start_line - 1:hit.end_line])
+            tokens = estimate_tokens(text)
+            if used + tokens > self.token_budget:
+                continue
+            used += tokens
+            related.append({
+                "file_path": hit.file_path,
+                "start_line": hit.start_line,
+                "end_line": hit.end_line,
+                "content": text,
+            })
+        return related
+    
+    def invalidate(self, project_id: int) -> None:
+        """项目被删除时丢弃缓存的索引"""
+        self._indexes.pop(project_id, None)
+        self._locks.pop(project_id, None)
+
+
+async def related_code(project_id: int, query: str, exclude: Sequence[str] = ()) -> List[Dict[str, Any]]:
+    """使用独立会话检索项目中的相关代码；检索失败时返回空列表，不影响生成"""
+    try:
+        async with SessionLocal() as db:
+            return await code_retriever.retrieve(db, project_id, query, exclude)
+    except Exception as e:
+        logger.warning("Code retrieval failed", project_id=project_id, error=str(e))
+        return []
+
+
+# 全局代码检索器
+code_retriever = CodeRetriever()
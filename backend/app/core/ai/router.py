@@ -0,0 +1,283 @@
+"""多服务提供方路由
+
+RouterAIClient 本身实现 BaseAIClient，把每次调用转发给当前最快的健康后端：
+- 按滑动窗口统计各后端的 p50/p95 延迟与错误率，按 p50（以错误率加权）排序选择
+- 请求超过首选后端的 p95 仍未返回时，向下一个后端发起对冲请求，取先成功的结果
+- 调用失败（异常或错误结果）时依次故障转移到其他后端
+- 连续失败或错误率过高的后端触发熔断，冷却期后放行一个试探请求（半开）
+流式聊天只在产出第一段文本之前故障转移，不做对冲。
+调用方可以通过 backend_limiter 为各后端设置并发上限（后台任务按服务提供方限制并发）。
+"""
+import asyncio
+import contextlib
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.config import settings
+from .base import BaseAIClient, AIErrorMessage, is_error_result
+
+logger = structlog.get_logger()
+
+# 按后端名称取得并发限制的信号量；未设置时不限制。延迟统计从取得信号量后开始
+backend_limiter: ContextVar[Optional[Callable[[str], asyncio.Semaphore]]] = ContextVar("backend_limiter", default=None)
+
+
+@dataclass
+class BackendStats:
+    """单个后端的延迟、错误率与熔断状态"""
+    window: int
+    latencies: Deque[float] = field(default_factory=deque)
+    outcomes: Deque[bool] = field(default_factory=deque)
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    trial_in_flight: bool = False
+    
+    def __post_init__(self):
+        self.latencies = deque(maxlen=self.window)
+        self.outcomes = deque(maxlen=self.window)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+    
+    @property
+    def state(self) -> str:
+        if self.open_until == 0.0:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+
+class RouterAIClient(BaseAIClient):
+    """按延迟与健康状况在多个 AI 后端之间路由的客户端"""
+    
+    def __init__(
+        self,
+        backends: Dict[str, BaseAIClient],
+        window: Optional[int] = None,
+        failure_threshold: Optional[int] = None,
+        error_rate_threshold: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        hedge_min_delay: Optional[float] = None,
+        min_samples: Optional[int] = None,
+    ):
+        if not backends:
+            raise ValueError("至少需要一个 AI 后端")
+        self.backends = backends
+        self.model_name = "router:" + ",".join(backends)
+        self.failure_threshold = failure_threshold or settings.ai_router_failure_threshold
+        self.error_rate_threshold = (
+            error_rate_threshold if error_rate_threshold is not None else settings.ai_router_error_rate_threshold
+        )
+        self.cooldown = cooldown if cooldown is not None else settings.ai_router_cooldown
+        self.hedge = hedge if hedge is not None else settings.ai_router_hedge
+        self.hedge_min_delay = hedge_min_delay if hedge_min_delay is not None else settings.ai_router_hedge_min_delay
+        self.min_samples = min_samples or settings.ai_router_min_samples
+        window = window or settings.ai_router_window
+        self.stats: Dict[str, BackendStats] = {name: BackendStats(window) for name in backends}
+    
+    def _score(self, name: str) -> float:
+        stats = self.stats[name]
+        p50 = stats.percentile(0.5)
+        if p50 is None:
+            # 没有样本的后端优先尝试，以便尽快获得延迟数据
+            return 0.0
+        return p50 / max(1.0 - stats.error_rate, 0.1)
+    
+    def _available(self, name: str) -> bool:
+        stats = self.stats[name]
+        state = stats.state
+        if state == "closed":
+            return True
+        return state == "half_open" and not stats.trial_in_flight
+    
+    def candidates(self) -> List[str]:
+        """按优先级排列的可用后端；全部熔断时按最早恢复的顺序返回全部后端"""
+        available = [name for name in self.backends if self._available(name)]
+        if not available:
+            return sorted(self.backends, key=lambda name: self.stats[name].open_until)
+        return sorted(available, key=self._score)
+    
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        if not self.hedge:
+            return None
+        stats = self.stats[name]
+        if len(stats.latencies) < self.min_samples:
+            return None
+        return max(stats.percentile(0.95), self.hedge_min_delay)
+    
+    def _begin(self, name: str) -> None:
+        stats = self.stats[name]
+        if stats.state == "half_open":
+            stats.trial_in_flight = True
+    
+    def _record(self, name: str, ok: bool, elapsed: Optional[float]) -> None:
+        stats = self.stats[name]
+        stats.trial_in_flight = False
+        stats.outcomes.append(ok)
+        if ok:
+            if elapsed is not None:
+                stats.latencies.append(elapsed)
+            if stats.open_until:
+                logger.info("AI backend recovered", backend=name)
+            stats.consecutive_failures = 0
+            stats.open_until = 0.0
+            return
+        
+        stats.consecutive_failures += 1
+        tripped = (
+            stats.consecutive_failures >= self.failure_threshold
+            or (len(stats.outcomes) >= self.min_samples and stats.error_rate >= self.error_rate_threshold)
+            # 半开状态下的试探失败直接重新熔断
+            or stats.open_until
+        )
+        if tripped:
+            stats.open_until = time.monotonic() + self.cooldown
+            logger.warning(
+                "AI backend circuit opened",
+                backend=name,
+                consecutive_failures=stats.consecutive_failures,
+                error_rate=round(stats.error_rate, 3),
+            )
+    
+    async def _attempt(self, name: str, call: Callable[[BaseAIClient], Awaitable[Any]]) -> Tuple[bool, Any]:
+        """调用一个后端并记录结果，返回 (是否成功, 结果或异常)"""
+        limiter = backend_limiter.get()
+        self._begin(name)
+        try:
+            async with limiter(name) if limiter is not None else contextlib.nullcontext():
+                start = time.perf_counter()
+                result = await call(self.backends[name])
+        except asyncio.CancelledError:
+            # 对冲请求落败被取消，不计入统计
+            self.stats[name].trial_in_flight = False
+            raise
+        except Exception as e:
+            self._record(name, False, None)
+            return False, e
+        ok = not is_error_result(result)
+        self._record(name, ok, time.perf_counter() - start)
+        return ok, result
+    
+    async def _call(self, call: Callable[[BaseAIClient], Awaitable[Any]]) -> Any:
+        pending = self.candidates()
+        running: Dict[asyncio.Task, str] = {}
+        last_failure: Any = None
+        
+        try:
+            while pending or running:
+                if not running:
+                    name = pending.pop(0)
+                    running[asyncio.create_task(self._attempt(name, call))] = name
+                    continue
+                
+                # 最近发起的请求超过其 p95 仍未完成时发起对冲请求
+                timeout = self._hedge_delay(list(running.values())[-1]) if pending else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    name = pending.pop(0)
+                    logger.debug("Hedging AI request", backend=name)
+                    running[asyncio.create_task(self._attempt(name, call))] = name
+                    continue
+                
+                for task in done:
+                    running.pop(task)
+                    ok, value = task.result()
+                    if ok:
+                        return value
+                    last_failure = value
+        finally:
+            for task in running:
+                task.cancel()
+        
+        if isinstance(last_failure, Exception):
+            raise last_failure
+        return last_failure
+    
+    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
+        return await self._call(lambda client: client.generate_code(prompt, context))
+    
+    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
+        return await self._call(lambda client: client.analyze_requirements(description))
+    
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._call(lambda client: client.plan_files(description, analysis))
+    
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await self._call(lambda client: client.edit_code(code, instruction, file_path, related_code))
+    
+    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
+        return await self._call(lambda client: client.suggest_improvements(code, feedback))
+    
+    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
+        return await self._call(lambda client: client.chat(message, history))
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        return await self._call(lambda client: client.summarize(summary, history))
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        last_error: Optional[str] = None
+        for name in self.candidates():
+            self._begin(name)
+            start = time.perf_counter()
+            # 以首段延迟作为流式调用的延迟样本
+            first_chunk_latency: Optional[float] = None
+            try:
+                async for chunk in self.backends[name].stream_chat(message, history):
+                    if isinstance(chunk, AIErrorMessage):
+                        raise RuntimeError(chunk)
+                    if first_chunk_latency is None:
+                        first_chunk_latency = time.perf_counter() - start
+                    yield chunk
+            except Exception as e:
+                self._record(name, False, None)
+                if first_chunk_latency is not None:
+                    # 已经向调用方输出了部分内容，无法切换后端
+                    yield AIErrorMessage(f"聊天回复失败：{str(e)}")
+                    return
+                last_error = str(e)
+                logger.warning("AI stream failed, failing over", backend=name, error=last_error)
+                continue
+            finally:
+                # 调用方提前结束迭代时也要释放半开状态的试探名额
+                self.stats[name].trial_in_flight = False
+            
+            self._record(name, True, first_chunk_latency if first_chunk_latency is not None else time.perf_counter() - start)
+            return
+        yield AIErrorMessage(f"聊天回复失败：{last_error}")
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """各后端的延迟、错误率与熔断状态"""
+        return {
+            name: {
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+                "error_rate": stats.error_rate,
+                "state": stats.state,
+                "samples": len(stats.latencies),
+            }
+            for name, stats in self.stats.items()
+        }
+    
+    async def aclose(self) -> None:
+        for client in self.backends.values():
+            await client.aclose()
@@ -0,0 +1,175 @@
+"""相同 AI 请求的合并（single-flight）
+
+同一时刻规范化（Unicode 形式与空白，保留大小写）后相同的请求只向上游发起一次调用，其余请求等待并共享结果；流式聊天由一个后台任务
+读取上游流，把已收到的分段广播给所有订阅者（后加入的订阅者先补发已有分段）。
+所有等待方都离开后取消上游调用。位于响应缓存之内，只合并缓存未命中的请求。
+"""
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from app.core.metrics import registry
+from .base import BaseAIClient
+from .cache import make_cache_key
+
+SINGLEFLIGHT_CALLS = registry.counter(
+    "kidvibe_ai_singleflight_calls_total", "Upstream AI calls started by the single-flight layer", ("endpoint",)
+)
+SINGLEFLIGHT_COALESCED = registry.counter(
+    "kidvibe_ai_coalesced_requests_total", "AI requests served by joining an identical in-flight call", ("endpoint",)
+)
+
+
+class _InFlight:
+    """进行中的普通调用"""
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamBroadcast:
+    """进行中的流式调用，把上游分段广播给所有订阅者"""
+    
+    def __init__(self, on_finish: Callable[[], None]):
+        self.on_finish = on_finish
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def run(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            await source.aclose()
+            self.done = True
+            self.on_finish()
+            self._notify()
+    
+    async def subscribe(self) -> AsyncIterator[str]:
+        self.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(self.chunks):
+                    yield self.chunks[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                # 之后到达的相同请求重新发起调用，而不是加入即将取消的广播
+                self.on_finish()
+                self.task.cancel()
+
+
+class SingleFlightAIClient(BaseAIClient):
+    """合并相同并发请求的 AI 客户端包装"""
+    
+    def __init__(self, client: BaseAIClient):
+        self.client = client
+        self.model_name = getattr(client, "model_name", type(client).__name__)
+        self._calls: Dict[str, _InFlight] = {}
+        self._streams: Dict[str, _StreamBroadcast] = {}
+    
+    def _release(self, key: str, inflight: _InFlight) -> None:
+        if self._calls.get(key) is inflight:
+            del self._calls[key]
+    
+    async def _coalesce(self, endpoint: str, prompt: str, context: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+        key = make_cache_key(endpoint, self.model_name, prompt, context)
+        inflight = self._calls.get(key)
+        if inflight is None:
+            inflight = self._calls[key] = _InFlight(asyncio.ensure_future(call()))
+            inflight.task.add_done_callback(lambda _: self._release(key, inflight))
+            SINGLEFLIGHT_CALLS.inc((endpoint,))
+        else:
+            SINGLEFLIGHT_COALESCED.inc((endpoint,))
+        
+        inflight.waiters += 1
+        try:
+            # shield：单个等待方被取消不影响其他等待方
+            return await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if inflight.waiters == 0 and not inflight.task.done():
+                self._release(key, inflight)
+                inflight.task.cancel()
+    
+    async def generate_code(self, prompt: str, context: Dict[str, Any]) -> str:
+        return await self._coalesce(
+            "generate_code", prompt, context, lambda: self.client.generate_code(prompt, context)
+        )
+    
+    async def analyze_requirements(self, description: str) -> Dict[str, Any]:
+        return await self._coalesce(
+            "analyze_requirements", description, None, lambda: self.client.analyze_requirements(description)
+        )
+    
+    async def plan_files(self, description: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._coalesce(
+            "plan_files", description, analysis, lambda: self.client.plan_files(description, analysis)
+        )
+    
+    async def edit_code(
+        self,
+        code: str,
+        instruction: str,
+        file_path: str,
+        related_code: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        return await self._coalesce(
+            "edit_code", instruction, {"file_path": file_path, "code": code, "related_code": related_code},
+            lambda: self.client.edit_code(code, instruction, file_path, related_code)
+        )
+    
+    async def suggest_improvements(self, code: str, feedback: str) -> List[str]:
+        return await self._coalesce(
+            "suggest_improvements", feedback, code, lambda: self.client.suggest_improvements(code, feedback)
+        )
+    
+    async def chat(self, message: str, history: List[Dict[str, str]]) -> str:
+        return await self._coalesce("chat", message, history, lambda: self.client.chat(message, history))
+    
+    async def summarize(self, summary: str, history: List[Dict[str, str]]) -> str:
+        return await self._coalesce(
+            "summarize", summary, history, lambda: self.client.summarize(summary, history)
+        )
+    
+    def _release_stream(self, key: str, broadcast: _StreamBroadcast) -> None:
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+    
+    async def stream_chat(self, message: str, history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        key = make_cache_key("stream_chat", self.model_name, message, history)
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = self._streams[key] = _StreamBroadcast(lambda: self._release_stream(key, broadcast))
+            broadcast.task = asyncio.create_task(broadcast.run(self.client.stream_chat(message, history)))
+            SINGLEFLIGHT_CALLS.inc(("stream_chat",))
+        else:
+            SINGLEFLIGHT_COALESCED.inc(("stream_chat",))
+        
+        async for chunk in broadcast.subscribe():
+            yield chunk
+    
+    def snapshot(self) -> Dict[str, int]:
+        """进行中的合并调用数"""
+        return {"calls": len(self._calls), "streams": len(self._streams)}
+    
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,226 @@
+"""结构化输出解析
+
+模型以 JSON 模式（或按 JSON Schema 约束）生成一个对象，IncrementalJSONParser 在流式响应中逐段解析，
+顶层字段的值一结束就取出并按 pydantic 模型中该字段的定义校验，不必等整个响应结束。
+校验失败或缺失的字段单独重试：只请求这些字段，失败的字段在流式响应尚未结束时就开始重试。
+"""
+import asyncio
+import json
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+# 无法解析为 JSON 的字段值
+_MALFORMED = object()
+
+
+class StructuredOutputError(Exception):
+    """重试后仍有字段缺失或不符合要求"""
+    pass
+
+
+class TechStackSuggestion(BaseModel):
+    """推荐的技术栈"""
+    frontend: str
+    backend: str
+    database: str
+    styling: str
+
+
+class RequirementsAnalysis(BaseModel):
+    """需求分析结果"""
+    tech_stack: TechStackSuggestion
+    features: List[str] = Field(..., min_length=1)
+    complexity: Literal["简单", "中等", "复杂"]
+    estimated_time: str
+
+
+class PlannedFile(BaseModel):
+    """计划生成的文件；depends_on 为它引用的清单中其他文件的路径"""
+    file_path: str
+    description: str
+    depends_on: List[str]
+
+
+class ProjectPlan(BaseModel):
+    """项目文件清单"""
+    files: List[PlannedFile] = Field(..., min_length=1)
+
+
+class CodeEdit(BaseModel):
+    """一处修改：search 为文件中要替换的原文，replace 为替换后的文本"""
+    search: str
+    replace: str
+
+
+class CodeEditPlan(BaseModel):
+    """对一个文件的修改"""
+    edits: List[CodeEdit]
+
+
+class IncrementalJSONParser:
+    """逐段解析一个 JSON 对象，顶层字段的值完整后立即返回
+    
+    对象之前的文本（如 Markdown 代码块标记）与之后的文本被忽略。无法解析的值以 _MALFORMED 返回。
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self.done = False
+    
+    def _field(self, end: int) -> Optional[Tuple[str, Any]]:
+        key, start = self._key, self._value_start
+        self._key_start = self._key = self._value_start = None
+        if key is None or start is None:
+            return None
+        try:
+            return key, json.loads(self._buffer[start:end])
+        except ValueError:
+            return key, _MALFORMED
+    
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """追加文本，返回其中完成的 (字段名, 值)"""
+        if self.done:
+            return []
+        self._buffer += text
+        fields = []
+        for i in range(self._pos, len(self._buffer)):
+            c = self._buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._value_start is None and self._key_start is None:
+                    self._key_start = i
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    field = self._field(i)
+                    if field is not None:
+                        fields.append(field)
+                    self.done = True
+                    break
+                self._depth -= 1
+            elif self._depth == 1:
+                if c == ":" and self._key_start is not None and self._value_start is None:
+                    try:
+                        self._key = json.loads(self._buffer[self._key_start:i])
+                    except ValueError:
+                        self._key = None
+                    self._value_start = i + 1
+                elif c == ",":
+                    field = self._field(i)
+                    if field is not None:
+                        fields.append(field)
+        self._pos = len(self._buffer)
+        return fields
+
+
+def model_schema(model: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """模型（或其部分字段）的 JSON Schema，展开 $ref 并去掉 title，供各服务提供方的结构化输出使用"""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+    
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items() if key != "title"}
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        return node
+    
+    schema = inline(schema)
+    if fields is not None:
+        schema["properties"] = {name: schema["properties"][name] for name in fields}
+        schema["required"] = list(fields)
+    return schema
+
+
+class _FieldValidator:
+    """按模型中各字段的定义（含约束）单独校验字段"""
+    
+    def __init__(self, model: Type[BaseModel]):
+        self.adapters = {
+            name: TypeAdapter(Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation)
+            for name, field in model.model_fields.items()
+        }
+    
+    def validate(self, name: str, value: Any) -> Tuple[bool, Any]:
+        if value is _MALFORMED:
+            return False, None
+        try:
+            return True, self.adapters[name].validate_python(value)
+        except ValidationError:
+            return False, None
+
+
+async def parse_structured(
+    model: Type[BaseModel],
+    chunks: AsyncIterator[str],
+    retry: Callable[[List[str]], Awaitable[str]],
+    max_retries: int = 1,
+) -> BaseModel:
+    """从流式响应中解析模型，失败或缺失的字段通过 retry(字段名列表) 单独重新生成"""
+    validator = _FieldValidator(model)
+    values: Dict[str, Any] = {}
+    
+    async def retry_fields(names: List[str]) -> None:
+        for _ in range(max_retries):
+            parser = IncrementalJSONParser()
+            for name, value in parser.feed(await retry(names)):
+                if name in names:
+                    ok, value = validator.validate(name, value)
+                    if ok:
+                        values[name] = value
+            names = [name for name in names if name not in values]
+            if not names:
+                return
+    
+    retries: List[asyncio.Task] = []
+    retrying = set()
+    parser = IncrementalJSONParser()
+    try:
+        async for chunk in chunks:
+            for name, value in parser.feed(chunk):
+                if name not in validator.adapters or name in values or name in retrying:
+                    continue
+                ok, value = validator.validate(name, value)
+                if ok:
+                    values[name] = value
+                elif max_retries > 0:
+                    # 不等响应结束，立即重试这个字段
+                    retrying.add(name)
+                    retries.append(asyncio.create_task(retry_fields([name])))
+        
+        missing = [name for name in validator.adapters if name not in values and name not in retrying]
+        if missing and max_retries > 0:
+            retries.append(asyncio.create_task(retry_fields(missing)))
+        await asyncio.gather(*retries)
+    finally:
+        for task in retries:
+            task.cancel()
+    
+    try:
+        return model.model_validate(values)
+    except ValidationError as e:
+        failed = sorted({str(error["loc"][0]) for error in e.errors()})
+        raise StructuredOutputError(f"字段缺失或格式不正确：{', '.join(failed)}")
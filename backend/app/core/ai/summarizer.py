@@ -0,0 +1,168 @@
+"""滚动对话摘要
+
+会话中尚未摘要的消息超过 token 阈值后，在请求之外的后台任务里把较早的消息
+合并进 ChatSession.context["summary"]，并记录已摘要到的消息 id，之后只增量合并新消息。
+积压的消息很多时（如已有的长会话第一次摘要）按 token 预算分批合并，每批写回一次摘要与进度。
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.chat import ChatSession, ChatMessage
+from .base import BaseAIClient, AIErrorMessage
+from .context import estimate_tokens
+
+logger = structlog.get_logger()
+
+SUMMARY_KEY = "summary"
+SUMMARY_UPTO_KEY = "summary_upto_id"
+
+
+def get_summary(session: ChatSession) -> Tuple[str, int]:
+    """返回会话的 (摘要, 已摘要到的消息 id)"""
+    context = session.context or {}
+    return context.get(SUMMARY_KEY, ""), context.get(SUMMARY_UPTO_KEY, 0)
+
+
+class ConversationSummarizer:
+    """后台对话摘要器"""
+    
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        client: Optional[BaseAIClient] = None,
+        threshold_tokens: Optional[int] = None,
+        keep_recent: Optional[int] = None,
+        batch_tokens: Optional[int] = None,
+    ):
+        self._session_factory = session_factory
+        self._client = client
+        self.threshold_tokens = threshold_tokens or settings.chat_summary_threshold_tokens
+        self.keep_recent = keep_recent if keep_recent is not None else settings.chat_summary_keep_recent
+        self.batch_tokens = batch_tokens or settings.chat_summary_batch_tokens
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._dirty: Set[int] = set()
+    
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+    
+    @property
+    def client(self) -> BaseAIClient:
+        if self._client is not None:
+            return self._client
+        from .factory import AIClientFactory
+        return AIClientFactory.get_default_client()
+    
+    def schedule(self, session_id: int) -> None:
+        """在后台检查并刷新会话摘要；同一会话同时只运行一个任务"""
+        if not settings.chat_summary_enabled:
+            return
+        if session_id in self._tasks:
+            # 正在摘要，结束后再检查一次
+            self._dirty.add(session_id)
+            return
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks[session_id] = task
+    
+    async def _run(self, session_id: int) -> None:
+        try:
+            while True:
+                self._dirty.discard(session_id)
+                await self.refresh(session_id)
+                if session_id not in self._dirty:
+                    break
+        except Exception as e:
+            logger.warning("Chat summary refresh failed", session_id=session_id, error=str(e))
+        finally:
+            self._tasks.pop(session_id, None)
+    
+    async def refresh(self, session_id: int) -> bool:
+        """未摘要的消息超过阈值时合并进摘要，返回是否更新"""
+        # 读取与写回分开进行，调用模型期间不占用数据库连接
+        async with self.session_factory() as db:
+            session = await db.get(ChatSession, session_id)
+            if session is None:
+                return False
+            summary, upto_id = get_summary(session)
+            
+            messages = (await db.scalars(
+                select(ChatMessage).where(
+                    ChatMessage.session_id == session_id,
+                    ChatMessage.id > upto_id
+                ).order_by(ChatMessage.created_at, ChatMessage.id)
+            )).all()
+        
+        if len(messages) <= self.keep_recent:
+            return False
+        if sum(estimate_tokens(m.content) for m in messages) <= self.threshold_tokens:
+            return False
+        
+        # 最近的若干条保留原文，其余分批合并进摘要
+        to_compact = messages[:len(messages) - self.keep_recent]
+        compacted = 0
+        while compacted < len(to_compact):
+            history = self._next_batch(to_compact[compacted:], summary)
+            new_summary = await self.client.summarize(summary, history)
+            if isinstance(new_summary, AIErrorMessage) or not new_summary.strip():
+                break
+            last_id = to_compact[compacted + len(history) - 1].id
+            if not await self._save(session_id, upto_id, new_summary.strip(), last_id):
+                break
+            summary, upto_id = new_summary.strip(), last_id
+            compacted += len(history)
+        
+        if compacted:
+            logger.info("Chat summary refreshed", session_id=session_id, compacted=compacted)
+        return compacted > 0
+    
+    def _next_batch(self, messages: List[ChatMessage], summary: str) -> List[Dict[str, str]]:
+        """从头取出一批消息，与已有摘要合计不超过 batch_tokens；至少一条，单条过长时截断"""
+        budget = max(self.batch_tokens - estimate_tokens(summary), self.batch_tokens // 4)
+        batch: List[Dict[str, str]] = []
+        used = 0
+        for message in messages:
+            tokens = estimate_tokens(message.content)
+            if batch and used + tokens > budget:
+                break
+            content = message.content
+            if tokens > budget:
+                # 按一个字符至少一个 token 截断，截断后不超过预算
+                content = content[:budget]
+            batch.append({"role": message.role, "content": content})
+            used += tokens
+        return batch
+    
+    async def _save(self, session_id: int, upto_id: int, summary: str, new_upto_id: int) -> bool:
+        """写回摘要与进度；会话已删除或摘要已被其他进程更新时返回 False"""
+        async with self.session_factory() as db:
+            session = await db.get(ChatSession, session_id)
+            if session is None or get_summary(session)[1] != upto_id:
+                return False
+            
+            # JSON 列需要整体赋值才会被识别为修改
+            session.context = {
+                **(session.context or {}),
+                SUMMARY_KEY: summary,
+                SUMMARY_UPTO_KEY: new_upto_id,
+            }
+            await db.commit()
+        return True
+    
+    async def aclose(self) -> None:
+        """取消进行中的摘要任务（应用关闭时调用）"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局摘要器
+summarizer = ConversationSummarizer()
@@ -0,0 +1,61 @@
+"""AI 客户端共享的异步 HTTP 传输层
+
+所有 AI 客户端共用一个带连接池的 httpx.AsyncClient（keep-alive、可选 HTTP/2），
+并通过全局信号量限制同时进行的上游调用数量，避免为每个请求占用一个线程。
+"""
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator
+
+import httpx
+
+from app.config import settings
+
+_http_client: Optional[httpx.AsyncClient] = None
+_concurrency_limiter: Optional[asyncio.Semaphore] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 依赖 h2 包，未安装时退回 HTTP/1.1"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的异步 HTTP 客户端（惰性创建）"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=settings.ai_http2 and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=settings.ai_max_connections,
+                max_keepalive_connections=settings.ai_max_keepalive_connections,
+                keepalive_expiry=settings.ai_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(settings.ai_request_timeout, connect=10.0),
+        )
+    return _http_client
+
+
+def get_concurrency_limiter() -> asyncio.Semaphore:
+    """获取限制上游并发调用数的信号量"""
+    global _concurrency_limiter
+    if _concurrency_limiter is None:
+        _concurrency_limiter = asyncio.Semaphore(settings.ai_max_concurrency)
+    return _concurrency_limiter
+
+
+@asynccontextmanager
+async def limited() -> AsyncIterator[httpx.AsyncClient]:
+    """在并发限制内使用共享客户端"""
+    async with get_concurrency_limiter():
+        yield get_http_client()
+
+
+async def close_http_client() -> None:
+    """关闭共享客户端并释放连接池"""
+    global _http_client, _concurrency_limiter
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _concurrency_limiter = None
@@ -0,0 +1,168 @@
+"""认证缓存
+
+- 令牌缓存：已验证签名的令牌按 LRU 保存解析结果，同一令牌的后续请求跳过 JWT 签名校验
+- 用户缓存：按 (令牌主体, 令牌 id) 保存不可变的用户快照，短 TTL，用户被更新、停用或删除时失效：
+  写入数据库时失效一次，事务提交后再失效一次；读取数据库期间发生过失效的快照不写入缓存，
+  避免并发请求把提交前读到的旧数据重新放回缓存
+缓存只在进程内有效，其他进程对用户的修改最迟在 TTL 后生效。
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.config import settings
+from app.models.user import User
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """已验证令牌的声明"""
+    subject: str
+    token_id: str
+    expires_at: float
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """当前用户的只读快照，不绑定数据库会话"""
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str]
+    is_active: bool
+    is_superuser: bool
+    created_at: datetime
+    updated_at: datetime
+    
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+
+class TokenCache:
+    """已验证令牌的 LRU 缓存"""
+    
+    def __init__(self, max_size: Optional[int] = None):
+        self.max_size = max_size or settings.auth_token_cache_size
+        self._data: "OrderedDict[str, TokenClaims]" = OrderedDict()
+    
+    def get(self, token: str) -> Optional[TokenClaims]:
+        claims = self._data.get(token)
+        if claims is None:
+            return None
+        if claims.expires_at <= time.time():
+            del self._data[token]
+            return None
+        self._data.move_to_end(token)
+        return claims
+    
+    def set(self, token: str, claims: TokenClaims) -> None:
+        self._data[token] = claims
+        self._data.move_to_end(token)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class UserCache:
+    """用户快照缓存"""
+    
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = max_size or settings.auth_user_cache_size
+        self.ttl = ttl if ttl is not None else settings.auth_user_cache_ttl
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, UserSnapshot]]" = OrderedDict()
+        self._by_subject: Dict[str, Set[Tuple[str, str]]] = {}
+        # 每次失效加一
+        self.generation = 0
+    
+    def get(self, subject: str, token_id: str) -> Optional[UserSnapshot]:
+        key = (subject, token_id)
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, snapshot = item
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return snapshot
+    
+    def set(self, subject: str, token_id: str, snapshot: UserSnapshot, generation: Optional[int] = None) -> None:
+        """写入快照；generation 为读取数据库前的 self.generation，期间发生过失效时不写入"""
+        if generation is not None and generation != self.generation:
+            return
+        key = (subject, token_id)
+        self._data[key] = (time.monotonic() + self.ttl, snapshot)
+        self._data.move_to_end(key)
+        self._by_subject.setdefault(subject, set()).add(key)
+        while len(self._data) > self.max_size:
+            self._remove(next(iter(self._data)))
+    
+    def _remove(self, key: Tuple[str, str]) -> None:
+        self._data.pop(key, None)
+        keys = self._by_subject.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[key[0]]
+    
+    def invalidate(self, subject: str) -> None:
+        """丢弃该用户所有令牌对应的快照"""
+        self.generation += 1
+        for key in self._by_subject.pop(subject, ()):
+            self._data.pop(key, None)
+    
+    def clear(self) -> None:
+        self._data.clear()
+        self._by_subject.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 全局缓存
+token_cache = TokenCache()
+user_cache = UserCache()
+
+
+# 已写入但尚未提交的用户修改，键为 Session.info 中的项
+_PENDING_KEY = "auth_cache_invalidate"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target: User) -> None:
+    """用户被修改或删除时使缓存的快照失效（包括修改前的邮箱），提交后再失效一次"""
+    emails = {target.email, *(inspect(target).attrs.email.history.deleted or ())}
+    for email in emails:
+        user_cache.invalidate(email)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for email in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
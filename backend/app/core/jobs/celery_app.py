@@ -0,0 +1,47 @@
+"""Celery 任务后端（JOB_BACKEND=celery 时使用）
+
+任务按服务提供方投递到 ai.<provider> 队列，通过为各队列分配 worker 并发数限制对上游的并发调用，例如：
+    celery -A app.core.jobs.celery_app worker -Q ai.gemini -c 4
+"""
+import asyncio
+from typing import Optional
+
+from celery import Celery
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+
+celery_app = Celery("kidvibe", broker=settings.redis_url)
+celery_app.conf.update(
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_default_queue="ai.default",
+    # Redis broker 下 0 为最高优先级，与 Job.priority 一致
+    broker_transport_options={"priority_steps": list(range(10)), "queue_order_strategy": "priority"},
+)
+
+
+async def _run_attempt(job_id: str) -> Optional[float]:
+    from app.core.ai.factory import AIClientFactory
+    from app.database import create_database_engine
+    from .queue import JobQueue
+    
+    # 每个任务运行在新的事件循环中，数据库引擎与 HTTP 连接池不能跨循环复用
+    engine = create_database_engine(settings.database_url)
+    try:
+        queue = JobQueue(
+            backend="eager",
+            session_factory=async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+        )
+        return await queue.run_attempt(job_id)
+    finally:
+        await AIClientFactory.close_all()
+        await engine.dispose()
+
+
+@celery_app.task(bind=True, name="kidvibe.jobs.run_job", max_retries=None)
+def run_job(self, job_id: str) -> None:
+    """执行一次任务，失败时按退避时间重新投递"""
+    delay = asyncio.run(_run_attempt(job_id))
+    if delay is not None:
+        raise self.retry(countdown=delay)
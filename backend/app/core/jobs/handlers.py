@@ -0,0 +1,70 @@
+"""后台任务处理函数
+
+每种任务类型对应一个处理函数，接收 AI 客户端与任务参数，返回可 JSON 序列化的结果。
+处理函数抛出异常即视为本次执行失败，由任务队列按退避策略重试。
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from app.config import settings
+from app.core.ai.base import BaseAIClient, AIErrorMessage
+from app.core.ai.pipeline import generate_project_files
+from app.core.ai.retrieval import related_code
+
+JobHandler = Callable[[BaseAIClient, Dict[str, Any]], Awaitable[Any]]
+
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+# 各任务类型必需的参数
+REQUIRED_PAYLOAD_FIELDS: Dict[str, tuple] = {}
+
+
+class JobError(Exception):
+    """任务执行失败"""
+    pass
+
+
+def job_handler(kind: str, required: tuple = ()):
+    """注册任务处理函数"""
+    def decorator(func: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = func
+        REQUIRED_PAYLOAD_FIELDS[kind] = required
+        return func
+    return decorator
+
+
+def _raise_for_error(result: Any) -> Any:
+    """AI 客户端以返回值表示的失败转换为异常"""
+    if isinstance(result, AIErrorMessage):
+        raise JobError(str(result))
+    if isinstance(result, dict) and "error" in result:
+        raise JobError(str(result["error"]))
+    return result
+
+
+@job_handler("analyze_requirements", required=("description",))
+async def analyze_requirements(client: BaseAIClient, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """分析需求"""
+    return _raise_for_error(await client.analyze_requirements(payload["description"]))
+
+
+@job_handler("generate_code", required=("prompt",))
+async def generate_code(client: BaseAIClient, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """生成代码；指定 project_id 时检索项目中的相关代码加入上下文"""
+    context = dict(payload.get("context") or {})
+    if payload.get("project_id") is not None and settings.rag_enabled:
+        query = f"{context.get('file_path', '')}\n{payload['prompt']}"
+        context["related_code"] = await related_code(payload["project_id"], query)
+    code = _raise_for_error(await client.generate_code(payload["prompt"], context))
+    return {"code": code}
+
+
+@job_handler("generate_project", required=("project_id",))
+async def generate_project(client: BaseAIClient, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """按文件依赖关系并发生成项目文件并写入项目，prompt 默认为项目的初始需求"""
+    result: Dict[str, Any] = {}
+    async for event, data in generate_project_files(client, payload["project_id"], payload.get("prompt")):
+        if event == "plan":
+            result["depth"] = data["depth"]
+        elif event == "done":
+            result.update(data)
+    return result
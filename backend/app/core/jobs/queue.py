@@ -0,0 +1,322 @@
+"""后台任务队列
+
+提交任务时写入 jobs 表并立即返回任务 id，由 worker 调用 AI 客户端执行，结果写回任务记录，
+客户端轮询（支持长轮询）获取。支持三种后端：
+- memory：进程内优先级队列 + 若干 worker 协程
+- eager：提交时在当前协程内直接执行，便于测试
+- celery：投递到 Celery（Redis broker），按服务提供方分队列
+失败的任务按指数退避重试，同一服务提供方同时执行的任务数受 job_provider_concurrency 限制
+（任务使用路由客户端时，按路由实际调用的后端分别限制）。
+
+多个进程共用 jobs 表：执行中的任务带有租约（started_at 起 job_lease_timeout 秒），一次执行超过租约时
+按失败处理；只有租约已过期的执行中任务（所在进程已退出）才会被其他进程放回排队状态重新执行。
+"""
+import asyncio
+import itertools
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.ai.router import backend_limiter
+from app.core.metrics import registry
+from app.models.job import Job
+from .handlers import JOB_HANDLERS
+
+logger = structlog.get_logger()
+
+# 任务结束状态
+FINISHED_STATUSES = ("succeeded", "failed")
+# 可被 worker 领取的状态
+PENDING_STATUSES = ("queued", "retrying")
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次执行失败后的重试等待时间（秒）"""
+    return min(settings.job_retry_backoff * (2 ** (attempts - 1)), settings.job_retry_backoff_max)
+
+
+class JobQueue:
+    """后台任务队列"""
+    
+    # 长轮询时重新查询任务状态的间隔（秒），任务在其他进程执行时依赖此轮询
+    POLL_INTERVAL = 1.0
+    # 检查租约过期任务的间隔（秒）
+    RECLAIM_INTERVAL = 60.0
+    # 超时的执行写回结果所需的余量（秒），租约过期超过此时间才重新领取
+    LEASE_GRACE = 60.0
+    
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
+        self.backend = backend or settings.job_backend
+        self.workers = workers or settings.job_workers
+        self._session_factory = session_factory
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._retry_handles: Set[asyncio.TimerHandle] = set()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._waiting: Dict[str, int] = {}
+    
+    @property
+    def depth(self) -> int:
+        """memory 后端中等待执行的任务数"""
+        return self._queue.qsize() if self._queue is not None else 0
+    
+    @property
+    def session_factory(self) -> Callable[[], AsyncSession]:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+    
+    def _semaphore(self, provider: Optional[str]) -> asyncio.Semaphore:
+        provider = provider or "default"
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            limit = settings.job_provider_concurrency.get(provider, self.workers)
+            semaphore = self._semaphores[provider] = asyncio.Semaphore(limit)
+        return semaphore
+    
+    async def submit(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 5,
+    ) -> Job:
+        """创建任务并投递到队列"""
+        from app.core.ai.factory import AIClientFactory
+        
+        job = Job(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            kind=kind,
+            status="queued",
+            priority=priority,
+            provider=AIClientFactory.get_default_provider(),
+            payload=payload,
+            attempts=0,
+            max_attempts=settings.job_max_retries + 1,
+        )
+        db.add(job)
+        await db.commit()
+        
+        await self._dispatch(job)
+        if self.backend == "eager":
+            await db.refresh(job)
+        return job
+    
+    async def _dispatch(self, job: Job) -> None:
+        if self.backend == "eager":
+            await self.execute(job.id)
+        elif self.backend == "celery":
+            from .celery_app import run_job
+            run_job.apply_async(args=[job.id], priority=job.priority, queue=f"ai.{job.provider}")
+        else:
+            self.start()
+            self._queue.put_nowait((job.priority, next(self._seq), job.id))
+    
+    async def execute(self, job_id: str) -> None:
+        """在当前协程内执行任务直到成功或重试次数用尽"""
+        while True:
+            delay = await self.run_attempt(job_id)
+            if delay is None:
+                return
+            await asyncio.sleep(delay)
+    
+    async def run_attempt(self, job_id: str) -> Optional[float]:
+        """执行一次任务，需要重试时返回等待时间"""
+        async with self.session_factory() as db:
+            # 以条件更新领取任务，避免同一任务被重复执行
+            claimed = await db.execute(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.status.in_(PENDING_STATUSES)
+                ).values(status="running", attempts=Job.attempts + 1, started_at=datetime.utcnow())
+            )
+            await db.commit()
+            if claimed.rowcount == 0:
+                return None
+            job = await db.get(Job, job_id)
+            kind, payload, provider = job.kind, job.payload or {}, job.provider
+            attempts, max_attempts = job.attempts, job.max_attempts
+        
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            await self._finish(job_id, "failed", error=f"未知任务类型: {kind}")
+            return None
+        
+        try:
+            # 一次执行不超过租约，否则其他进程可能重新领取仍在执行的任务
+            result = await asyncio.wait_for(self._call_handler(handler, provider, payload), settings.job_lease_timeout)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if attempts < max_attempts:
+                delay = retry_delay(attempts)
+                logger.warning("Job attempt failed, retrying", job_id=job_id, attempts=attempts, delay=delay, error=error)
+                await self._finish(job_id, "retrying", error=error)
+                return delay
+            logger.error("Job failed", job_id=job_id, attempts=attempts, error=error)
+            await self._finish(job_id, "failed", error=error)
+            return None
+        
+        await self._finish(job_id, "succeeded", result=result)
+        return None
+    
+    async def _call_handler(self, handler: Callable, provider: Optional[str], payload: Dict[str, Any]) -> Any:
+        from app.core.ai.factory import AIClientFactory
+        
+        client = AIClientFactory.get_client(provider) if provider else AIClientFactory.get_default_client()
+        if provider == "router":
+            # 路由客户端在选定后端后按该后端的上限等待，对冲与故障转移也计入对应后端
+            backend_limiter.set(self._semaphore)
+            return await handler(client, payload)
+        async with self._semaphore(provider):
+            return await handler(client, payload)
+    
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        values: Dict[str, Any] = {"status": status, "error": error}
+        if status in FINISHED_STATUSES:
+            values["result"] = result
+            values["finished_at"] = datetime.utcnow()
+        async with self.session_factory() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+        
+        if status in FINISHED_STATUSES:
+            event = self._waiters.get(job_id)
+            if event is not None:
+                event.set()
+    
+    async def wait(self, job_id: str, timeout: float) -> None:
+        """等待任务结束，最多 timeout 秒（长轮询）"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        self._waiting[job_id] = self._waiting.get(job_id, 0) + 1
+        try:
+            while True:
+                async with self.session_factory() as db:
+                    status = await db.scalar(select(Job.status).where(Job.id == job_id))
+                remaining = deadline - loop.time()
+                if status is None or status in FINISHED_STATUSES or remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, self.POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiting[job_id] -= 1
+            if self._waiting[job_id] == 0:
+                del self._waiting[job_id]
+                self._waiters.pop(job_id, None)
+    
+    def _schedule_retry(self, priority: int, job_id: str, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        
+        def requeue():
+            self._retry_handles.discard(handle)
+            self._queue.put_nowait((priority, next(self._seq), job_id))
+        
+        handle = loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+    
+    async def _worker(self) -> None:
+        while True:
+            priority, _, job_id = await self._queue.get()
+            try:
+                delay = await self.run_attempt(job_id)
+            except Exception as e:
+                logger.error("Job worker error", job_id=job_id, error=str(e))
+                delay = None
+            finally:
+                self._queue.task_done()
+            if delay is not None:
+                self._schedule_retry(priority, job_id, delay)
+    
+    def start(self) -> None:
+        """启动 memory 后端的 worker"""
+        if self.backend != "memory" or self._worker_tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._worker_tasks.append(asyncio.create_task(self._reclaim_loop()))
+    
+    async def _reclaim_expired(self) -> List[Tuple[str, int]]:
+        """把租约已过期的执行中任务（所在进程已退出）放回排队状态，返回 (任务 id, 优先级)"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.job_lease_timeout + self.LEASE_GRACE)
+        async with self.session_factory() as db:
+            # 条件更新，多个进程同时检查时每个任务只会被放回一次
+            reclaimed = (await db.execute(
+                update(Job).where(
+                    Job.status == "running",
+                    Job.started_at < cutoff
+                ).values(status="queued").returning(Job.id, Job.priority)
+            )).all()
+            await db.commit()
+        if reclaimed:
+            logger.warning("Reclaimed jobs with expired leases", count=len(reclaimed))
+        return [(job_id, priority) for job_id, priority in reclaimed]
+    
+    async def _reclaim_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.RECLAIM_INTERVAL)
+            try:
+                for job_id, priority in await self._reclaim_expired():
+                    self._queue.put_nowait((priority, next(self._seq), job_id))
+            except Exception as e:
+                logger.error("Job reclaim failed", error=str(e))
+    
+    async def recover(self) -> None:
+        """重新投递未完成的任务（应用启动时调用）
+        
+        排队与等待重试的任务全部重新投递（其他进程的队列中也有的任务只会被领取一次）；执行中的任务可能正由
+        其他进程执行，只放回租约已过期的，其余的由定期检查在租约过期后放回。
+        """
+        if self.backend != "memory":
+            return
+        await self._reclaim_expired()
+        async with self.session_factory() as db:
+            pending = (await db.execute(
+                select(Job.id, Job.priority).where(
+                    Job.status.in_(PENDING_STATUSES)
+                ).order_by(Job.priority, Job.created_at)
+            )).all()
+        
+        self.start()
+        for job_id, priority in pending:
+            self._queue.put_nowait((priority, next(self._seq), job_id))
+        if pending:
+            logger.info("Recovered pending jobs", count=len(pending))
+    
+    async def stop(self) -> None:
+        """停止 worker（应用关闭时调用），未完成的任务在下次启动时恢复"""
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        tasks = self._worker_tasks
+        self._worker_tasks = []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# 全局任务队列
+job_queue = JobQueue()
+
+registry.gauge(
+    "kidvibe_job_queue_depth",
+    "Jobs waiting in the in-process queue",
+    callback=lambda: {(): job_queue.depth},
+)
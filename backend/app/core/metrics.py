@@ -0,0 +1,326 @@
+"""指标采集与 Prometheus 文本格式输出
+
+- MetricsMiddleware：按路由模板统计请求数与延迟，并把请求耗时拆分为数据库、模型调用与其余部分
+- instrument_engine：通过 SQLAlchemy 引擎事件统计查询耗时
+- InstrumentedAIClient（app.core.ai.instrumented）：统计模型调用耗时、首字延迟、提示与响应大小、错误数
+- render_prompt（app.core.ai.prompts）：按模板统计提示的估算 token 数
+
+指标只在事件循环线程中更新（异步 SQLAlchemy 的引擎事件同样在该线程的 greenlet 中触发），
+因此不加锁；直方图按固定桶计数，每个标签组合只占一个定长列表。
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+Labels = Tuple[str, ...]
+
+# 延迟桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 大小桶（字节）
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+# token 数桶（估算值）
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 131072)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """指标基类"""
+    type = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+    
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+    
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+    type = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+    
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def get(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0.0)
+    
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    """采集时通过回调读取的瞬时值，回调返回 {标签: 值}"""
+    type = "gauge"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+    
+    def samples(self) -> Iterable[str]:
+        if self.callback is None:
+            return
+        for labels, value in self.callback().items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    """固定桶直方图"""
+    type = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # 每个标签组合：各桶计数（最后一个为 +Inf）与总和
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = state
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+    
+    def count(self, labels: Labels = ()) -> int:
+        state = self._values.get(labels)
+        return sum(state[0]) if state else 0
+    
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total[0])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+    
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册：{metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[Labels, float]]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+    
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "kidvibe_http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "kidvibe_http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+HTTP_REQUEST_PHASE = registry.histogram(
+    "kidvibe_http_request_phase_seconds",
+    "Time spent per request in database, LLM calls and everything else (serialization, app code)",
+    ("route", "phase"),
+)
+DB_QUERY_DURATION = registry.histogram(
+    "kidvibe_db_query_duration_seconds", "Database query latency by statement type", ("operation",)
+)
+DB_QUERY_ERRORS = registry.counter(
+    "kidvibe_db_query_errors_total", "Failed database queries by statement type", ("operation",)
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    "kidvibe_llm_request_duration_seconds", "LLM call latency", ("provider", "operation")
+)
+LLM_TIME_TO_FIRST_TOKEN = registry.histogram(
+    "kidvibe_llm_time_to_first_token_seconds", "Time until the first streamed chunk", ("provider", "operation")
+)
+LLM_PROMPT_BYTES = registry.histogram(
+    "kidvibe_llm_prompt_bytes", "Prompt size sent to the LLM", ("provider", "operation"), SIZE_BUCKETS
+)
+LLM_RESPONSE_BYTES = registry.histogram(
+    "kidvibe_llm_response_bytes", "Response size received from the LLM", ("provider", "operation"), SIZE_BUCKETS
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "kidvibe_llm_prompt_tokens",
+    "Estimated prompt tokens per template, split into the shared prefix and the per-call part",
+    ("template", "part"),
+    TOKEN_BUCKETS,
+)
+LLM_ERRORS = registry.counter(
+    "kidvibe_llm_errors_total", "Failed LLM calls by provider", ("provider", "operation")
+)
+
+# 当前请求内各阶段的时间区间（并发的子任务共享同一个字典）
+_request_phases: ContextVar[Optional[Dict[str, List[Tuple[float, float]]]]] = ContextVar("request_phases", default=None)
+
+
+def add_request_time(phase: str, seconds: float) -> None:
+    """把刚结束的一段耗时计入当前请求的某个阶段（不在请求内时忽略）"""
+    phases = _request_phases.get()
+    if phases is not None:
+        end = time.perf_counter()
+        phases.setdefault(phase, []).append((end - seconds, end))
+
+
+def _covered(intervals: Iterable[Tuple[float, float]]) -> float:
+    """区间并集的总长度：并发调用重叠的部分只计一次，结果不超过请求的实际耗时"""
+    total = 0.0
+    current: Optional[Tuple[float, float]] = None
+    for start, end in sorted(intervals):
+        if current is None or start > current[1]:
+            if current is not None:
+                total += current[1] - current[0]
+            current = (start, end)
+        elif end > current[1]:
+            current = (current[0], end)
+    if current is not None:
+        total += current[1] - current[0]
+    return total
+
+
+class MetricsMiddleware:
+    """统计请求延迟的 ASGI 中间件（不缓冲响应体，流式响应按结束时间计）"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status_code = 500
+        phases: Dict[str, List[Tuple[float, float]]] = {}
+        token = _request_phases.set(phases)
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_phases.reset(token)
+            elapsed = time.perf_counter() - start
+            # 使用路由模板而不是实际路径，避免标签数量随 id 增长
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, path, str(status_code)))
+            HTTP_REQUEST_DURATION.observe(elapsed, (method, path))
+            
+            db_intervals = phases.get("db", [])
+            llm_intervals = phases.get("llm", [])
+            HTTP_REQUEST_PHASE.observe(_covered(db_intervals), (path, "db"))
+            HTTP_REQUEST_PHASE.observe(_covered(llm_intervals), (path, "llm"))
+            other = elapsed - _covered(db_intervals + llm_intervals)
+            HTTP_REQUEST_PHASE.observe(max(other, 0.0), (path, "other"))
+
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "CREATE", "DROP", "PRAGMA"}
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:8].split(None, 1)
+    keyword = keyword[0].upper() if keyword else ""
+    return keyword if keyword in _SQL_OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine: Engine) -> None:
+    """为同步引擎（异步引擎传 engine.sync_engine）注册查询计时事件"""
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+    
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERY_DURATION.observe(elapsed, (_operation(statement),))
+        add_request_time("db", elapsed)
+    
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+        DB_QUERY_ERRORS.inc((_operation(exception_context.statement or ""),))
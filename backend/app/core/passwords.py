@@ -0,0 +1,107 @@
+"""密码哈希
+
+bcrypt 单次计算约 250ms CPU，直接在 async 路由中调用会阻塞事件循环。这里把哈希与校验放到
+固定大小的线程池中执行（bcrypt 计算期间释放 GIL），并限制排队数量：超过上限的请求立即被拒绝，
+而不是无限排队拖慢所有登录。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, TypeVar
+
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.core.metrics import registry
+
+T = TypeVar("T")
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希队列已满"""
+    pass
+
+
+@dataclass
+class PasswordHasherStats:
+    """密码哈希线程池统计"""
+    completed: int = 0
+    rejected: int = 0
+    max_pending_seen: int = 0
+
+
+class PasswordHasher:
+    """在有界线程池中执行密码哈希与校验"""
+    
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or settings.password_hash_workers
+        self.max_pending = max_pending or settings.password_hash_max_pending
+        self.stats = PasswordHasherStats()
+        self._pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+    
+    @property
+    def pending(self) -> int:
+        """排队与执行中的任务数"""
+        return self._pending
+    
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        # 计数只在事件循环线程中修改，无需加锁
+        if self._pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise PasswordHasherBusy("密码校验请求过多，请稍后再试")
+        
+        self._pending += 1
+        self.stats.max_pending_seen = max(self.stats.max_pending_seen, self._pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._pending -= 1
+            self.stats.completed += 1
+    
+    async def hash(self, password: str) -> str:
+        """获取密码哈希"""
+        return await self._run(pwd_context.hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._run(pwd_context.verify, plain_password, hashed_password)
+    
+    def snapshot(self) -> Dict[str, int]:
+        """队列深度与拒绝次数"""
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "in_flight": min(self._pending, self.max_workers),
+            "queued": max(self._pending - self.max_workers, 0),
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.stats.max_pending_seen,
+            "completed": self.stats.completed,
+            "rejected": self.stats.rejected,
+        }
+    
+    def shutdown(self) -> None:
+        """关闭线程池（应用关闭时调用）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 全局密码哈希器
+password_hasher = PasswordHasher()
+
+registry.gauge(
+    "kidvibe_password_hash_pool",
+    "Password hash pool queue depth and counters",
+    ("stat",),
+    lambda: {(name,): value for name, value in password_hasher.snapshot().items()},
+)
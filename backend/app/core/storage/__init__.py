@@ -0,0 +1 @@
+# 文件存储模块
@@ -0,0 +1,303 @@
+"""项目归档的流式导出与导入
+
+导出：按路径顺序从数据库流式读取文件，逐块读取对象写入 zip 或 tar.gz，每写入一块就交给响应，
+内存占用与项目大小无关（zip 的中央目录除外，每个文件约百余字节）。
+导入：上传的归档由 python-multipart 暂存在临时文件中，在线程中逐个读取成员，按批写入项目文件并提交。
+"""
+import asyncio
+import calendar
+import posixpath
+import tarfile
+import zipfile
+import zlib
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.project import ProjectFile
+from .blobs import BlobStore, blob_store
+from .files import FileContentError, FileOperation, apply_file_operations
+
+ARCHIVE_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar.gz": "application/gzip",
+}
+
+# 按扩展名推断文件语言
+LANGUAGES_BY_EXTENSION = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".html": "html",
+    ".css": "css",
+    ".json": "json",
+    ".md": "markdown",
+    ".sql": "sql",
+    ".sh": "shell",
+    ".yml": "yaml",
+    ".yaml": "yaml",
+}
+
+# 导出时每次输出的最小字节数
+OUTPUT_CHUNK_SIZE = 64 * 1024
+# 导入时每批最多写入的文件数与字节数
+IMPORT_BATCH_FILES = 200
+IMPORT_BATCH_BYTES = 8 * 1024 * 1024
+# 导入结果中最多列出的跳过项
+MAX_REPORTED_SKIPS = 100
+
+
+class ArchiveError(Exception):
+    """无法识别或已损坏的归档"""
+    pass
+
+
+class _Sink:
+    """收集归档写出的数据，由生成器按块取走"""
+    
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.size = 0
+    
+    def write(self, data: bytes) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
+
+
+async def _iter_project_files(project_id: int) -> AsyncIterator[ProjectFile]:
+    """使用独立会话按路径顺序流式读取项目文件（响应开始后请求的会话可能已关闭）"""
+    async with SessionLocal() as db:
+        result = await db.stream_scalars(
+            select(ProjectFile).where(
+                ProjectFile.project_id == project_id
+            ).order_by(ProjectFile.file_path).execution_options(yield_per=500)
+        )
+        async for file in result:
+            yield file
+
+
+async def _iter_content(file: ProjectFile, store: BlobStore) -> AsyncIterator[bytes]:
+    if file.content_hash is None:
+        return
+    async for chunk in store.stream(file.content_hash):
+        yield chunk
+
+
+async def export_zip(files: AsyncIterator[ProjectFile], store: BlobStore = blob_store) -> AsyncIterator[bytes]:
+    """流式生成 zip"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async for file in files:
+            info = zipfile.ZipInfo(file.file_path, date_time=max(file.updated_at.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, "w", force_zip64=file.size >= zipfile.ZIP64_LIMIT) as member:
+                async for chunk in _iter_content(file, store):
+                    member.write(chunk)
+                    # 小文件攒够一块再输出，减少响应的分块数
+                    if sink.size >= OUTPUT_CHUNK_SIZE:
+                        yield sink.drain()
+    # 剩余数据与中央目录
+    yield sink.drain()
+
+
+async def export_tar_gz(files: AsyncIterator[ProjectFile], store: BlobStore = blob_store) -> AsyncIterator[bytes]:
+    """流式生成 tar.gz：逐个写出 tar 头、内容与块对齐填充，整体经 gzip 压缩"""
+    sink = _Sink()
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for file in files:
+        info = tarfile.TarInfo(file.file_path)
+        info.size = file.size
+        info.mtime = calendar.timegm(file.updated_at.utctimetuple())
+        info.mode = 0o644
+        sink.write(compressor.compress(info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")))
+        
+        written = 0
+        async for chunk in _iter_content(file, store):
+            written += len(chunk)
+            sink.write(compressor.compress(chunk))
+            if sink.size >= OUTPUT_CHUNK_SIZE:
+                yield sink.drain()
+        if written != file.size:
+            # tar 头中的大小已经写出，内容不符会破坏后续所有成员
+            raise FileContentError(f"文件 {file.id} 的内容大小与记录不符")
+        
+        sink.write(compressor.compress(b"\0" * (-file.size % tarfile.BLOCKSIZE)))
+    # 归档结束标记：两个空块
+    sink.write(compressor.compress(b"\0" * tarfile.BLOCKSIZE * 2) + compressor.flush())
+    yield sink.drain()
+
+
+def export_project_archive(project_id: int, archive_format: str) -> AsyncIterator[bytes]:
+    """按格式流式导出项目"""
+    files = _iter_project_files(project_id)
+    if archive_format == "zip":
+        return export_zip(files)
+    return export_tar_gz(files)
+
+
+@dataclass
+class ArchiveMember:
+    """归档中的一个文件；content 为空时表示跳过，reason 为原因"""
+    path: str
+    content: Optional[str] = None
+    reason: Optional[str] = None
+
+
+@dataclass
+class ImportResult:
+    """导入结果"""
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped: List[Dict[str, str]] = field(default_factory=list)
+    skipped_count: int = 0
+    # 达到文件数上限后停止读取，其余文件不计入 skipped
+    truncated: bool = False
+    
+    def skip(self, path: str, reason: str) -> None:
+        self.skipped_count += 1
+        if len(self.skipped) < MAX_REPORTED_SKIPS:
+            self.skipped.append({"path": path, "reason": reason})
+
+
+def _clean_path(name: str) -> Optional[str]:
+    """归档内的路径转换为项目内的相对路径，越出项目目录时返回 None"""
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../"):
+        return None
+    return path
+
+
+def _read_member(name: str, size: int, open_member: Callable[[], BinaryIO], max_file_size: int) -> ArchiveMember:
+    path = _clean_path(name)
+    if path is None:
+        return ArchiveMember(name, reason="invalid path")
+    if size > max_file_size:
+        return ArchiveMember(path, reason="too large")
+    # 记录的大小可能不可信（压缩炸弹），读取时同样限制
+    with open_member() as f:
+        data = f.read(max_file_size + 1)
+    if len(data) > max_file_size:
+        return ArchiveMember(path, reason="too large")
+    try:
+        return ArchiveMember(path, content=data.decode("utf-8"))
+    except UnicodeDecodeError:
+        return ArchiveMember(path, reason="binary file")
+
+
+def read_archive(fileobj: BinaryIO, max_file_size: int) -> Iterator[ArchiveMember]:
+    """逐个读取 zip 或 tar（可为 gz/bz2/xz 压缩）中的文件"""
+    fileobj.seek(0)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield _read_member(info.filename, info.file_size, lambda: archive.open(info), max_file_size)
+        return
+    
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        raise ArchiveError("不支持的归档格式，仅支持 zip 与 tar（gz/bz2/xz）")
+    with archive:
+        for info in archive:
+            # 跳过目录、链接与设备文件
+            if info.isfile():
+                yield _read_member(info.name, info.size, lambda: archive.extractfile(info), max_file_size)
+
+
+def _next_batch(members: Iterator[ArchiveMember], limit: int) -> List[ArchiveMember]:
+    """读取下一批文件（至少一个），可导入的文件达到 limit 个时停止"""
+    batch: List[ArchiveMember] = []
+    size = 0
+    readable = 0
+    try:
+        for member in members:
+            batch.append(member)
+            size += len(member.content or "")
+            readable += member.content is not None
+            if len(batch) >= IMPORT_BATCH_FILES or size >= IMPORT_BATCH_BYTES or readable >= limit:
+                break
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error) as e:
+        raise ArchiveError(f"归档已损坏：{e}")
+    return batch
+
+
+async def import_project_archive(
+    db: AsyncSession,
+    project_id: int,
+    fileobj: BinaryIO,
+    max_file_size: Optional[int] = None,
+    max_files: Optional[int] = None,
+) -> ImportResult:
+    """把归档中的文本文件按路径写入项目（已有文件追加新版本），每批提交一次
+    
+    导入的文件数达到 max_files 后停止读取归档，剩余的文件不再解压。
+    """
+    max_file_size = max_file_size or settings.max_file_size
+    max_files = max_files or settings.project_import_max_files
+    result = ImportResult()
+    members = read_archive(fileobj, max_file_size)
+    imported = 0
+    seen: Set[str] = set()
+    
+    while True:
+        if imported >= max_files:
+            # 只再读取一个文件，判断归档中是否还有剩余
+            rest = await asyncio.to_thread(_next_batch, members, 0)
+            if rest:
+                result.truncated = True
+                result.skip(rest[0].path, "too many files")
+            break
+        
+        # 读取与解压在线程中进行，避免阻塞事件循环
+        batch = await asyncio.to_thread(_next_batch, members, max_files - imported)
+        if not batch:
+            break
+        
+        upserts: List[FileOperation] = []
+        for member in batch:
+            if member.content is None:
+                result.skip(member.path, member.reason)
+                continue
+            # 归档中重复的路径（可能在不同批次中）以第一个为准，之后的跳过
+            if member.path in seen:
+                result.skip(member.path, "duplicate path")
+                continue
+            seen.add(member.path)
+            imported += 1
+            upserts.append(FileOperation(
+                action="upsert",
+                file_path=member.path,
+                content=member.content,
+                language=LANGUAGES_BY_EXTENSION.get(posixpath.splitext(member.path)[1].lower())
+            ))
+        
+        for item in await apply_file_operations(db, project_id, upserts):
+            if item.status == "created":
+                result.created += 1
+            elif item.status == "updated":
+                result.updated += 1
+            else:
+                result.unchanged += 1
+        await db.commit()
+    
+    return result
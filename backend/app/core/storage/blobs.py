@@ -0,0 +1,175 @@
+"""内容寻址的本地对象存储
+
+对象按内容的 SHA-256 寻址，相同内容只保存一份，路径为 <upload_dir>/objects/<哈希前两位>/<其余部分>。
+启用压缩且安装了 zstandard 时以 zstd 压缩保存（文件名带 .zst 后缀，压缩后不更小则保存原文）。
+写入先落到临时文件再原子替换，并发写入同一内容不会产生不完整的对象。
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import AsyncIterator, Optional, Set, Tuple
+
+import aiofiles
+import structlog
+
+from app.config import settings
+
+logger = structlog.get_logger()
+
+try:
+    import zstandard
+except ImportError:  # 压缩是可选功能
+    zstandard = None
+
+# 流式读取的块大小
+CHUNK_SIZE = 64 * 1024
+# 清理时跳过最近写入的对象：它们可能属于尚未提交的事务
+PRUNE_GRACE_SECONDS = 3600
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobNotFound(Exception):
+    """对象不存在"""
+    pass
+
+
+def content_hash(data: bytes) -> str:
+    """计算内容的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """内容寻址的对象存储
+    
+    文件系统操作合并为一次线程池调用（定位、读写、压缩一并完成），项目通常由大量小文件组成，
+    逐个操作各占一次线程切换的开销会超过读写本身；只有大对象的流式读取逐块使用 aiofiles。
+    """
+    
+    def __init__(self, root: str, compress: bool = None, level: int = None):
+        self.root = os.path.join(root, "objects")
+        compress = settings.blob_compression if compress is None else compress
+        if compress and zstandard is None:
+            logger.warning("zstandard is not installed, storing blobs uncompressed")
+        self.compress = compress and zstandard is not None
+        self.level = level or settings.blob_compression_level
+    
+    def _path(self, digest: str, compressed: bool) -> str:
+        if not _DIGEST_PATTERN.match(digest):
+            raise ValueError(f"无效的对象哈希：{digest}")
+        path = os.path.join(self.root, digest[:2], digest[2:])
+        return path + ".zst" if compressed else path
+    
+    def _locate(self, digest: str) -> Tuple[str, bool]:
+        """返回对象路径与是否压缩"""
+        for compressed in (True, False):
+            path = self._path(digest, compressed)
+            if os.path.exists(path):
+                return path, compressed
+        raise BlobNotFound(digest)
+    
+    def _exists(self, digest: str) -> bool:
+        try:
+            self._locate(digest)
+        except BlobNotFound:
+            return False
+        return True
+    
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(self._exists, digest)
+    
+    def _write(self, digest: str, data: bytes) -> None:
+        try:
+            path, _ = self._locate(digest)
+        except BlobNotFound:
+            pass
+        else:
+            # 已存在的对象可能已不被引用（如旧版本的完整内容），刷新修改时间，清理时按新写入的对象跳过
+            os.utime(path)
+            return
+        payload, compressed = data, False
+        if self.compress:
+            packed = zstandard.ZstdCompressor(level=self.level).compress(data)
+            if len(packed) < len(data):
+                payload, compressed = packed, True
+        
+        path = self._path(digest, compressed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    async def put(self, data: bytes) -> str:
+        """保存内容并返回其哈希；内容已存在时直接返回"""
+        digest = content_hash(data)
+        await asyncio.to_thread(self._write, digest, data)
+        return digest
+    
+    def _read(self, digest: str, limit: Optional[int] = None) -> Tuple[str, bool, Optional[bytes]]:
+        """定位对象并读取内容（已解压）；对象超过 limit 字节时只返回路径"""
+        path, compressed = self._locate(digest)
+        if limit is not None and os.path.getsize(path) > limit:
+            return path, compressed, None
+        with open(path, "rb") as f:
+            data = f.read()
+        if compressed:
+            data = zstandard.ZstdDecompressor().decompress(data)
+        return path, compressed, data
+    
+    async def get(self, digest: str) -> bytes:
+        """读取完整内容"""
+        _, _, data = await asyncio.to_thread(self._read, digest)
+        return data
+    
+    async def stream(self, digest: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """按块读取内容：小对象一次读出，大对象用 aiofiles 逐块读取，压缩对象边读边解压"""
+        path, compressed, data = await asyncio.to_thread(self._read, digest, chunk_size)
+        if data is not None:
+            if data:
+                yield data
+            return
+        
+        decompressor = zstandard.ZstdDecompressor().decompressobj() if compressed else None
+        async with aiofiles.open(path, "rb") as f:
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                    if not chunk:
+                        continue
+                yield chunk
+    
+    def _prune(self, referenced: Set[str], grace: float) -> int:
+        removed = 0
+        cutoff = time.time() - grace
+        if not os.path.isdir(self.root):
+            return 0
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                digest = prefix.name + entry.name.split(".", 1)[0]
+                if digest in referenced or entry.stat().st_mtime > cutoff:
+                    continue
+                os.remove(entry.path)
+                removed += 1
+        return removed
+    
+    async def prune(self, referenced: Set[str], grace: float = PRUNE_GRACE_SECONDS) -> int:
+        """删除未被引用的对象，返回删除的数量"""
+        return await asyncio.to_thread(self._prune, referenced, grace)
+
+
+# 全局对象存储
+blob_store = BlobStore(settings.upload_dir)
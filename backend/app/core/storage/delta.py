@@ -0,0 +1,43 @@
+"""行级差量编码
+
+差量是一个 JSON 数组，每一项为 [起始行, 结束行]（复制基础版本中的行区间）或字符串（插入的文本）。
+"""
+import difflib
+import json
+from typing import List, Union
+
+DeltaOp = Union[List[int], str]
+
+
+def make_delta(base: str, target: str) -> List[DeltaOp]:
+    """计算从 base 到 target 的差量"""
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    delta: List[DeltaOp] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(target_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(base: str, delta: List[DeltaOp]) -> str:
+    """把差量应用到 base 上"""
+    base_lines = base.splitlines(keepends=True)
+    parts: List[str] = []
+    for op in delta:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return "".join(parts)
+
+
+def encode_delta(delta: List[DeltaOp]) -> bytes:
+    return json.dumps(delta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_delta(data: bytes) -> List[DeltaOp]:
+    return json.loads(data)
@@ -0,0 +1,307 @@
+"""项目文件内容与版本历史
+
+文件的当前内容以完整对象保存（ProjectFile.content_hash）。每次内容变化追加一条 ProjectFileVersion：
+每隔 file_version_keyframe_interval 个版本保存一次完整内容，其余版本保存相对上一版本的行级差量，
+差量不够小时同样保存完整内容。读取历史版本时从最近的完整版本开始依次应用差量，并用版本记录的
+content_hash 校验；新内容总是先保存完整对象（作为文件的当前内容），被替换后若不是完整版本即可被清理
+（scripts/prune_blobs.py）。
+apply_file_operations 以固定条数的批量语句按路径创建、更新、删除多个文件。
+内容变化与删除文件时在同一事务中更新全文索引（app.core.storage.search）。
+"""
+import asyncio
+import posixpath
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.project import ProjectFile, ProjectFileVersion
+from .blobs import BlobStore, blob_store, content_hash
+from .delta import apply_delta, decode_delta, encode_delta, make_delta
+from .search import index_files, index_row, remove_files
+
+# 差量小于完整内容的这个比例时才保存差量
+DELTA_MAX_RATIO = 0.8
+# 超过此行数的文件不计算差量（逐行比较在大文件上代价较高）
+DELTA_MAX_LINES = 20000
+
+
+class FileContentError(Exception):
+    """版本历史损坏或不完整"""
+    pass
+
+
+@dataclass
+class ContentWrite:
+    """一次内容写入：新内容的哈希与大小，以及要追加的版本记录"""
+    content_hash: str
+    size: int
+    version: int
+    blob_hash: str
+    base_version: Optional[int]
+    
+    def version_row(self, file_id: int) -> Dict[str, Any]:
+        return {
+            "file_id": file_id,
+            "version": self.version,
+            "content_hash": self.content_hash,
+            "size": self.size,
+            "blob_hash": self.blob_hash,
+            "base_version": self.base_version,
+        }
+
+
+async def prepare_content(
+    content: str,
+    previous_hash: Optional[str],
+    previous_version: int,
+    store: BlobStore = blob_store,
+) -> Optional[ContentWrite]:
+    """保存新内容的对象，并按需计算相对上一版本的差量；内容未变化时返回 None"""
+    data = content.encode("utf-8")
+    digest = content_hash(data)
+    if digest == previous_hash:
+        return None
+    
+    await store.put(data)
+    version = (previous_version or 0) + 1
+    blob_hash, base_version = digest, None
+    keyframe = (version - 1) % settings.file_version_keyframe_interval == 0
+    if previous_hash is not None and not keyframe:
+        previous = (await store.get(previous_hash)).decode("utf-8")
+        if max(previous.count("\n"), content.count("\n")) < DELTA_MAX_LINES:
+            delta = encode_delta(await asyncio.to_thread(make_delta, previous, content))
+            if len(delta) < len(data) * DELTA_MAX_RATIO:
+                blob_hash, base_version = await store.put(delta), version - 1
+    return ContentWrite(digest, len(data), version, blob_hash, base_version)
+
+
+async def write_file_content(
+    db: AsyncSession,
+    file: ProjectFile,
+    content: str,
+    store: BlobStore = blob_store,
+) -> bool:
+    """写入文件的新内容并追加版本记录，内容未变化时返回 False；由调用方提交事务"""
+    write = await prepare_content(content, file.content_hash, file.version, store)
+    if write is None:
+        return False
+    
+    if file.id is None:
+        await db.flush()
+    file.content_hash = write.content_hash
+    file.size = write.size
+    file.version = write.version
+    db.add(ProjectFileVersion(**write.version_row(file.id)))
+    await index_files(db, [index_row(file.id, file.project_id, file.file_path, content)])
+    return True
+
+
+@dataclass
+class FileOperation:
+    """批量操作中的一项，按 file_path 定位文件
+    
+    action：create（已存在时失败）、update（不存在时失败）、upsert、delete
+    """
+    action: str
+    file_path: str
+    content: Optional[str] = None
+    file_type: Optional[str] = None
+    language: Optional[str] = None
+
+
+@dataclass
+class FileOperationResult:
+    """批量操作中一项的结果
+    
+    status：created、updated、unchanged、deleted、not_found（update/delete 的文件不存在）、
+    exists（create 的文件已存在）
+    """
+    file_path: str
+    action: str
+    status: str
+    file_id: Optional[int] = None
+    version: Optional[int] = None
+
+
+async def _prepare(
+    op: FileOperation,
+    previous_hash: Optional[str],
+    previous_version: int,
+    store: BlobStore,
+) -> Optional[ContentWrite]:
+    if op.content is None:
+        return None
+    return await prepare_content(op.content, previous_hash, previous_version, store)
+
+
+async def apply_file_operations(
+    db: AsyncSession,
+    project_id: int,
+    operations: Sequence[FileOperation],
+    store: BlobStore = blob_store,
+) -> List[FileOperationResult]:
+    """在当前事务中批量创建、更新、删除项目文件，由调用方提交
+    
+    不论文件数多少，只执行固定几条语句：按 (project_id, file_path) 唯一索引一次查出涉及的文件，
+    再分别批量插入新文件、按主键批量更新、批量删除并批量插入版本记录。file_path 在 operations
+    中不能重复。
+    """
+    paths = [op.file_path for op in operations]
+    existing = {
+        row.file_path: row
+        for row in (await db.execute(
+            select(
+                ProjectFile.id,
+                ProjectFile.file_path,
+                ProjectFile.content_hash,
+                ProjectFile.version,
+                ProjectFile.file_type,
+                ProjectFile.language
+            ).where(
+                ProjectFile.project_id == project_id,
+                ProjectFile.file_path.in_(paths)
+            )
+        )).all()
+    } if paths else {}
+    
+    results: List[FileOperationResult] = []
+    inserts: List[Tuple[FileOperationResult, FileOperation]] = []
+    updates: List[Tuple[FileOperationResult, FileOperation, Any]] = []
+    deletes: List[int] = []
+    for op in operations:
+        current = existing.get(op.file_path)
+        result = FileOperationResult(op.file_path, op.action, "")
+        results.append(result)
+        if op.action == "delete":
+            if current is None:
+                result.status = "not_found"
+            else:
+                deletes.append(current.id)
+                result.status, result.file_id = "deleted", current.id
+        elif current is None:
+            if op.action == "update":
+                result.status = "not_found"
+            else:
+                inserts.append((result, op))
+        elif op.action == "create":
+            result.status, result.file_id, result.version = "exists", current.id, current.version
+        else:
+            updates.append((result, op, current))
+    
+    # 内容对象在线程池中并行写入
+    insert_writes = await asyncio.gather(*(_prepare(op, None, 0, store) for _, op in inserts))
+    update_writes = await asyncio.gather(*(
+        _prepare(op, current.content_hash, current.version, store) for _, op, current in updates
+    ))
+    
+    versions: List[Dict[str, Any]] = []
+    indexed: List[Dict[str, Any]] = []
+    if inserts:
+        rows = []
+        for (result, op), write in zip(inserts, insert_writes):
+            rows.append({
+                "project_id": project_id,
+                "file_path": op.file_path,
+                "file_name": posixpath.basename(op.file_path),
+                "file_type": op.file_type,
+                "language": op.language,
+                "content_hash": write.content_hash if write else None,
+                "size": write.size if write else 0,
+                "version": write.version if write else 0,
+            })
+        ids = {
+            row.file_path: row.id
+            for row in (await db.execute(
+                insert(ProjectFile).returning(ProjectFile.id, ProjectFile.file_path), rows
+            )).all()
+        }
+        for (result, op), write in zip(inserts, insert_writes):
+            result.status, result.file_id = "created", ids[op.file_path]
+            result.version = write.version if write else 0
+            if write:
+                versions.append(write.version_row(result.file_id))
+                indexed.append(index_row(result.file_id, project_id, op.file_path, op.content))
+    
+    rows = []
+    for (result, op, current), write in zip(updates, update_writes):
+        result.file_id, result.version = current.id, current.version
+        # 只更新实际变化的字段
+        values = {
+            field: getattr(op, field)
+            for field in ("file_type", "language")
+            if getattr(op, field) is not None and getattr(op, field) != getattr(current, field)
+        }
+        if write:
+            values.update(content_hash=write.content_hash, size=write.size, version=write.version)
+            result.version = write.version
+            versions.append(write.version_row(current.id))
+            indexed.append(index_row(current.id, project_id, op.file_path, op.content))
+        result.status = "updated" if values else "unchanged"
+        if values:
+            rows.append({"id": current.id, **values})
+    # 按主键批量更新（相同字段组合的行合并为一次 executemany）
+    if rows:
+        await db.execute(update(ProjectFile), rows)
+    
+    if deletes:
+        await remove_files(db, deletes)
+        await db.execute(delete(ProjectFileVersion).where(ProjectFileVersion.file_id.in_(deletes)))
+        await db.execute(delete(ProjectFile).where(ProjectFile.id.in_(deletes)))
+    if versions:
+        await db.execute(insert(ProjectFileVersion), versions)
+    await index_files(db, indexed)
+    return results
+
+
+async def read_file_content(file: ProjectFile, store: BlobStore = blob_store) -> Optional[str]:
+    """读取文件的当前内容"""
+    if file.content_hash is None:
+        return None
+    return (await store.get(file.content_hash)).decode("utf-8")
+
+
+async def list_file_versions(db: AsyncSession, file_id: int) -> List[ProjectFileVersion]:
+    """文件的版本记录，最新的在前"""
+    return list((await db.scalars(
+        select(ProjectFileVersion).where(
+            ProjectFileVersion.file_id == file_id
+        ).order_by(ProjectFileVersion.version.desc())
+    )).all())
+
+
+async def read_file_version(
+    db: AsyncSession,
+    file: ProjectFile,
+    version: int,
+    store: BlobStore = blob_store,
+) -> Optional[str]:
+    """还原文件某个版本的内容，版本不存在时返回 None"""
+    if version == file.version:
+        return await read_file_content(file, store)
+    
+    # 最近的完整版本到目标版本之间的记录
+    keyframe = select(func.max(ProjectFileVersion.version)).where(
+        ProjectFileVersion.file_id == file.id,
+        ProjectFileVersion.base_version.is_(None),
+        ProjectFileVersion.version <= version
+    ).scalar_subquery()
+    chain = (await db.scalars(
+        select(ProjectFileVersion).where(
+            ProjectFileVersion.file_id == file.id,
+            ProjectFileVersion.version.between(keyframe, version)
+        ).order_by(ProjectFileVersion.version)
+    )).all()
+    if not chain or chain[-1].version != version:
+        return None
+    if chain[0].base_version is not None:
+        raise FileContentError(f"文件 {file.id} 的版本 {version} 缺少完整版本")
+    
+    content = (await store.get(chain[0].blob_hash)).decode("utf-8")
+    for record in chain[1:]:
+        content = apply_delta(content, decode_delta(await store.get(record.blob_hash)))
+    if content_hash(content.encode("utf-8")) != chain[-1].content_hash:
+        raise FileContentError(f"文件 {file.id} 的版本 {version} 校验失败")
+    return content
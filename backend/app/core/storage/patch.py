@@ -0,0 +1,212 @@
+"""按片段修改文件内容
+
+补丁由若干片段组成，每个片段为要查找的原文 search 与替换后的文本 replace；统一差异格式（unified diff）
+的每个 hunk 转换为同样的片段（上下文行与删除行为原文，上下文行与新增行为替换文本，新文件中的起始行作为位置提示）。
+片段按顺序应用：先在当前内容中精确查找原文，找不到时按行比较（忽略缩进与行尾空白，替换文本按实际缩进调整）。
+有多处匹配时取离位置提示最近的一处，没有位置提示则视为有歧义。任何片段无法定位时整个补丁不应用。
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(Exception):
+    """片段无法在文件中定位"""
+    pass
+
+
+class DiffFormatError(Exception):
+    """无法解析的统一差异格式"""
+    pass
+
+
+@dataclass
+class EditHunk:
+    """一处修改；search 为空时把 replace 插入到 line_hint 所在行之前（没有提示时追加到末尾）"""
+    search: str
+    replace: str
+    line_hint: Optional[int] = None
+
+
+@dataclass
+class AppliedHunk:
+    """已应用的修改：start_line 为替换文本在修改后内容中的起始行（从 1 开始）"""
+    start_line: int
+    old_lines: int
+    new_lines: int
+    search: str
+    replace: str
+
+
+def _line_count(text: str) -> int:
+    if not text:
+        return 0
+    return text.count("\n") + (0 if text.endswith("\n") else 1)
+
+
+def _line_end(content: str, position: int) -> int:
+    """position 所在行的结束位置（换行符之后）"""
+    end = content.find("\n", position)
+    return len(content) if end == -1 else end + 1
+
+
+def _nearest(candidates: List[Tuple[int, int, int]], hint: Optional[int], index: int) -> Tuple[int, int, int]:
+    """从 (起始偏移, 结束偏移, 起始行) 中选出离提示最近的一处"""
+    if len(candidates) == 1:
+        return candidates[0]
+    if hint is None:
+        raise PatchError(f"第 {index} 个修改片段在文件中有 {len(candidates)} 处匹配，无法确定位置")
+    return min(candidates, key=lambda candidate: abs(candidate[2] - hint))
+
+
+def _with_lines(content: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int, int]]:
+    """为按位置排序的 (起始偏移, 结束偏移) 加上起始行号"""
+    result = []
+    line, counted = 1, 0
+    for start, end in spans:
+        line += content.count("\n", counted, start)
+        counted = start
+        result.append((start, end, line))
+    return result
+
+
+def _exact_matches(content: str, search: str) -> List[Tuple[int, int]]:
+    spans = []
+    position = content.find(search)
+    while position != -1:
+        spans.append((position, position + len(search)))
+        position = content.find(search, position + 1)
+    return spans
+
+
+def _line_matches(content: str, wanted: List[str]) -> List[Tuple[int, int]]:
+    """按行匹配（忽略缩进与行尾空白）的 (首行起始偏移, 末行结束偏移)；先查找首行文本缩小范围"""
+    spans = []
+    position = content.find(wanted[0])
+    while position != -1:
+        start = content.rfind("\n", 0, position) + 1
+        end = _line_end(content, position)
+        cursor = start
+        for text in wanted:
+            if cursor >= len(content) and text:
+                break
+            line_end = _line_end(content, cursor)
+            if content[cursor:line_end].strip() != text:
+                break
+            cursor = line_end
+        else:
+            spans.append((start, cursor))
+        position = content.find(wanted[0], end)
+    return spans
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip(" \t"))]
+
+
+def _locate(content: str, hunk: EditHunk, index: int) -> Tuple[int, int, int, str]:
+    """定位片段，返回 (起始偏移, 结束偏移, 起始行, 实际替换文本)"""
+    spans = _exact_matches(content, hunk.search)
+    if spans:
+        start, end, line = _nearest(_with_lines(content, spans), hunk.line_hint, index)
+        return start, end, line, hunk.replace
+    
+    search_lines = hunk.search.splitlines()
+    # 首尾空行不参与按行匹配
+    while search_lines and not search_lines[0].strip():
+        search_lines.pop(0)
+    while search_lines and not search_lines[-1].strip():
+        search_lines.pop()
+    spans = _line_matches(content, [line.strip() for line in search_lines]) if search_lines else []
+    if not spans:
+        raise PatchError(f"第 {index} 个修改片段在文件中找不到")
+    start, end, line = _nearest(_with_lines(content, spans), hunk.line_hint, index)
+    
+    # 替换文本按文件中实际缩进与片段缩进的差异调整
+    expected, actual = _indent(search_lines[0]), _indent(content[start:end])
+    replace_lines = hunk.replace.splitlines(keepends=True)
+    if expected != actual:
+        replace_lines = [
+            actual + text[len(expected):] if text.startswith(expected) and text.strip() else text
+            for text in replace_lines
+        ]
+    replace = "".join(replace_lines)
+    if replace and not replace.endswith("\n") and content[start:end].endswith("\n"):
+        replace += "\n"
+    return start, end, line, replace
+
+
+def apply_hunks(content: str, hunks: Sequence[EditHunk]) -> Tuple[str, List[AppliedHunk]]:
+    """按顺序应用修改片段，返回修改后的内容与各片段的位置；无法应用时抛出 PatchError"""
+    applied: List[AppliedHunk] = []
+    for index, hunk in enumerate(hunks, 1):
+        if hunk.search:
+            start, end, line, replace = _locate(content, hunk, index)
+        else:
+            # 插入到提示行之前，没有提示或超出末尾时追加
+            if content and not content.endswith("\n"):
+                content += "\n"
+            start, line = len(content), content.count("\n") + 1
+            if hunk.line_hint is not None and hunk.line_hint < line:
+                start, line = 0, 1
+                while line < hunk.line_hint:
+                    start, line = content.index("\n", start) + 1, line + 1
+            end, replace = start, hunk.replace
+        old_lines = _line_count(content[start:end])
+        content = content[:start] + replace + content[end:]
+        applied.append(AppliedHunk(line, old_lines, _line_count(replace), hunk.search, replace))
+    return content, applied
+
+
+def parse_unified_diff(diff: str) -> List[EditHunk]:
+    """把单个文件的统一差异格式转换为修改片段（忽略 ---/+++ 文件头）"""
+    hunks: List[EditHunk] = []
+    old: Optional[List[str]] = None
+    new: List[str] = []
+    hint: Optional[int] = None
+    last = ""
+    
+    def finish() -> None:
+        if old is not None and (old or new):
+            hunks.append(EditHunk("".join(old), "".join(new), hint))
+    
+    lines = diff.splitlines()
+    for number, line in enumerate(lines):
+        header = _HUNK_HEADER.match(line)
+        if header:
+            finish()
+            old, new = [], []
+            hint = max(int(header.group(3)), 1)
+            continue
+        if old is None:
+            # 第一个 hunk 之前的文件头与说明
+            continue
+        if line.startswith("\\"):
+            # "\ No newline at end of file" 作用于上一行
+            if last in ("-", " ") and old:
+                old[-1] = old[-1].rstrip("\n")
+            if last in ("+", " ") and new:
+                new[-1] = new[-1].rstrip("\n")
+            continue
+        if line.startswith("--- ") and number + 1 < len(lines) and lines[number + 1].startswith("+++ "):
+            # 下一个文件的文件头
+            finish()
+            old = None
+            continue
+        prefix, text = (line[0], line[1:]) if line else (" ", "")
+        if prefix == " ":
+            old.append(text + "\n")
+            new.append(text + "\n")
+        elif prefix == "-":
+            old.append(text + "\n")
+        elif prefix == "+":
+            new.append(text + "\n")
+        else:
+            raise DiffFormatError(f"无法解析的差异行：{line[:80]}")
+        last = prefix
+    finish()
+    if not hunks:
+        raise DiffFormatError("差异中没有修改片段")
+    return hunks
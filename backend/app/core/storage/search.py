@@ -0,0 +1,175 @@
+"""项目文件全文搜索（SQLite FTS5）
+
+索引表 project_file_search 以文件 id 为 rowid，保存路径、内容与所属项目的标记，使用 trigram 分词：可以搜索任意不少于
+3 个字符的子串（不区分大小写），标识符中间的片段同样能命中。项目标记是 MATCH 表达式的一部分，
+全文索引只返回该项目的文件，搜索延迟取决于项目大小而不是整个数据库。索引在写入文件内容的同一事务中更新
+（app.core.storage.files），删除文件或项目时一并删除，不会与文件表不一致。
+非 SQLite 数据库或 SQLite 不支持 trigram 分词（3.34 之前）时搜索不可用，索引操作为空操作。
+"""
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.project import FTS5_TRIGRAM_AVAILABLE
+
+SEARCH_AVAILABLE = (
+    settings.search_enabled
+    and make_url(settings.database_url).get_backend_name() == "sqlite"
+    and FTS5_TRIGRAM_AVAILABLE
+)
+
+# trigram 分词下短于 3 个字符的词无法使用索引
+MIN_TERM_LENGTH = 3
+# 片段最多包含的 token 数（trigram 分词下约等于字符数）
+SNIPPET_TOKENS = 48
+# 路径命中比内容命中的权重更高
+PATH_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+# 项目标记不参与相关度
+PROJECT_WEIGHT = 0.0
+
+# 片段中命中部分的标记，转义后替换为 <mark>；索引时从内容中去掉这两个字符
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+_STRIP_MARKS = str.maketrans("", "", _MARK_START + _MARK_END)
+_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+_INDEX_SQL = text(
+    "INSERT OR REPLACE INTO project_file_search (rowid, file_path, content, project) "
+    "VALUES (:file_id, :file_path, :content, :project)"
+)
+_REMOVE_SQL = text(
+    "DELETE FROM project_file_search WHERE rowid IN :file_ids"
+).bindparams(bindparam("file_ids", expanding=True))
+_REMOVE_PROJECT_SQL = text(
+    "DELETE FROM project_file_search WHERE rowid IN (SELECT id FROM project_files WHERE project_id = :project_id)"
+)
+
+
+class SearchQueryError(Exception):
+    """无法使用的搜索词"""
+    pass
+
+
+@dataclass
+class SearchHit:
+    """一条搜索结果；path_highlight 与 snippet 已做 HTML 转义，命中部分以 <mark> 包围"""
+    file_id: int
+    file_path: str
+    language: Optional[str]
+    score: float
+    path_highlight: str
+    snippet: str
+
+
+def project_token(project_id: int) -> str:
+    """项目标记：两端的 p 使一个项目的标记不会是另一个项目标记的子串（p12p 不在 p112p 中）"""
+    return f"p{project_id}p"
+
+
+def index_row(file_id: int, project_id: int, file_path: str, content: Optional[str]) -> Dict[str, Any]:
+    """生成一行索引数据；内容过大时只索引路径"""
+    if content is None or len(content) > settings.search_index_max_file_size:
+        content = ""
+    return {
+        "file_id": file_id,
+        "file_path": file_path,
+        "content": content.translate(_STRIP_MARKS),
+        "project": project_token(project_id),
+    }
+
+
+async def index_files(db: AsyncSession, rows: Sequence[Dict[str, Any]]) -> None:
+    """写入或替换文件的索引（一条 executemany），由调用方提交"""
+    if SEARCH_AVAILABLE and rows:
+        await db.execute(_INDEX_SQL, list(rows))
+
+
+async def remove_files(db: AsyncSession, file_ids: Sequence[int]) -> None:
+    """删除文件的索引"""
+    if SEARCH_AVAILABLE and file_ids:
+        await db.execute(_REMOVE_SQL, {"file_ids": list(file_ids)})
+
+
+async def remove_project(db: AsyncSession, project_id: int) -> None:
+    """删除项目所有文件的索引，需在删除文件记录之前调用"""
+    if SEARCH_AVAILABLE:
+        await db.execute(_REMOVE_PROJECT_SQL, {"project_id": project_id})
+
+
+def build_match_query(query: str) -> str:
+    """把用户输入转换为 FTS5 查询：空白分隔的词（或双引号内的短语）全部命中，不解析 FTS5 语法"""
+    terms = []
+    for match in _TERM_PATTERN.finditer(query):
+        term = match.group(1) if match.group(1) is not None else match.group(2)
+        term = term.strip()
+        if len(term) >= MIN_TERM_LENGTH:
+            terms.append('"' + term.replace('"', '""') + '"')
+    if not terms:
+        raise SearchQueryError(f"搜索词至少需要 {MIN_TERM_LENGTH} 个字符")
+    return " AND ".join(terms)
+
+
+def _render(fragment: str) -> str:
+    # 相邻的命中合并为一段
+    fragment = fragment.replace(_MARK_END + _MARK_START, "")
+    return html.escape(fragment).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+async def search_files(
+    db: AsyncSession,
+    project_id: int,
+    query: str,
+    language: Optional[str] = None,
+    path: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[SearchHit]:
+    """在项目内搜索文件，按 bm25 相关度排序
+    
+    language 按文件语言精确过滤，path 为 GLOB 模式（如 src/*.tsx，* 可匹配 /）。
+    """
+    filters = ""
+    params: Dict[str, Any] = {
+        # 用户的词只在路径与内容中匹配，否则包含项目标记的词（如 p12p）会命中项目的所有文件
+        "match": f'project : "{project_token(project_id)}" AND {{file_path content}} : ({build_match_query(query)})',
+        "project_id": project_id,
+        "limit": limit,
+        "offset": offset,
+    }
+    if language is not None:
+        filters += " AND f.language = :language"
+        params["language"] = language
+    if path is not None:
+        filters += " AND f.file_path GLOB :path"
+        params["path"] = path
+    
+    rows = (await db.execute(text(
+        "SELECT project_file_search.rowid AS file_id, f.file_path, f.language, "
+        f"bm25(project_file_search, {PATH_WEIGHT}, {CONTENT_WEIGHT}, {PROJECT_WEIGHT}) AS score, "
+        "highlight(project_file_search, 0, char(2), char(3)) AS path_highlight, "
+        f"snippet(project_file_search, 1, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet "
+        # CROSS JOIN 固定以全文索引为外层，否则规划器可能逐个文件执行 MATCH；
+        # MATCH 已限定项目，project_id 条件只是防御
+        "FROM project_file_search CROSS JOIN project_files AS f ON f.id = project_file_search.rowid "
+        "WHERE project_file_search MATCH :match AND f.project_id = :project_id"
+        f"{filters} ORDER BY score LIMIT :limit OFFSET :offset"
+    ), params)).all()
+    return [
+        SearchHit(
+            file_id=row.file_id,
+            file_path=row.file_path,
+            language=row.language,
+            # bm25 越小越相关，取反后越大越相关
+            score=-row.score,
+            path_highlight=_render(row.path_highlight),
+            snippet=_render(row.snippet or ""),
+        )
+        for row in rows
+    ]
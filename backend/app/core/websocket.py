@@ -0,0 +1,210 @@
+"""WebSocket 长连接
+
+- WebSocketChannel：一个连接的所有发送都进入有界队列，由单独的写任务按顺序发送。客户端读取慢时队列填满，
+  生产者（如流式生成回复的任务）在 send 处等待，不再读取上游的流式响应（背压）；积压期间同一请求相邻的
+  token 帧合并为一帧发送。连接上的并发请求作为任务登记在连接上，连接关闭时一并取消。
+- ChannelRegistry：一个后台任务统一处理所有连接的心跳，定期发送 ping，关闭超过 heartbeat_timeout
+  未收到任何帧或认证令牌已过期的连接；空闲连接除读写任务外不占用其他任务。同时登记进程内所有连接上
+  进行中对话的会话 id，同一会话同时只能有一轮（无论来自哪个连接）。
+
+帧为 JSON 对象，type 为帧类型；token 帧的格式为 {"type": "token", "request_id": ..., "delta": ...}。
+"""
+import asyncio
+import json
+import time
+from typing import Any, Coroutine, Dict, Optional, Set
+
+import structlog
+from starlette import status
+from starlette.websockets import WebSocket
+
+from app.config import settings
+from app.core.metrics import registry
+
+logger = structlog.get_logger()
+
+Frame = Dict[str, Any]
+
+
+class ChannelClosed(Exception):
+    """连接已关闭"""
+    pass
+
+
+class WebSocketChannel:
+    """一个 WebSocket 连接上的有界发送队列与并发请求"""
+    
+    def __init__(self, websocket: WebSocket, expires_at: Optional[float] = None, queue_size: Optional[int] = None):
+        self.websocket = websocket
+        # 认证令牌的过期时间（Unix 时间戳）
+        self.expires_at = expires_at
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self._shutdown = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or settings.chat_ws_send_queue_size)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._writer = asyncio.create_task(self._write_loop())
+    
+    def touch(self) -> None:
+        """收到客户端的帧"""
+        self.last_seen = time.monotonic()
+    
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize()
+    
+    async def send(self, frame: Frame) -> None:
+        """排队发送一帧，队列已满时等待"""
+        if self.closed:
+            raise ChannelClosed()
+        await self._queue.put(frame)
+    
+    def try_send(self, frame: Frame) -> bool:
+        """不等待地排队发送，连接已关闭或队列已满时返回 False"""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+    
+    async def _write_loop(self) -> None:
+        pending: Optional[Frame] = None
+        try:
+            while True:
+                frame = pending or await self._queue.get()
+                pending = None
+                # 积压时合并同一请求相邻的 token 帧
+                while frame.get("type") == "token" and not self._queue.empty():
+                    following = self._queue.get_nowait()
+                    if following.get("type") == "token" and following.get("request_id") == frame.get("request_id"):
+                        frame = {**frame, "delta": frame["delta"] + following["delta"]}
+                    else:
+                        pending = following
+                        break
+                await self.websocket.send_text(json.dumps(frame, ensure_ascii=False))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 客户端已断开，读取循环随后收到断开事件
+            logger.debug("WebSocket send failed", error=str(e))
+            self.closed = True
+    
+    @property
+    def active(self) -> int:
+        """进行中的请求数"""
+        return len(self._tasks)
+    
+    def has_task(self, key: str) -> bool:
+        return key in self._tasks
+    
+    def spawn(self, key: str, coro: Coroutine) -> asyncio.Task:
+        """在连接上启动一个请求，结束后自动注销"""
+        task = asyncio.create_task(coro)
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+    
+    def cancel(self, key: str) -> bool:
+        task = self._tasks.get(key)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+    
+    async def close(self, code: int = status.WS_1000_NORMAL_CLOSURE, reason: str = "") -> None:
+        """取消进行中的请求并关闭连接（可重复调用）"""
+        if self._shutdown:
+            return
+        self._shutdown = self.closed = True
+        tasks = [*self._tasks.values(), self._writer]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            # 已经关闭或客户端已断开
+            pass
+
+
+class ChannelRegistry:
+    """已建立的连接、统一的心跳与进行中的会话"""
+    
+    def __init__(self):
+        self._channels: Set[WebSocketChannel] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._active_sessions: Set[int] = set()
+    
+    def __len__(self) -> int:
+        return len(self._channels)
+    
+    def add(self, channel: WebSocketChannel) -> None:
+        self._channels.add(channel)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+    
+    def discard(self, channel: WebSocketChannel) -> None:
+        self._channels.discard(channel)
+    
+    def session_busy(self, session_id: int) -> bool:
+        return session_id in self._active_sessions
+    
+    def claim_session(self, session_id: int) -> bool:
+        """登记会话上的一轮对话，会话已有一轮在进行时返回 False"""
+        if session_id in self._active_sessions:
+            return False
+        self._active_sessions.add(session_id)
+        return True
+    
+    def release_session(self, session_id: int) -> None:
+        self._active_sessions.discard(session_id)
+    
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.chat_ws_heartbeat_interval)
+            now, wall = time.monotonic(), time.time()
+            closing = []
+            for channel in list(self._channels):
+                if now - channel.last_seen > settings.chat_ws_heartbeat_timeout:
+                    closing.append(channel.close(status.WS_1001_GOING_AWAY, "Heartbeat timeout"))
+                elif channel.expires_at is not None and wall >= channel.expires_at:
+                    closing.append(channel.close(status.WS_1008_POLICY_VIOLATION, "Token expired"))
+                else:
+                    # 队列已满说明连接正忙，不需要再发心跳
+                    channel.try_send({"type": "ping"})
+            if closing:
+                await asyncio.gather(*closing, return_exceptions=True)
+    
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "connections": len(self._channels),
+            "active_requests": sum(channel.active for channel in self._channels),
+            "active_sessions": len(self._active_sessions),
+            "queued_frames": sum(channel.queued for channel in self._channels),
+        }
+    
+    async def aclose(self) -> None:
+        """应用关闭时关闭所有连接"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        open_channels = list(self._channels)
+        self._channels.clear()
+        await asyncio.gather(
+            *(channel.close(status.WS_1001_GOING_AWAY, "Server shutting down") for channel in open_channels),
+            return_exceptions=True
+        )
+
+
+# 全局连接注册表
+channels = ChannelRegistry()
+
+registry.gauge(
+    "kidvibe_websocket_channels",
+    "Open WebSocket connections, in-flight requests, busy chat sessions and frames waiting to be sent",
+    ("stat",),
+    lambda: {(name,): value for name, value in channels.snapshot().items()},
+)
@@ -1,30 +1,109 @@
-from sqlalchemy import create_engine
+from typing import Any, AsyncIterator, Dict
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.core.metrics import instrument_engine
+
+logger = structlog.get_logger()
+
+# 同步驱动到异步驱动的映射
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """将配置中的数据库 URL 转换为异步驱动 URL"""
+    url = make_url(database_url)
+    if url.drivername in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[url.drivername])
+    return url.render_as_string(hide_password=False)
+
+
+def _is_memory_sqlite(database_url: str) -> bool:
+    return make_url(database_url).database in (None, "", ":memory:")
+
+
+def sqlite_pragmas(database_url: str) -> Dict[str, Any]:
+    """根据配置生成每个 SQLite 连接建立时执行的 PRAGMA"""
+    pragmas: Dict[str, Any] = {
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "busy_timeout": settings.sqlite_busy_timeout,
+        "temp_store": "MEMORY",
+        # SQLite 默认不检查外键，模型中声明的 ON DELETE CASCADE 需要开启后才生效
+        "foreign_keys": "ON",
+    }
+    # 内存数据库不支持 WAL 与 mmap
+    if not _is_memory_sqlite(database_url):
+        pragmas["journal_mode"] = settings.sqlite_journal_mode
+        pragmas["mmap_size"] = settings.sqlite_mmap_size
+    return pragmas
+
+
+def apply_sqlite_pragmas(async_engine: AsyncEngine, pragmas: Dict[str, Any]) -> None:
+    """在连接建立事件中设置 SQLite PRAGMA"""
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_database_engine(database_url: str) -> AsyncEngine:
+    """按数据库类型创建调优后的异步引擎"""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        async_engine = create_async_engine(
+            get_async_database_url(database_url),
+            connect_args={"check_same_thread": False}
+        )
+        apply_sqlite_pragmas(async_engine, sqlite_pragmas(database_url))
+    else:
+        async_engine = create_async_engine(
+            get_async_database_url(database_url),
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=settings.db_pool_pre_ping,
+            pool_recycle=settings.db_pool_recycle
+        )
+    
+    if settings.metrics_enabled:
+        instrument_engine(async_engine.sync_engine)
+    return async_engine
+
 
 # 创建数据库引擎
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+engine = create_database_engine(settings.database_url)
 
-# 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 创建会话工厂（提交后不过期对象，避免在事件循环中触发隐式懒加载）
+SessionLocal = async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # 创建基础模型类
 Base = declarative_base()
 
 
-def get_db():
+async def get_db() -> AsyncIterator[AsyncSession]:
     """获取数据库会话"""
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+async def init_db():
     """初始化数据库"""
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    import app.models  # noqa: F401  注册所有模型
+    
+    from app.models.project import upgrade_search_index
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if await conn.run_sync(upgrade_search_index):
+            logger.warning("Search index schema changed, run scripts/rebuild_search_index.py to repopulate it")
@@ -1,12 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 import structlog
 
 from app.config import settings
-from app.database import init_db
+from app.database import engine, init_db
 from app.api.v1 import api_router
+from app.core.ai.factory import AIClientFactory
+from app.core.ai.prompts import precompile as precompile_prompts
+from app.core.ai.summarizer import summarizer
+from app.core.metrics import MetricsMiddleware, registry
+from app.core.jobs.queue import job_queue
+from app.core.passwords import password_hasher
+from app.core.websocket import channels
 
 
 # 配置日志
@@ -36,13 +44,22 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时执行
     logger.info("Starting KidVibe application...")
-    init_db()
+    await init_db()
     logger.info("Database initialized")
+    await job_queue.recover()
+    logger.info("Prompt templates compiled", templates=precompile_prompts())
     
     yield
     
     # 关闭时执行
     logger.info("Shutting down KidVibe application...")
+    await channels.aclose()
+    await job_queue.stop()
+    await summarizer.aclose()
+    await AIClientFactory.close_all()
+    logger.info("AI clients closed")
+    password_hasher.shutdown()
+    await engine.dispose()
 
 
 # 创建 FastAPI 应用
@@ -70,6 +87,10 @@ app.add_middleware(
     allowed_hosts=["*"] if settings.debug else ["localhost", "127.0.0.1"]
 )
 
+# 请求延迟统计放在最外层，计入其他中间件的耗时
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 # 包含 API 路由
 app.include_router(api_router, prefix="/api/v1")
 
@@ -90,6 +111,12 @@ async def health_check():
     return {"status": "healthy", "version": settings.app_version}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,6 @@
+from .user import User
+from .project import Project, ProjectFile, ProjectFileVersion
+from .chat import ChatSession, ChatMessage
+from .job import Job
+
+__all__ = ["User", "Project", "ProjectFile", "ProjectFileVersion", "ChatSession", "ChatMessage", "Job"]
@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+
+
+class ChatSession(Base):
+    """聊天会话模型"""
+    __tablename__ = "chat_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    title = Column(String(255))
+    context = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    project = relationship("Project", back_populates="chat_sessions")
+    # 消息可能有数千条，不随会话加载，删除时由接口批量删除
+    messages = relationship(
+        "ChatMessage",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="ChatMessage.created_at",
+        passive_deletes=True
+    )
+
+
+class ChatMessage(Base):
+    """聊天消息模型"""
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        # 会话内按 (created_at, id) 游标分页
+        Index("ix_chat_messages_session_created", "session_id", "created_at", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(20), nullable=False)  # user, assistant, system
+    content = Column(Text, nullable=False)
+    # metadata 是声明式基类的保留属性名，映射到同名列
+    message_metadata = Column("metadata", JSON)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    session = relationship("ChatSession", back_populates="messages")
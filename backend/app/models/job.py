@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, JSON, String, Text
+
+from app.database import Base
+
+
+class Job(Base):
+    """后台任务模型"""
+    __tablename__ = "jobs"
+    
+    id = Column(String(32), primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    kind = Column(String(50), nullable=False)  # analyze_requirements, generate_code, generate_project
+    status = Column(String(20), default="queued", index=True, nullable=False)  # queued, running, retrying, succeeded, failed
+    priority = Column(Integer, default=5, nullable=False)  # 0 最高
+    provider = Column(String(50))
+    payload = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=1, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
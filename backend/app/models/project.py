@@ -0,0 +1,104 @@
+import sqlite3
+from datetime import datetime
+from sqlalchemy import Column, DDL, DateTime, ForeignKey, Index, Integer, JSON, String, Text, event
+from sqlalchemy.orm import relationship
+
+from app.database import Base
+
+
+class Project(Base):
+    """项目模型"""
+    __tablename__ = "projects"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), nullable=False)
+    description = Column(Text)
+    initial_prompt = Column(Text, nullable=False)
+    tech_stack = Column(JSON)
+    status = Column(String(50), default="draft", nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    owner = relationship("User", back_populates="projects")
+    files = relationship("ProjectFile", back_populates="project", cascade="all, delete-orphan")
+    chat_sessions = relationship("ChatSession", back_populates="project", cascade="all, delete-orphan")
+
+
+class ProjectFile(Base):
+    """项目文件模型"""
+    __tablename__ = "project_files"
+    __table_args__ = (
+        # 项目内路径唯一，按路径批量定位文件时走这个索引（也覆盖按 project_id 的查询）
+        Index("ix_project_files_project_path", "project_id", "file_path", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    file_path = Column(String(500), nullable=False)
+    file_name = Column(String(255), nullable=False)
+    # 内容保存在对象存储中（app.core.storage），这里只记录哈希与大小
+    content_hash = Column(String(64))
+    size = Column(Integer, default=0, nullable=False)
+    version = Column(Integer, default=0, nullable=False)
+    file_type = Column(String(50))
+    language = Column(String(50))
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    project = relationship("Project", back_populates="files")
+
+
+# 文件全文索引（SQLite FTS5，trigram 分词支持任意子串搜索），rowid 为文件 id，由 app.core.storage.search 维护；
+# project 列保存所属项目的标记，查询时作为 MATCH 条件，使全文索引只返回该项目的文件
+FTS5_TRIGRAM_AVAILABLE = sqlite3.sqlite_version_info >= (3, 34, 0)
+SEARCH_INDEX_COLUMNS = ("file_path", "content", "project")
+
+_CREATE_SEARCH_INDEX_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS project_file_search "
+    f"USING fts5({', '.join(SEARCH_INDEX_COLUMNS)}, tokenize='trigram')"
+)
+
+event.listen(
+    ProjectFile.__table__,
+    "after_create",
+    DDL(_CREATE_SEARCH_INDEX_SQL).execute_if(
+        dialect="sqlite", callable_=lambda *args, **kwargs: FTS5_TRIGRAM_AVAILABLE
+    )
+)
+event.listen(
+    ProjectFile.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS project_file_search").execute_if(dialect="sqlite")
+)
+
+
+def upgrade_search_index(connection) -> bool:
+    """旧版本创建的索引表缺少列时删除并重建（内容为空，需要运行 scripts/rebuild_search_index.py），返回是否重建"""
+    if connection.dialect.name != "sqlite" or not FTS5_TRIGRAM_AVAILABLE:
+        return False
+    columns = tuple(row[1] for row in connection.exec_driver_sql("PRAGMA table_info(project_file_search)"))
+    if not columns or columns == SEARCH_INDEX_COLUMNS:
+        return False
+    connection.exec_driver_sql("DROP TABLE project_file_search")
+    connection.exec_driver_sql(_CREATE_SEARCH_INDEX_SQL)
+    return True
+
+
+class ProjectFileVersion(Base):
+    """项目文件版本模型"""
+    __tablename__ = "project_file_versions"
+    __table_args__ = (
+        Index("ix_project_file_versions_file_version", "file_id", "version", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # 版本可能很多，不随文件加载，删除时由接口批量删除
+    file_id = Column(Integer, ForeignKey("project_files.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # 该版本完整内容的哈希（只用于校验，不保证对象存在）
+    size = Column(Integer, nullable=False)
+    # base_version 为空时 blob_hash 指向完整内容，否则指向相对 base_version 的差量
+    blob_hash = Column(String(64), nullable=False)
+    base_version = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
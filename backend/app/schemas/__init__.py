@@ -1,12 +1,16 @@
 from .user import User, UserCreate, UserUpdate, UserLogin, Token, TokenData
-from .project import Project, ProjectCreate, ProjectUpdate, ProjectFile, ProjectFileCreate, ProjectFileUpdate, TechStack
-from .chat import ChatSession, ChatSessionCreate, ChatSessionUpdate, ChatMessage, ChatMessageCreate, ChatRequest, ChatResponse
+from .project import Project, ProjectCreate, ProjectUpdate, ProjectFile, ProjectFileCreate, ProjectFileUpdate, ProjectFileVersion, ProjectImportResult, ProjectFileOperation, ProjectFileBatch, ProjectFileOperationResult, ProjectSearchResult, TechStack
+from .chat import ChatSession, ChatSessionCreate, ChatSessionUpdate, ChatMessage, ChatMessageCreate, ChatMessagePage, ChatRequest, ChatResponse
+from .job import Job, JobCreate
 
 __all__ = [
     # User schemas
     "User", "UserCreate", "UserUpdate", "UserLogin", "Token", "TokenData",
     # Project schemas
-    "Project", "ProjectCreate", "ProjectUpdate", "ProjectFile", "ProjectFileCreate", "ProjectFileUpdate", "TechStack",
+    "Project", "ProjectCreate", "ProjectUpdate", "ProjectFile", "ProjectFileCreate", "ProjectFileUpdate", "ProjectFileVersion", "ProjectImportResult",
+    "ProjectFileOperation", "ProjectFileBatch", "ProjectFileOperationResult", "ProjectSearchResult", "TechStack",
     # Chat schemas
-    "ChatSession", "ChatSessionCreate", "ChatSessionUpdate", "ChatMessage", "ChatMessageCreate", "ChatRequest", "ChatResponse"
+    "ChatSession", "ChatSessionCreate", "ChatSessionUpdate", "ChatMessage", "ChatMessageCreate", "ChatMessagePage", "ChatRequest", "ChatResponse",
+    # Job schemas
+    "Job", "JobCreate"
 ] 
\ No newline at end of file
@@ -1,13 +1,18 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, AliasChoices
+
+from app.schemas.project import CodeChange
 
 
 class ChatMessageBase(BaseModel):
     """聊天消息基础模式"""
     role: str  # user, assistant, system
     content: str
-    metadata: Optional[Dict[str, Any]] = None
+    # ORM 模型中对应 message_metadata 属性
+    metadata: Optional[Dict[str, Any]] = Field(
+        default=None, validation_alias=AliasChoices("message_metadata", "metadata")
+    )
 
 
 class ChatMessageCreate(ChatMessageBase):
@@ -60,20 +65,34 @@ class ChatSessionInDB(ChatSessionBase):
 
 
 class ChatSession(ChatSessionInDB):
-    """聊天会话响应模式"""
-    messages: List[ChatMessage] = []
+    """聊天会话响应模式（不内嵌消息，消息通过分页接口获取）"""
+    pass
+
+
+class ChatMessagePage(BaseModel):
+    """聊天消息分页结果"""
+    items: List[ChatMessage]
+    next_cursor: Optional[str] = None
 
 
 class ChatRequest(BaseModel):
-    """聊天请求模式"""
+    """聊天请求模式
+    
+    context 中指定 file_id（会话所属项目中的文件）时，同时按消息修改该文件，修改片段通过 code_changes 返回（不写入文件）。
+    """
     message: str
     session_id: Optional[int] = None
     context: Optional[Dict[str, Any]] = None
 
 
+class ChatChannelRequest(ChatRequest):
+    """聊天 WebSocket 中开始一轮对话的帧，request_id 由客户端指定，用于对应服务端的事件与取消"""
+    request_id: str = Field(..., min_length=1, max_length=64)
+
+
 class ChatResponse(BaseModel):
     """聊天响应模式"""
     message: ChatMessage
     session_id: int
     suggestions: Optional[List[str]] = None
-    code_changes: Optional[List[Dict[str, Any]]] = None 
\ No newline at end of file
+    code_changes: Optional[List[CodeChange]] = None 
\ No newline at end of file
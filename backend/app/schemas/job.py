@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional, Dict, Any, Literal
+from pydantic import BaseModel, Field
+
+
+class JobCreate(BaseModel):
+    """提交后台任务模式"""
+    kind: Literal["analyze_requirements", "generate_code", "generate_project"]
+    payload: Dict[str, Any]
+    priority: int = Field(default=5, ge=0, le=9)  # 0 最高
+
+
+class Job(BaseModel):
+    """后台任务响应模式"""
+    id: str
+    kind: str
+    status: str
+    priority: int
+    provider: Optional[str] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, List, Literal
+from pydantic import BaseModel, Field, model_validator
 
 
 class TechStack(BaseModel):
@@ -53,7 +53,6 @@ class ProjectFileBase(BaseModel):
     """项目文件基础模式"""
     file_path: str
     file_name: str
-    content: Optional[str] = None
     file_type: Optional[str] = None
     language: Optional[str] = None
 
@@ -61,6 +60,7 @@ class ProjectFileBase(BaseModel):
 class ProjectFileCreate(ProjectFileBase):
     """创建项目文件模式"""
     project_id: int
+    content: Optional[str] = None
 
 
 class ProjectFileUpdate(BaseModel):
@@ -74,6 +74,9 @@ class ProjectFileInDB(ProjectFileBase):
     """数据库中的项目文件模式"""
     id: int
     project_id: int
+    content_hash: Optional[str] = None
+    size: int
+    version: int
     created_at: datetime
     updated_at: datetime
     
@@ -82,5 +85,119 @@ class ProjectFileInDB(ProjectFileBase):
 
 
 class ProjectFile(ProjectFileInDB):
-    """项目文件响应模式"""
-    pass 
\ No newline at end of file
+    """项目文件响应模式（列表默认不含内容）"""
+    content: Optional[str] = None
+
+
+class ProjectFileVersion(BaseModel):
+    """项目文件版本模式"""
+    version: int
+    content_hash: str
+    size: int
+    base_version: Optional[int] = None  # 为空表示保存的是完整内容，否则为差量
+    created_at: datetime
+    content: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class ProjectImportResult(BaseModel):
+    """项目归档导入结果"""
+    created: int
+    updated: int
+    unchanged: int
+    skipped_count: int
+    skipped: List[Dict[str, str]]  # 最多列出前 100 项
+    truncated: bool = False  # 达到文件数上限，其余文件未读取
+
+
+class ProjectFileOperation(BaseModel):
+    """批量文件操作中的一项"""
+    action: Literal["create", "update", "upsert", "delete"]
+    file_path: str
+    content: Optional[str] = None
+    file_type: Optional[str] = None
+    language: Optional[str] = None
+
+
+class ProjectFileBatch(BaseModel):
+    """批量文件操作请求"""
+    operations: List[ProjectFileOperation] = Field(..., min_length=1, max_length=1000)
+
+
+class ProjectFileOperationResult(BaseModel):
+    """批量文件操作中一项的结果"""
+    file_path: str
+    action: str
+    status: str  # created, updated, unchanged, deleted, not_found, exists
+    file_id: Optional[int] = None
+    version: Optional[int] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class ProjectGenerate(BaseModel):
+    """生成项目文件请求"""
+    prompt: Optional[str] = None  # 默认使用项目的 initial_prompt
+    concurrency: Optional[int] = Field(default=None, ge=1, le=16)
+
+
+class CodeEditHunk(BaseModel):
+    """修改片段：search 为文件中的原文，replace 为替换后的文本"""
+    search: str
+    replace: str
+
+
+class AppliedCodeEditHunk(CodeEditHunk):
+    """已应用的修改片段，start_line 为替换文本在修改后文件中的起始行"""
+    start_line: int
+    old_lines: int
+    new_lines: int
+
+
+class CodeChange(BaseModel):
+    """一个文件的修改，base_version 为修改所基于的文件版本"""
+    file_id: int
+    file_path: str
+    base_version: int
+    hunks: List[AppliedCodeEditHunk]
+
+
+class ProjectFileEdit(BaseModel):
+    """按要求修改文件请求；apply 为 false 时只返回修改片段，不写入文件"""
+    instruction: str = Field(..., min_length=1)
+    apply: bool = True
+
+
+class ProjectFilePatch(BaseModel):
+    """应用补丁请求：修改片段或统一差异格式（unified diff）二选一"""
+    hunks: Optional[List[CodeEditHunk]] = Field(default=None, min_length=1, max_length=1000)
+    diff: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_one_source(self) -> "ProjectFilePatch":
+        if (self.hunks is None) == (self.diff is None):
+            raise ValueError("Exactly one of hunks and diff is required")
+        return self
+
+
+class ProjectFileEditResult(BaseModel):
+    """文件修改结果"""
+    file: ProjectFile
+    applied: bool
+    code_changes: List[CodeChange]
+
+
+class ProjectSearchResult(BaseModel):
+    """项目文件搜索结果（path_highlight 与 snippet 已转义，命中部分以 <mark> 标记）"""
+    file_id: int
+    file_path: str
+    language: Optional[str] = None
+    score: float
+    path_highlight: str
+    snippet: str
+    
+    class Config:
+        from_attributes = True
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+AI 客户端并发基准测试
+
+启动一个模拟 Gemini API 的本地服务（固定延迟），分别用以下两种方式并发调用：
+- to_thread：旧实现，在线程池中执行阻塞的 HTTP 调用
+- async：GeminiClient 基于共享 httpx.AsyncClient 的原生异步调用
+
+输出吞吐量与峰值线程数。用法：
+    python scripts/bench_ai_client.py --requests 512 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve(port: int, latency: float):
+    """运行模拟 LLM 服务"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    mock_app = FastAPI()
+
+    @mock_app.post("/v1beta/models/{model_action}")
+    async def generate(model_action: str):
+        await asyncio.sleep(latency)
+        return {"candidates": [{"content": {"parts": [{"text": "你好，我是模拟的 AI 助手。"}]}}]}
+
+    uvicorn.run(mock_app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def sample_threads(stop: asyncio.Event, peak: list):
+    """周期性采样当前线程数"""
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.01)
+
+
+async def run(name: str, call, total: int):
+    stop = asyncio.Event()
+    peak = [threading.active_count()]
+    sampler = asyncio.create_task(sample_threads(stop, peak))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await sampler
+    print(f"{name:<10} {total} 个请求  耗时 {elapsed:6.2f}s  吞吐 {total / elapsed:8.1f} req/s  峰值线程 {peak[0]}")
+
+
+async def main(args):
+    base_url = f"http://127.0.0.1:{args.port}/v1beta"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["GEMINI_API_KEY"] = "benchmark"
+    os.environ["GEMINI_BASE_URL"] = base_url
+    os.environ["AI_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["AI_MAX_CONNECTIONS"] = str(args.concurrency)
+    os.environ["AI_MAX_KEEPALIVE_CONNECTIONS"] = str(args.concurrency)
+
+    import requests
+    from app.core.ai.gemini import GeminiClient
+    from app.core.ai.transport import close_http_client
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=64)
+    session.mount("http://", adapter)
+    url = f"{base_url}/models/mock:generateContent"
+
+    async def to_thread_call():
+        response = await asyncio.to_thread(session.post, url, json={"contents": []})
+        return response.json()
+
+    client = GeminiClient()
+
+    async def async_call():
+        return await client.chat("你好", [])
+
+    # 预热连接
+    await to_thread_call()
+    await async_call()
+
+    await run("to_thread", to_thread_call, args.requests)
+    await run("async", async_call, args.requests)
+
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI 客户端并发基准测试")
+    parser.add_argument("--requests", type=int, default=512, help="请求总数")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟 LLM 响应延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=256, help="异步客户端并发上限")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.latency)
+        sys.exit(0)
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port), "--latency", str(args.latency)]
+    )
+    try:
+        time.sleep(2)
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+AI 客户端工厂微基准测试
+
+对比每次请求新建 GeminiClient 与从 AIClientFactory 注册表复用实例的单次开销，
+并确认复用的实例共享同一个连接池。用法：
+    python scripts/bench_ai_factory.py --iterations 100000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from app.core.ai.factory import AIClientFactory
+from app.core.ai.gemini import GeminiClient
+
+
+def main(iterations: int):
+    new_instance = timeit.timeit(GeminiClient, number=iterations)
+    pooled = timeit.timeit(AIClientFactory.get_default_client, number=iterations)
+
+    print(f"每次新建实例：{new_instance / iterations * 1e6:8.3f} µs/次")
+    print(f"注册表复用：  {pooled / iterations * 1e6:8.3f} µs/次")
+
+    first = AIClientFactory.get_default_client()
+    second = AIClientFactory.get_default_client()
+    print(f"跨请求复用同一实例：{first is second}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI 客户端工厂微基准测试")
+    parser.add_argument("--iterations", type=int, default=100000)
+    main(parser.parse_args().iterations)
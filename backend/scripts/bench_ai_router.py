@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+AI 多服务提供方路由测试
+
+启动一个本地模拟服务，同时提供 Gemini、OpenAI 与 Ollama 协议的接口，各自的延迟、长尾概率与
+错误率可在运行中调整。依次运行以下场景，输出各后端承接的请求数、整体延迟与失败数：
+- steady：各后端延迟不同且带长尾，对比仅用单一后端、路由不对冲、路由并对冲
+- outage：最快的后端全部返回 500，观察熔断与故障转移
+- recovery：恢复该后端，冷却期后经半开试探重新接流量
+
+用法：
+    python scripts/bench_ai_router.py --requests 200 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 各后端默认行为：基础延迟（秒）、长尾概率、长尾倍数、错误率
+DEFAULT_BEHAVIOUR = {
+    "gemini": {"latency": 0.15, "tail": 0.05, "tail_factor": 10.0, "error_rate": 0.0},
+    "openai": {"latency": 0.05, "tail": 0.05, "tail_factor": 20.0, "error_rate": 0.0},
+    "ollama": {"latency": 0.10, "tail": 0.0, "tail_factor": 1.0, "error_rate": 0.0},
+}
+
+
+def serve(port: int):
+    """运行模拟 LLM 服务"""
+    import uvicorn
+    from fastapi import FastAPI, HTTPException
+    
+    mock_app = FastAPI()
+    behaviour = {name: dict(values) for name, values in DEFAULT_BEHAVIOUR.items()}
+    text = "你好，我是模拟的 AI 助手。"
+    
+    async def simulate(provider: str):
+        config = behaviour[provider]
+        latency = config["latency"]
+        if random.random() < config["tail"]:
+            latency *= config["tail_factor"]
+        await asyncio.sleep(latency)
+        if random.random() < config["error_rate"]:
+            raise HTTPException(status_code=500, detail="mock failure")
+    
+    @mock_app.post("/_control/{provider}")
+    async def control(provider: str, values: dict):
+        behaviour[provider].update(values)
+        return behaviour[provider]
+    
+    @mock_app.post("/gemini/v1beta/models/{model_action}")
+    async def gemini(model_action: str):
+        await simulate("gemini")
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+    
+    @mock_app.post("/openai/v1/chat/completions")
+    async def openai():
+        await simulate("openai")
+        return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+    
+    @mock_app.post("/ollama/api/generate")
+    async def ollama():
+        await simulate("ollama")
+        return {"response": text, "done": True}
+    
+    uvicorn.run(mock_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def percentile(samples: list, q: int) -> float:
+    return statistics.quantiles(samples, n=100)[q - 1] if len(samples) > 1 else samples[0]
+
+
+async def run(name: str, client, args) -> None:
+    from app.core.ai.base import is_error_result
+    
+    latencies, failures = [], 0
+    counter = iter(range(args.requests))
+    
+    async def worker():
+        nonlocal failures
+        for i in counter:
+            start = time.perf_counter()
+            result = await client.chat(f"第 {i} 个问题", [])
+            latencies.append(time.perf_counter() - start)
+            failures += is_error_result(result)
+    
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    line = (
+        f"{name:<18} p50 {percentile(latencies, 50) * 1000:7.1f}ms  p95 {percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f}ms  失败 {failures}"
+    )
+    print(line)
+    if hasattr(client, "snapshot"):
+        for backend, stats in client.snapshot().items():
+            p50 = f"{stats['p50'] * 1000:6.1f}ms" if stats["p50"] is not None else "     -  "
+            print(f"    {backend:<7} {stats['state']:<9} p50 {p50}  错误率 {stats['error_rate']:.2f}  样本 {stats['samples']}")
+
+
+async def main(args):
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.update(
+        GEMINI_API_KEY="benchmark",
+        GEMINI_BASE_URL=f"{base}/gemini/v1beta",
+        OPENAI_API_KEY="benchmark",
+        OPENAI_BASE_URL=f"{base}/openai/v1",
+        OLLAMA_BASE_URL=f"{base}/ollama",
+        AI_ROUTER_COOLDOWN=str(args.cooldown),
+        AI_ROUTER_HEDGE_MIN_DELAY="0.05",
+    )
+    
+    import httpx
+    from app.core.ai.gemini import GeminiClient
+    from app.core.ai.openai import OpenAIClient
+    from app.core.ai.ollama import OllamaClient
+    from app.core.ai.router import RouterAIClient
+    from app.core.ai.transport import close_http_client
+    
+    def make_router(hedge: bool) -> RouterAIClient:
+        return RouterAIClient({"gemini": GeminiClient(), "openai": OpenAIClient(), "ollama": OllamaClient()}, hedge=hedge)
+    
+    async with httpx.AsyncClient(base_url=base) as control:
+        print("== steady ==")
+        await run("gemini only", GeminiClient(), args)
+        await run("router (no hedge)", make_router(hedge=False), args)
+        router = make_router(hedge=True)
+        await run("router (hedge)", router, args)
+        
+        print("== outage: openai 全部失败 ==")
+        await control.post("/_control/openai", json={"error_rate": 1.0})
+        await run("router (hedge)", router, args)
+        
+        print("== recovery ==")
+        await control.post("/_control/openai", json={"error_rate": 0.0})
+        await asyncio.sleep(args.cooldown)
+        await run("router (hedge)", router, args)
+    
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI 多服务提供方路由测试")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--cooldown", type=float, default=2.0, help="熔断冷却时间（秒）")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.port)
+        sys.exit(0)
+    
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port)])
+    try:
+        time.sleep(2)
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+相同 AI 请求合并（single-flight）效果演示
+
+模拟一个班级同时提交相同的需求描述：用固定延迟的模拟客户端统计上游调用次数，
+对比直接调用与经过 SingleFlightAIClient 合并后的上游调用数与总耗时，并演示流式聊天的扇出。用法：
+    python scripts/bench_ai_singleflight.py --students 30 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core.ai.base import BaseAIClient
+from app.core.ai.singleflight import SingleFlightAIClient, SINGLEFLIGHT_COALESCED
+
+
+class MockClient(BaseAIClient):
+    """固定延迟并统计调用次数的模拟客户端"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.model_name = "mock"
+    
+    async def _respond(self, value):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return value
+    
+    async def generate_code(self, prompt, context):
+        return await self._respond("print('hello')")
+    
+    async def analyze_requirements(self, description):
+        return await self._respond({"tech_stack": {}, "features": ["跳跃"], "complexity": "简单"})
+    
+    async def plan_files(self, description, analysis):
+        return await self._respond({"files": []})
+    
+    async def edit_code(self, code, instruction, file_path, related_code=None):
+        return await self._respond({"edits": []})
+    
+    async def suggest_improvements(self, code, feedback):
+        return await self._respond(["ok"])
+    
+    async def chat(self, message, history):
+        return await self._respond("你好")
+    
+    async def stream_chat(self, message, history):
+        self.calls += 1
+        for word in ["让", "我们", "一起", "做", "小游戏"]:
+            await asyncio.sleep(self.latency / 5)
+            yield word
+
+
+async def run(name: str, client: BaseAIClient, mock: MockClient, students: int) -> None:
+    # 描述只在空白上不同，规范化后相同
+    descriptions = [("  做一个会跳的\n猫 游戏 " if i % 2 else "做一个会跳的 猫 游戏") for i in range(students)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client.analyze_requirements(d) for d in descriptions))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {students} 个请求  上游调用 {mock.calls:3d}  耗时 {elapsed:5.2f}s")
+
+
+async def main(args):
+    mock = MockClient(args.latency)
+    await run("direct", mock, mock, args.students)
+    
+    mock = MockClient(args.latency)
+    await run("singleflight", SingleFlightAIClient(mock), mock, args.students)
+    print(f"合并的请求数：{SINGLEFLIGHT_COALESCED.get(('analyze_requirements',)):.0f}")
+    
+    mock = MockClient(args.latency)
+    client = SingleFlightAIClient(mock)
+    
+    async def listen():
+        return "".join([chunk async for chunk in client.stream_chat("教我做游戏", [])])
+    
+    replies = await asyncio.gather(*(listen() for _ in range(args.students)))
+    print(f"流式扇出：{args.students} 个订阅者  上游调用 {mock.calls}  回复一致 {len(set(replies)) == 1}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="相同 AI 请求合并演示")
+    parser.add_argument("--students", type=int, default=30, help="同时提交的请求数")
+    parser.add_argument("--latency", type=float, default=0.5, help="模拟上游延迟（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+认证请求吞吐量基准测试
+
+在进程内启动应用（临时 SQLite 数据库），以固定并发持续请求 /api/v1/auth/me，
+对比关闭与开启认证缓存（令牌 LRU + 用户快照）时的吞吐量与延迟。用法：
+    python scripts/bench_auth.py --requests 5000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_DIR = tempfile.mkdtemp(prefix="kidvibe-bench-")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/bench.db"
+
+import httpx
+
+from app.main import app
+from app.config import settings
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.api.deps import create_access_token
+from app.core.auth_cache import token_cache, user_cache
+
+
+async def seed(users: int) -> list:
+    await init_db()
+    async with SessionLocal() as db:
+        for i in range(users):
+            db.add(User(email=f"bench{i}@kidvibe.com", username=f"bench{i}", hashed_password="-"))
+        await db.commit()
+    return [create_access_token({"sub": f"bench{i}@kidvibe.com"}) for i in range(users)]
+
+
+async def run(name: str, client: httpx.AsyncClient, tokens: list, args) -> None:
+    token_cache.clear()
+    user_cache.clear()
+    latencies = []
+    counter = iter(range(args.requests))
+    
+    async def worker():
+        for i in counter:
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            start = time.perf_counter()
+            response = await client.get("/api/v1/auth/me", headers=headers)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    
+    print(
+        f"{name:<9} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies):7.2f}ms  "
+        f"p99 {statistics.quantiles(latencies, n=100)[98]:7.2f}ms"
+    )
+
+
+async def main(args):
+    tokens = await seed(args.users)
+    async with httpx.AsyncClient(app=app, base_url="http://localhost") as client:
+        for enabled in (False, True):
+            settings.auth_cache_enabled = enabled
+            await run("cached" if enabled else "uncached", client, tokens, args)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="认证请求吞吐量基准测试")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50, help="参与测试的用户（令牌）数")
+    asyncio.run(main(parser.parse_args()))
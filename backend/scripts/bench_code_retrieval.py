@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+生成代码检索上下文的基准测试
+
+在进程内建立临时 SQLite 数据库与对象存储，批量写入大量文件后测量：首次建立片段索引的耗时、
+修改少量文件后的增量同步耗时、单次检索延迟，以及索引占用的内存。用法：
+    python scripts/bench_code_retrieval.py --files 20000 --file-size 2048
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = tempfile.mkdtemp(prefix="kidvibe-retrieval-")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/bench.db"
+os.environ["UPLOAD_DIR"] = f"{DATA_DIR}/uploads"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["SEARCH_ENABLED"] = "false"
+
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.models.project import Project
+from app.core.ai.retrieval import CodeRetriever
+from app.core.storage.files import FileOperation, apply_file_operations
+
+WORDS = ["player", "score", "jump", "enemy", "level", "sprite", "speed", "draw", "update", "music"]
+QUERIES = [
+    "make the player jump higher when the music plays",
+    "add a high score table",
+    "enemy sprite speed should increase every level",
+]
+BATCH_SIZE = 1000
+
+
+def build_file(rng: random.Random, i: int, file_size: int) -> str:
+    lines, size = [], 0
+    while size < file_size:
+        if rng.random() < 0.1:
+            lines.append(f"\ndef {rng.choice(WORDS)}_{rng.choice(WORDS)}_{i}(self):\n")
+        lines.append(f"    {rng.choice(WORDS)}_{rng.randint(0, 99)} = {rng.choice(WORDS)}({rng.randint(0, 999)})\n")
+        size += len(lines[-1])
+    return "".join(lines)
+
+
+async def seed(files: int, file_size: int) -> int:
+    await init_db()
+    rng = random.Random(0)
+    async with SessionLocal() as db:
+        user = User(email="bench@kidvibe.com", username="bench", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        project = Project(name="大项目", initial_prompt="基准测试", owner_id=user.id)
+        db.add(project)
+        await db.flush()
+        for offset in range(0, files, BATCH_SIZE):
+            await apply_file_operations(db, project.id, [
+                FileOperation("create", f"src/module_{i // 100:03d}/file_{i:05d}.py", build_file(rng, i, file_size))
+                for i in range(offset, min(offset + BATCH_SIZE, files))
+            ])
+        await db.commit()
+        return project.id
+
+
+async def main(args):
+    project_id = await seed(args.files, args.file_size)
+    retriever = CodeRetriever()
+    
+    async with SessionLocal() as db:
+        start = time.perf_counter()
+        index = await retriever.sync(db, project_id)
+        print(f"首次建立索引：{args.files} 个文件，{len(index)} 个片段，{time.perf_counter() - start:.1f}s，"
+              f"{index.nbytes / 1024 / 1024:.1f}MB")
+        
+        start = time.perf_counter()
+        await retriever.sync(db, project_id)
+        print(f"无变化时同步：{(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        rng = random.Random(1)
+        await apply_file_operations(db, project_id, [
+            FileOperation("update", f"src/module_{i // 100:03d}/file_{i:05d}.py", build_file(rng, i, args.file_size))
+            for i in rng.sample(range(args.files), 10)
+        ])
+        await db.commit()
+        start = time.perf_counter()
+        await retriever.sync(db, project_id)
+        print(f"修改 10 个文件后同步：{(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                related = await retriever.retrieve(db, project_id, query)
+                timings.append((time.perf_counter() - start) * 1000)
+            paths = ", ".join(f"{c['file_path']}:{c['start_line']}" for c in related[:3])
+            print(f"{statistics.median(timings):6.1f}ms  {len(related)} 个片段  {query}  [{paths}]")
+    
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成代码检索上下文的基准测试")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--file-size", type=int, default=2048, help="每个文件的大致字节数")
+    parser.add_argument("--repeat", type=int, default=10, help="每个查询的检索次数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+增量修改基准测试
+
+生成一个较大的源文件，模拟若干处小修改：比较修改片段（模型需要输出的内容）与完整文件的大小，
+并测量精确匹配与按行匹配（缩进不一致）两种情况下应用片段的耗时。用法：
+    python scripts/bench_file_patch.py --lines 20000 --hunks 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.storage.patch import EditHunk, apply_hunks
+
+
+def make_file(lines: int) -> str:
+    parts = []
+    for i in range(0, lines, 5):
+        parts.append(f"def handler_{i}(event):\n")
+        parts.append(f"    value = event.get('field_{i}', {i})\n")
+        parts.append(f"    if value > {i % 97}:\n")
+        parts.append(f"        return compute_{i % 13}(value)\n")
+        parts.append("    return None\n")
+    return "".join(parts)
+
+
+def make_hunks(lines: int, count: int, reindent: bool) -> list:
+    hunks = []
+    for n in range(count):
+        i = (lines // count) * n // 5 * 5
+        search = f"    value = event.get('field_{i}', {i})\n    if value > {i % 97}:\n"
+        replace = f"    value = event.get('field_{i}', {i}) or 0\n    if value >= {i % 97}:\n"
+        if reindent:
+            # 模型丢失了缩进
+            search, replace = search.replace("    ", ""), replace.replace("    ", "")
+        hunks.append(EditHunk(search, replace))
+    return hunks
+
+
+def measure(content: str, hunks: list, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        apply_hunks(content, hunks)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main(args):
+    content = make_file(args.lines)
+    hunks = make_hunks(args.lines, args.hunks, reindent=False)
+    edits_size = len(json.dumps(
+        {"edits": [{"search": h.search, "replace": h.replace} for h in hunks]}, ensure_ascii=False
+    ).encode("utf-8"))
+    file_size = len(content.encode("utf-8"))
+    
+    print(f"文件：{args.lines} 行，{file_size / 1024:.0f} KiB；修改 {args.hunks} 处")
+    print(f"模型输出：修改片段 {edits_size / 1024:.1f} KiB，完整文件 {file_size / 1024:.0f} KiB（{file_size / edits_size:.0f} 倍）")
+    print(f"应用片段（精确匹配）：{measure(content, hunks, args.repeat):.2f} ms")
+    reindented = make_hunks(args.lines, args.hunks, reindent=True)
+    assert apply_hunks(content, reindented)[0] == apply_hunks(content, hunks)[0]
+    print(f"应用片段（按行匹配）：{measure(content, reindented, args.repeat):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="增量修改基准测试")
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--hunks", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
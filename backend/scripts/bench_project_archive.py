@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+项目归档导出与导入基准测试
+
+在进程内启动应用（临时 SQLite 数据库与对象存储），通过接口导入一个包含大量文件的 zip，
+再分别以 JSON 列表（include_content=true，整个数组在内存中构建）、zip 与 tar.gz 下载项目，
+输出各场景的耗时、传输大小，以及可选的 Python 内存峰值（tracemalloc）。用法：
+    python scripts/bench_project_archive.py --files 10000 --file-size 2048 --trace-memory
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = tempfile.mkdtemp(prefix="kidvibe-archive-")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/bench.db"
+os.environ["UPLOAD_DIR"] = f"{DATA_DIR}/uploads"
+os.environ["METRICS_ENABLED"] = "false"
+
+import httpx
+
+from app.main import app
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.models.project import Project
+from app.api.deps import create_access_token
+
+WORDS = ["player", "score", "jump", "enemy", "level", "sprite", "speed", "draw", "update", "music"]
+
+
+def build_archive(files: int, file_size: int) -> bytes:
+    """生成包含指定数量源文件的 zip"""
+    rng = random.Random(0)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            lines, size = [], 0
+            while size < file_size:
+                lines.append(f"{rng.choice(WORDS)}_{rng.randint(0, 99)} = {rng.choice(WORDS)}({rng.randint(0, 999)})\n")
+                size += len(lines[-1])
+            archive.writestr(f"src/module_{i // 100:03d}/file_{i:05d}.py", "".join(lines))
+    return buffer.getvalue()
+
+
+async def seed() -> tuple:
+    await init_db()
+    async with SessionLocal() as db:
+        user = User(email="bench@kidvibe.com", username="bench", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        project = Project(name="大项目", initial_prompt="基准测试", owner_id=user.id)
+        db.add(project)
+        await db.commit()
+        return project.id, create_access_token({"sub": "bench@kidvibe.com"})
+
+
+async def measure(name: str, call, trace_memory: bool) -> None:
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    size = await call()
+    elapsed = time.perf_counter() - start
+    line = f"{name:<22} {elapsed:7.2f}s  {size / 1024 / 1024:8.1f}MB"
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"  内存峰值 {peak / 1024 / 1024:7.1f}MB"
+    print(line)
+
+
+async def main(args):
+    project_id, token = await seed()
+    archive = build_archive(args.files, args.file_size)
+    print(f"{args.files} 个文件，每个约 {args.file_size} 字节，zip {len(archive) / 1024 / 1024:.1f}MB")
+    
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=app, base_url="http://localhost", headers=headers, timeout=None) as client:
+        async def import_archive():
+            resp = await client.post(f"/api/v1/projects/{project_id}/import", files={"archive": ("project.zip", archive)})
+            resp.raise_for_status()
+            assert resp.json()["created"] == args.files, resp.json()
+            return len(archive)
+        
+        async def list_json():
+            resp = await client.get(f"/api/v1/projects/{project_id}/files", params={"include_content": "true"})
+            resp.raise_for_status()
+            return len(resp.content)
+        
+        async def download(archive_format: str):
+            size = 0
+            async with client.stream("GET", f"/api/v1/projects/{project_id}/export", params={"format": archive_format}) as resp:
+                resp.raise_for_status()
+                async for chunk in resp.aiter_bytes():
+                    size += len(chunk)
+            return size
+        
+        await measure("import zip", import_archive, args.trace_memory)
+        await measure("list (JSON + content)", list_json, args.trace_memory)
+        await measure("export zip", lambda: download("zip"), args.trace_memory)
+        await measure("export tar.gz", lambda: download("tar.gz"), args.trace_memory)
+    
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="项目归档导出与导入基准测试")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--file-size", type=int, default=2048, help="每个文件的大致字节数")
+    parser.add_argument("--trace-memory", action="store_true", help="用 tracemalloc 统计内存峰值（会明显拖慢耗时）")
+    asyncio.run(main(parser.parse_args()))
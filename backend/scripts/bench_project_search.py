@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+项目文件全文搜索基准测试
+
+在进程内启动应用（临时 SQLite 数据库与对象存储），通过批量接口写入大量文件（同时建立索引），
+然后对若干搜索词分别测量 /projects/{id}/search 的延迟，并与逐个读取文件内容做子串匹配的朴素做法对比。
+--other-files 在同一数据库的另一个项目中写入文件，搜索延迟应只取决于被搜索项目的大小。用法：
+    python scripts/bench_project_search.py --files 20000 --file-size 2048
+    python scripts/bench_project_search.py --files 2000 --other-files 50000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = tempfile.mkdtemp(prefix="kidvibe-search-")
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATA_DIR}/bench.db"
+os.environ["UPLOAD_DIR"] = f"{DATA_DIR}/uploads"
+os.environ["METRICS_ENABLED"] = "false"
+
+import httpx
+from sqlalchemy import select
+
+from app.main import app
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.models.project import Project, ProjectFile
+from app.api.deps import create_access_token
+from app.core.storage.files import read_file_content
+
+WORDS = ["player", "score", "jump", "enemy", "level", "sprite", "speed", "draw", "update", "music"]
+# 常见词、少见词、标识符片段、短语、加路径过滤
+QUERIES = [
+    ({"q": "player"}, "player"),
+    ({"q": "loginForm"}, "loginform"),
+    ({"q": "ore_4"}, "ore_4"),
+    ({"q": '"= enemy("'}, "= enemy("),
+    ({"q": "sprite", "path": "src/module_01*"}, "sprite"),
+]
+BATCH_SIZE = 1000
+
+
+def build_file(rng: random.Random, i: int, file_size: int) -> str:
+    lines, size = [], 0
+    while size < file_size:
+        lines.append(f"{rng.choice(WORDS)}_{rng.randint(0, 99)} = {rng.choice(WORDS)}({rng.randint(0, 999)})\n")
+        size += len(lines[-1])
+    if i % 1000 == 0:
+        lines.append("def render_loginForm():\n    pass\n")
+    return "".join(lines)
+
+
+async def seed() -> tuple:
+    await init_db()
+    async with SessionLocal() as db:
+        user = User(email="bench@kidvibe.com", username="bench", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        project = Project(name="大项目", initial_prompt="基准测试", owner_id=user.id)
+        other = Project(name="其他项目", initial_prompt="基准测试", owner_id=user.id)
+        db.add_all([project, other])
+        await db.commit()
+        return project.id, other.id, create_access_token({"sub": "bench@kidvibe.com"})
+
+
+async def write_files(client: httpx.AsyncClient, project_id: int, count: int, file_size: int, rng: random.Random) -> None:
+    for offset in range(0, count, BATCH_SIZE):
+        operations = [
+            {
+                "action": "create",
+                "file_path": f"src/module_{i // 100:03d}/file_{i:05d}.py",
+                "language": "python",
+                "content": build_file(rng, i, file_size),
+            }
+            for i in range(offset, min(offset + BATCH_SIZE, count))
+        ]
+        resp = await client.post(f"/api/v1/projects/{project_id}/files/batch", json={"operations": operations})
+        resp.raise_for_status()
+
+
+async def naive_search(project_id: int, needle: str) -> int:
+    """读取全部文件内容逐个匹配（没有索引时的做法）"""
+    async with SessionLocal() as db:
+        files = (await db.scalars(select(ProjectFile).where(ProjectFile.project_id == project_id))).all()
+    contents = await asyncio.gather(*(read_file_content(f) for f in files))
+    return sum(1 for content in contents if content and needle in content.lower())
+
+
+async def main(args):
+    project_id, other_id, token = await seed()
+    rng = random.Random(0)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=app, base_url="http://localhost", headers=headers, timeout=None) as client:
+        start = time.perf_counter()
+        await write_files(client, project_id, args.files, args.file_size, rng)
+        print(f"写入并索引 {args.files} 个文件（每个约 {args.file_size} 字节）：{time.perf_counter() - start:.1f}s")
+        if args.other_files:
+            start = time.perf_counter()
+            await write_files(client, other_id, args.other_files, args.file_size, rng)
+            print(f"其他项目写入并索引 {args.other_files} 个文件：{time.perf_counter() - start:.1f}s")
+        
+        print(f"{'query':<36} {'p50':>8} {'p95':>8} {'hits':>6} {'naive':>8}")
+        for params, needle in QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                resp = await client.get(f"/api/v1/projects/{project_id}/search", params=params)
+                timings.append((time.perf_counter() - start) * 1000)
+                resp.raise_for_status()
+            timings.sort()
+            start = time.perf_counter()
+            await naive_search(project_id, needle)
+            naive = (time.perf_counter() - start) * 1000
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            label = " ".join(f"{k}={v}" for k, v in params.items())
+            print(f"{label:<36} {statistics.median(timings):6.1f}ms {p95:6.1f}ms {len(resp.json()):>6} {naive:6.0f}ms")
+    
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="项目文件全文搜索基准测试")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--file-size", type=int, default=2048, help="每个文件的大致字节数")
+    parser.add_argument("--other-files", type=int, default=0, help="同一数据库中其他项目的文件数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个搜索词的请求次数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+提示大小回归基准
+
+用固定的输入渲染每个提示模板（包括各服务提供方变体），输出估算的 token 数：系统指令、本次调用部分，
+以及与“下一次调用”（同一项目的下一个文件、修改重试、对话下一轮等）共享的前缀，并测量渲染耗时。
+与基线文件比较，任何模板的 token 数增长超过容差时以非零状态退出。用法：
+    python scripts/bench_prompt_size.py                 # 与 scripts/prompt_sizes.json 比较
+    python scripts/bench_prompt_size.py --update        # 更新基线
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from app.core.ai.context import estimate_tokens
+from app.core.ai.prompts import get_template, render_prompt, template_names, template_variants
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_sizes.json")
+
+CODE = "".join(
+    f"export function handler{i}(event) {{\n  const value = event.field{i} ?? {i};\n  return value * 2;\n}}\n\n"
+    for i in range(40)
+)
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant", "content": f"第 {i} 轮：按钮 Button{i} 的颜色和间距需要调整"}
+    for i in range(12)
+]
+RELATED = [
+    {"file_path": "src/lib/api.ts", "start_line": 1, "end_line": 4, "content": CODE[:120]},
+    {"file_path": "src/types.ts", "start_line": 1, "end_line": 4, "content": CODE[120:240]},
+]
+GENERATE = {
+    "tech_stack": "Next.js + FastAPI",
+    "project_type": "Web应用",
+    "project_description": "一个待办事项应用，支持登录、分类与截止日期提醒",
+    "related_code": RELATED,
+}
+
+# 每个模板：本次调用的输入与下一次调用的输入
+FIXTURES = {
+    "generate_code": (
+        {**GENERATE, "file_path": "src/components/TodoList.tsx", "prompt": "待办列表组件，支持勾选完成"},
+        {**GENERATE, "file_path": "src/components/TodoItem.tsx", "prompt": "单个待办项，显示截止日期"},
+    ),
+    "analyze_requirements": (
+        {"description": "一个待办事项应用，支持登录、分类与截止日期提醒", "fields": None},
+        {"description": "一个待办事项应用，支持登录、分类与截止日期提醒", "fields": ["complexity"]},
+    ),
+    "plan_files": (
+        {"description": "一个待办事项应用", "tech_stack": {"frontend": "nextjs", "backend": "fastapi"}, "features": ["登录", "分类"]},
+        {"description": "一个记账应用", "tech_stack": {"frontend": "nextjs", "backend": "fastapi"}, "features": ["记账"]},
+    ),
+    "edit_code": (
+        {"code": CODE, "instruction": "把 handler3 的返回值改为乘 3", "file_path": "src/handlers.ts", "related_code": RELATED},
+        {
+            "code": CODE, "instruction": "把 handler3 的返回值改为乘 3\n\n（上一次返回的修改无法应用）",
+            "file_path": "src/handlers.ts", "related_code": RELATED,
+        },
+    ),
+    "suggest_improvements": (
+        {"code": CODE, "feedback": "函数太多，重复代码多"},
+        {"code": CODE, "feedback": "性能不好"},
+    ),
+    "chat": (
+        {"message": "主按钮用什么颜色？", "history": HISTORY},
+        {"message": "间距呢？", "history": HISTORY + [
+            {"role": "user", "content": "主按钮用什么颜色？"},
+            {"role": "assistant", "content": "建议使用品牌主色。"},
+        ]},
+    ),
+    "summarize": (
+        {"summary": "用户在做待办应用", "history": HISTORY[:6]},
+        {"summary": "用户在做待办应用，已确定配色", "history": HISTORY[6:]},
+    ),
+}
+
+
+def shared_prefix(a: str, b: str) -> str:
+    size = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        size += 1
+    return a[:size]
+
+
+def render_time(name: str, variant, context: dict, repeat: int) -> float:
+    template = get_template(name, variant)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        template.render(**context)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def measure(repeat: int) -> dict:
+    sizes = {}
+    print(f"{'模板':<28}{'系统指令':>8}{'本次调用':>8}{'合计':>8}{'共享前缀':>10}{'渲染 µs':>10}")
+    for variant in [None, *template_variants()]:
+        for name in template_names():
+            current, following = FIXTURES[name]
+            prompt = render_prompt(name, variant, **current)
+            prefix = shared_prefix(prompt.text, render_prompt(name, variant, **following).text)
+            system, user = estimate_tokens(prompt.system), estimate_tokens(prompt.user)
+            prefix_tokens = estimate_tokens(prefix)
+            key = f"{variant}/{name}" if variant else name
+            sizes[key] = system + user
+            print(
+                f"{key:<30}{system:>8}{user:>8}{system + user:>8}"
+                f"{prefix_tokens:>7} ({prefix_tokens / (system + user):>3.0%})"
+                f"{render_time(name, variant, current, repeat):>10.1f}"
+            )
+    return sizes
+
+
+def main(args):
+    sizes = measure(args.repeat)
+    if args.update or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(sizes, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n基线已写入 {args.baseline}")
+        return 0
+    
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = []
+    for key, tokens in sizes.items():
+        before = baseline.get(key)
+        if before is not None and tokens > before * (1 + args.tolerance):
+            regressions.append(f"{key}: {before} -> {tokens} tokens")
+    print(f"\n合计：{sum(sizes.values())} tokens（基线 {sum(baseline.get(key, 0) for key in sizes)}）")
+    if regressions:
+        print("提示大小超过基线：\n  " + "\n  ".join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="提示大小回归基准")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update", action="store_true", help="用本次结果更新基线")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="允许的增长比例")
+    parser.add_argument("--repeat", type=int, default=200)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+SQLite 调优前后聊天消息并发读写基准测试
+
+分别在默认配置（回滚日志模式）与 create_database_engine 调优后的引擎（WAL 等 PRAGMA）上，
+并发写入聊天消息并读取最近消息，输出读写吞吐量与锁冲突次数。用法：
+    python scripts/bench_sqlite_pragmas.py --duration 5 --writers 4 --readers 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base, create_database_engine, get_async_database_url
+from app.models import User, Project, ChatSession, ChatMessage
+
+
+async def prepare(engine) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        user = User(email="bench@kidvibe.com", username="bench", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        project = Project(name="bench", initial_prompt="bench", owner_id=user.id)
+        db.add(project)
+        await db.flush()
+        chat_session = ChatSession(project_id=project.id, user_id=user.id, title="bench")
+        db.add(chat_session)
+        await db.commit()
+        return chat_session.id
+
+
+async def writer(session_factory, session_id: int, stop: asyncio.Event, counters: dict):
+    while not stop.is_set():
+        try:
+            async with session_factory() as db:
+                db.add(ChatMessage(session_id=session_id, role="user", content="我想做一个会跳的小猫" * 10))
+                await db.commit()
+            counters["writes"] += 1
+        except OperationalError:
+            counters["locked"] += 1
+
+
+async def reader(session_factory, session_id: int, stop: asyncio.Event, counters: dict):
+    query = select(ChatMessage).where(
+        ChatMessage.session_id == session_id
+    ).order_by(ChatMessage.id.desc()).limit(50)
+    while not stop.is_set():
+        try:
+            async with session_factory() as db:
+                (await db.scalars(query)).all()
+            counters["reads"] += 1
+        except OperationalError:
+            counters["locked"] += 1
+
+
+async def run(name: str, engine, args):
+    session_id = await prepare(engine)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    counters = {"writes": 0, "reads": 0, "locked": 0}
+    stop = asyncio.Event()
+    
+    tasks = [asyncio.create_task(writer(session_factory, session_id, stop, counters)) for _ in range(args.writers)]
+    tasks += [asyncio.create_task(reader(session_factory, session_id, stop, counters)) for _ in range(args.readers)]
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    
+    print(
+        f"{name:<8} 写入 {counters['writes'] / elapsed:8.1f}/s  读取 {counters['reads'] / elapsed:8.1f}/s  "
+        f"锁冲突 {counters['locked']}"
+    )
+
+
+async def main(args):
+    workdir = tempfile.mkdtemp(prefix="kidvibe-bench-")
+    
+    default_url = f"sqlite:///{workdir}/default.db"
+    default_engine = create_async_engine(
+        get_async_database_url(default_url),
+        connect_args={"check_same_thread": False}
+    )
+    await run("default", default_engine, args)
+    
+    await run("tuned", create_database_engine(f"sqlite:///{workdir}/tuned.db"), args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite 调优并发读写基准测试")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种配置持续时间（秒）")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+聊天 WebSocket 负载测试
+
+在进程内启动 uvicorn（单个 worker，临时 SQLite 数据库），AI 客户端替换为按固定间隔逐段产出回复的模拟客户端：
+- 建立大量空闲连接（只认证，不发送消息），统计建立与认证耗时、服务端进程内存增长
+- 同时建立若干活跃连接，每个连接在多个会话上同时对话，统计首个 token 延迟、每轮耗时与吞吐
+- 对比同样的对话轮次逐个通过 POST /chat/chat/stream 发送（每轮一次 HTTP 请求与认证）
+最后检查空闲连接在整个过程中仍然可用（ping 能收到 pong）。客户端与服务端在同一进程内，绝对数值偏保守；
+SQLite 在同时写入的对话较多时会出现 database is locked，活跃连接数 × 会话数不宜超过 50 左右。用法：
+    python scripts/loadtest_chat_ws.py --idle 2000 --active 20 --sessions 2 --turns 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_DIR = tempfile.mkdtemp(prefix="kidvibe-ws-")
+os.environ.setdefault("SECRET_KEY", "loadtest")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/loadtest.db"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["CHAT_SUMMARY_ENABLED"] = "false"
+
+import httpx
+import uvicorn
+import websockets
+
+from app.main import app
+from app.database import SessionLocal, init_db
+from app.models.user import User
+from app.models.project import Project
+from app.models.chat import ChatSession
+from app.api.deps import create_access_token
+from app.core.ai.base import BaseAIClient
+from app.core.ai.factory import AIClientFactory
+
+
+class StreamingMockClient(BaseAIClient):
+    """按固定间隔逐段产出回复的模拟客户端"""
+    
+    def __init__(self, tokens: int, interval: float):
+        self.tokens = tokens
+        self.interval = interval
+        self.model_name = "mock"
+    
+    async def generate_code(self, prompt, context):
+        return "print('hello')"
+    
+    async def analyze_requirements(self, description):
+        return {"tech_stack": {}, "features": [], "complexity": "简单"}
+    
+    async def plan_files(self, description, analysis):
+        return {"files": []}
+    
+    async def edit_code(self, code, instruction, file_path, related_code=None):
+        return {"edits": []}
+    
+    async def suggest_improvements(self, code, feedback):
+        return []
+    
+    async def chat(self, message, history):
+        return "".join([chunk async for chunk in self.stream_chat(message, history)])
+    
+    async def stream_chat(self, message, history):
+        for i in range(self.tokens):
+            await asyncio.sleep(self.interval)
+            yield f"片段{i} "
+
+
+def rss_mib() -> float:
+    """当前进程的常驻内存（Linux），其他平台返回峰值"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(users: int, sessions: int) -> list:
+    """创建用户、项目与会话，返回 [(令牌, [会话 id])]"""
+    await init_db()
+    result = []
+    async with SessionLocal() as db:
+        for i in range(users):
+            user = User(email=f"kid{i}@kidvibe.com", username=f"kid{i}", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            project = Project(name=f"p{i}", initial_prompt="小游戏", owner_id=user.id)
+            db.add(project)
+            await db.flush()
+            chat_sessions = [ChatSession(project_id=project.id, user_id=user.id, title=f"s{j}") for j in range(sessions)]
+            db.add_all(chat_sessions)
+            await db.flush()
+            result.append((create_access_token({"sub": user.email}), [s.id for s in chat_sessions]))
+        await db.commit()
+    return result
+
+
+async def connect(url: str, token: str):
+    socket = await websockets.connect(url, max_queue=None, ping_interval=None)
+    await socket.send(json.dumps({"type": "auth", "token": token}))
+    ready = json.loads(await socket.recv())
+    assert ready["type"] == "ready", ready
+    return socket
+
+
+async def ws_conversations(url: str, token: str, session_ids: list, turns: int, stats: dict) -> None:
+    """一个连接上多个会话同时对话，每个会话依次进行 turns 轮"""
+    socket = await connect(url, token)
+    waiters = {}
+    
+    async def reader():
+        async for raw in socket:
+            frame = json.loads(raw)
+            stats["frames"] += 1
+            waiter = waiters.get(frame.get("request_id"))
+            if waiter is not None:
+                waiter.put_nowait(frame)
+    
+    async def conversation(session_id: int):
+        for turn in range(turns):
+            request_id = f"{session_id}-{turn}"
+            waiters[request_id] = queue = asyncio.Queue()
+            start = time.perf_counter()
+            await socket.send(json.dumps({
+                "type": "chat", "request_id": request_id, "session_id": session_id, "message": f"第 {turn} 个问题"
+            }))
+            first = None
+            while True:
+                frame = await queue.get()
+                if frame["type"] == "token" and first is None:
+                    first = time.perf_counter() - start
+                if frame["type"] in ("done", "error"):
+                    break
+            del waiters[request_id]
+            if frame["type"] != "done":
+                stats["errors"].append(frame.get("detail"))
+                continue
+            stats["ttft"].append(first)
+            stats["turn"].append(time.perf_counter() - start)
+    
+    reading = asyncio.create_task(reader())
+    await asyncio.gather(*(conversation(session_id) for session_id in session_ids))
+    reading.cancel()
+    await socket.close()
+
+
+async def http_conversations(base_url: str, token: str, session_ids: list, turns: int, stats: dict) -> None:
+    """同样的对话通过 /chat/chat/stream 发送，每轮一次请求"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        async def conversation(session_id: int):
+            for turn in range(turns):
+                start = time.perf_counter()
+                first = None
+                async with client.stream(
+                    "POST",
+                    "/api/v1/chat/chat/stream",
+                    headers={"Authorization": f"Bearer {token}"},
+                    json={"session_id": session_id, "message": f"第 {turn} 个问题"},
+                ) as response:
+                    failed = response.status_code != 200
+                    async for line in response.aiter_lines():
+                        if line == "event: token" and first is None:
+                            first = time.perf_counter() - start
+                        failed = failed or line == "event: error"
+                if failed:
+                    stats["errors"].append(response.status_code)
+                    continue
+                stats["ttft"].append(first)
+                stats["turn"].append(time.perf_counter() - start)
+        
+        await asyncio.gather(*(conversation(session_id) for session_id in session_ids))
+
+
+def summarize(name: str, stats: dict, elapsed: float) -> None:
+    ttft = sorted(stats["ttft"])
+    turn = sorted(stats["turn"])
+    if not turn:
+        print(f"{name:<6} 全部 {len(stats['errors'])} 轮失败：{stats['errors'][:3]}")
+        return
+    print(
+        f"{name:<6} {len(turn)} 轮  {len(turn) / elapsed:7.1f} 轮/s  "
+        f"首个 token p50 {statistics.median(ttft) * 1000:6.1f} ms  p99 {ttft[int(len(ttft) * 0.99) - 1] * 1000:6.1f} ms  "
+        f"每轮 p50 {statistics.median(turn) * 1000:6.1f} ms  失败 {len(stats['errors'])} 轮"
+    )
+
+
+async def main(args):
+    # 每个连接在客户端与服务端各占一个文件描述符
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    
+    AIClientFactory.get_default_client = classmethod(
+        lambda cls, mock=StreamingMockClient(args.tokens, args.token_interval): mock
+    )
+    accounts = await seed(args.active + 1, args.sessions)
+    
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning", lifespan="on"))
+    server.install_signal_handlers = lambda: None
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    url = f"ws://127.0.0.1:{args.port}/api/v1/chat/ws"
+    base_url = f"http://127.0.0.1:{args.port}"
+    
+    idle_token = accounts[-1][0]
+    before = rss_mib()
+    start = time.perf_counter()
+    idle = []
+    for offset in range(0, args.idle, 200):
+        idle += await asyncio.gather(*(connect(url, idle_token) for _ in range(min(200, args.idle - offset))))
+    elapsed = time.perf_counter() - start
+    print(
+        f"空闲连接 {len(idle)} 个：建立并认证 {elapsed:.2f}s（{elapsed / max(len(idle), 1) * 1000:.2f} ms/个），"
+        f"内存 +{rss_mib() - before:.1f} MiB（含客户端）"
+    )
+    
+    stats = {"ttft": [], "turn": [], "errors": [], "frames": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        ws_conversations(url, token, sessions, args.turns, stats) for token, sessions in accounts[:args.active]
+    ))
+    summarize("ws", stats, time.perf_counter() - start)
+    print(f"       收到 {stats['frames']} 帧（每轮 {args.tokens} 个 token，积压时合并）")
+    
+    stats = {"ttft": [], "turn": [], "errors": []}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        http_conversations(base_url, token, sessions, args.turns, stats) for token, sessions in accounts[:args.active]
+    ))
+    summarize("http", stats, time.perf_counter() - start)
+    
+    # 空闲连接仍然可用
+    alive = 0
+    for socket in idle:
+        await socket.send(json.dumps({"type": "ping"}))
+    for socket in idle:
+        while True:
+            frame = json.loads(await asyncio.wait_for(socket.recv(), 10))
+            if frame["type"] == "pong":
+                alive += 1
+                break
+    print(f"空闲连接可用：{alive}/{len(idle)}")
+    
+    await asyncio.gather(*(socket.close() for socket in idle))
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="聊天 WebSocket 负载测试")
+    parser.add_argument("--idle", type=int, default=2000, help="空闲连接数")
+    parser.add_argument("--active", type=int, default=20, help="活跃连接数（每个连接一个用户）")
+    parser.add_argument("--sessions", type=int, default=2, help="每个活跃连接同时进行的会话数")
+    parser.add_argument("--turns", type=int, default=5, help="每个会话的对话轮数")
+    parser.add_argument("--tokens", type=int, default=20, help="每轮回复的 token 数")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="模拟客户端产出 token 的间隔（秒）")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+数据库慢查询对接口延迟影响的负载测试
+
+在进程内启动应用（临时 SQLite 数据库），持续请求 /health 与 /api/v1/projects/，
+同时在后台运行慢查询，对比三种情况下的 p50/p99 延迟：
+- none：无慢查询
+- async：慢查询通过异步引擎执行（当前实现）
+- blocking：慢查询以同步方式直接在事件循环中执行（旧实现的行为）
+
+用法：
+    python scripts/loadtest_db.py --duration 5 --slow-workers 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_DIR = tempfile.mkdtemp(prefix="kidvibe-loadtest-")
+os.environ.setdefault("SECRET_KEY", "loadtest")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/loadtest.db"
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from app.main import app
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.models.project import Project
+from app.api.deps import create_access_token
+
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) "
+    "SELECT count(*) FROM c"
+)
+
+
+async def seed() -> str:
+    await init_db()
+    async with SessionLocal() as db:
+        user = User(email="loadtest@kidvibe.com", username="loadtest", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        for i in range(50):
+            db.add(Project(name=f"项目 {i}", initial_prompt="做一个小游戏", owner_id=user.id))
+        await db.commit()
+    return create_access_token({"sub": "loadtest@kidvibe.com"})
+
+
+async def slow_async(stop: asyncio.Event, rows: int):
+    while not stop.is_set():
+        async with SessionLocal() as db:
+            await db.execute(SLOW_QUERY, {"n": rows})
+
+
+async def slow_blocking(stop: asyncio.Event, rows: int):
+    sync_engine = create_engine(os.environ["DATABASE_URL"])
+    while not stop.is_set():
+        with sync_engine.connect() as conn:
+            conn.execute(SLOW_QUERY, {"n": rows})
+        await asyncio.sleep(0)
+    sync_engine.dispose()
+
+
+async def probe(client: httpx.AsyncClient, url: str, headers: dict, stop: asyncio.Event, samples: list, interval: float):
+    """按固定间隔发送请求，延迟从计划发送时刻算起（事件循环被阻塞的时间也计入）"""
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - scheduled) * 1000)
+        scheduled = max(scheduled + interval, time.perf_counter() - interval)
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+
+
+def percentile(samples: list, q: float) -> float:
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100)[int(q) - 1]
+
+
+async def run_mode(mode: str, client: httpx.AsyncClient, headers: dict, args) -> None:
+    stop = asyncio.Event()
+    results = {"/health": [], "/api/v1/projects/": []}
+    
+    tasks = [
+        asyncio.create_task(probe(client, url, headers, stop, samples, args.interval))
+        for url, samples in results.items()
+        for _ in range(args.probes)
+    ]
+    if mode == "async":
+        tasks += [asyncio.create_task(slow_async(stop, args.rows)) for _ in range(args.slow_workers)]
+    elif mode == "blocking":
+        tasks += [asyncio.create_task(slow_blocking(stop, args.rows)) for _ in range(args.slow_workers)]
+    
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    
+    for url, samples in results.items():
+        print(
+            f"{mode:<9} {url:<20} 请求 {len(samples):5d}  "
+            f"p50 {percentile(samples, 50):8.2f}ms  p99 {percentile(samples, 99):8.2f}ms"
+        )
+
+
+async def main(args):
+    token = await seed()
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(app=app, base_url="http://localhost") as client:
+        for mode in ("none", "async", "blocking"):
+            await run_mode(mode, client, headers, args)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="数据库慢查询负载测试")
+    parser.add_argument("--duration", type=float, default=5.0, help="每种模式持续时间（秒）")
+    parser.add_argument("--probes", type=int, default=2, help="每个接口的并发探测数")
+    parser.add_argument("--interval", type=float, default=0.02, help="探测请求间隔（秒）")
+    parser.add_argument("--slow-workers", type=int, default=2, help="并发慢查询数")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="慢查询递归行数")
+    asyncio.run(main(parser.parse_args()))
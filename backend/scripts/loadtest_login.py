@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+并发登录对事件循环影响的负载测试
+
+在进程内启动应用（临时 SQLite 数据库），同时发起大量登录请求，并按固定间隔探测 /health，
+对比两种情况下 /health 的延迟：
+- inline：在事件循环中直接计算 bcrypt（旧实现的行为）
+- pool：在有界线程池中计算（当前实现）
+
+用法：
+    python scripts/loadtest_login.py --logins 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_DIR = tempfile.mkdtemp(prefix="kidvibe-loadtest-")
+os.environ.setdefault("SECRET_KEY", "loadtest")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/loadtest.db"
+
+import httpx
+
+from app.main import app
+from app.database import SessionLocal, engine, init_db
+from app.models.user import User
+from app.core.passwords import password_hasher, pwd_context
+
+PASSWORD = "kidvibe123"
+
+
+async def seed(users: int) -> None:
+    await init_db()
+    hashed_password = pwd_context.hash(PASSWORD)
+    async with SessionLocal() as db:
+        for i in range(users):
+            db.add(User(email=f"kid{i}@kidvibe.com", username=f"kid{i}", hashed_password=hashed_password))
+        await db.commit()
+
+
+async def login(client: httpx.AsyncClient, i: int, users: int, statuses: list) -> None:
+    response = await client.post(
+        "/api/v1/auth/login",
+        json={"email": f"kid{i % users}@kidvibe.com", "password": PASSWORD}
+    )
+    statuses.append(response.status_code)
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, samples: list, interval: float):
+    """按固定间隔请求 /health，延迟从计划发送时刻算起（事件循环被阻塞的时间也计入）"""
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        response = await client.get("/health")
+        response.raise_for_status()
+        samples.append((time.perf_counter() - scheduled) * 1000)
+        scheduled = max(scheduled + interval, time.perf_counter() - interval)
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+
+
+async def run_mode(mode: str, client: httpx.AsyncClient, args) -> None:
+    if mode == "inline":
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        password_hasher._run = run_inline
+    else:
+        password_hasher.__dict__.pop("_run", None)
+    
+    stop = asyncio.Event()
+    samples, statuses = [], []
+    probe_task = asyncio.create_task(probe(client, stop, samples, args.interval))
+    await asyncio.sleep(args.interval * 5)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(login(client, i, args.users, statuses) for i in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    
+    print(
+        f"{mode:<7} 登录 {len(statuses)} 次（成功 {statuses.count(200)}，拒绝 {statuses.count(503)}）"
+        f"耗时 {elapsed:6.2f}s  /health p50 {statistics.median(samples):8.2f}ms  "
+        f"max {max(samples):8.2f}ms"
+    )
+    print(f"        线程池：{password_hasher.snapshot()}")
+
+
+async def main(args):
+    await seed(args.users)
+    async with httpx.AsyncClient(app=app, base_url="http://localhost", timeout=None) as client:
+        for mode in ("inline", "pool"):
+            await run_mode(mode, client, args)
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发登录负载测试")
+    parser.add_argument("--logins", type=int, default=100, help="并发登录请求数")
+    parser.add_argument("--users", type=int, default=30, help="参与登录的用户数")
+    parser.add_argument("--interval", type=float, default=0.02, help="/health 探测间隔（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+清理对象存储中不再被引用的对象
+
+项目或文件删除后，其内容与版本对象仍留在 UPLOAD_DIR/objects 下（对象按内容共享，删除时无法确定
+是否仍被引用）；文件内容变化后，旧内容的完整对象除非是某个完整版本，也不再需要（历史版本由完整版本
+与差量还原，版本记录的 content_hash 只用于校验）。本脚本收集文件当前内容与版本记录 blob_hash 引用的
+哈希，删除其余对象；最近一小时内写入的对象可能属于尚未提交的事务，会被跳过。
+"""
+
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+from app.database import SessionLocal, engine
+from app.models.project import ProjectFile, ProjectFileVersion
+from app.core.storage.blobs import blob_store
+
+
+async def main():
+    async with SessionLocal() as db:
+        referenced = set((await db.scalars(
+            select(ProjectFile.content_hash).where(ProjectFile.content_hash.is_not(None))
+        )).all())
+        referenced.update((await db.scalars(select(ProjectFileVersion.blob_hash))).all())
+    await engine.dispose()
+    
+    removed = await blob_store.prune(referenced)
+    print(f"引用的对象 {len(referenced)} 个，已删除未引用的对象 {removed} 个")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
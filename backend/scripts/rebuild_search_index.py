@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+重建项目文件全文索引
+
+索引在文件写入时增量更新，只有启用搜索之前已存在的文件、修改了 SEARCH_INDEX_MAX_FILE_SIZE、
+索引表结构变化（启动时会提示）或索引损坏时才需要重建。可以用 --project 只重建一个项目。
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text
+from app.database import SessionLocal, engine, init_db
+from app.models.project import ProjectFile
+from app.core.storage.files import read_file_content
+from app.core.storage.search import SEARCH_AVAILABLE, index_files, index_row, remove_project
+
+BATCH_SIZE = 500
+
+
+async def main(project_id=None):
+    if not SEARCH_AVAILABLE:
+        print("搜索不可用：需要 SQLite 3.34+（FTS5 trigram 分词）且 SEARCH_ENABLED=true")
+        return
+    await init_db()
+    
+    indexed = 0
+    async with SessionLocal() as db:
+        if project_id is None:
+            await db.execute(text("DELETE FROM project_file_search"))
+        else:
+            await remove_project(db, project_id)
+        
+        query = select(ProjectFile).where(ProjectFile.content_hash.is_not(None)).order_by(ProjectFile.id)
+        if project_id is not None:
+            query = query.where(ProjectFile.project_id == project_id)
+        files = (await db.scalars(query)).all()
+        for start in range(0, len(files), BATCH_SIZE):
+            batch = files[start:start + BATCH_SIZE]
+            contents = await asyncio.gather(*(read_file_content(f) for f in batch))
+            await index_files(db, [
+                index_row(f.id, f.project_id, f.file_path, content) for f, content in zip(batch, contents)
+            ])
+            indexed += len(batch)
+        # 合并索引段，减小索引体积并加快查询
+        await db.execute(text("INSERT INTO project_file_search (project_file_search) VALUES ('optimize')"))
+        await db.commit()
+    await engine.dispose()
+    
+    print(f"已索引 {indexed} 个文件")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重建项目文件全文索引")
+    parser.add_argument("--project", type=int, help="只重建指定项目")
+    args = parser.parse_args()
+    asyncio.run(main(args.project))
@@ -0,0 +1,63 @@
+"""测试公共夹具
+
+应用配置在导入时读取环境变量，需在导入 app 之前指向临时数据库与上传目录，并关闭依赖外部服务的功能。
+"""
+import os
+import tempfile
+import uuid
+
+_TMP_DIR = tempfile.mkdtemp(prefix="kidvibe-test-")
+os.environ.update(
+    SECRET_KEY="test-secret",
+    DATABASE_URL=f"sqlite:///{_TMP_DIR}/test.db",
+    UPLOAD_DIR=f"{_TMP_DIR}/uploads",
+    AI_CACHE_REDIS_ENABLED="false",
+    METRICS_ENABLED="false",
+)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.api.deps import create_access_token  # noqa: E402
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+@pytest.fixture
+async def db():
+    """已建表的数据库会话"""
+    await init_db()
+    async with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def user(db):
+    """新建的测试用户"""
+    name = uuid.uuid4().hex[:12]
+    user = User(email=f"{name}@example.com", username=name, hashed_password="x")
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+@pytest.fixture
+async def client(user):
+    """以测试用户身份调用接口的客户端"""
+    token = create_access_token({"sub": user.email})
+    async with httpx.AsyncClient(
+        app=app,
+        base_url="http://localhost",
+        headers={"Authorization": f"Bearer {token}"},
+    ) as client:
+        yield client
+
+
+@pytest.fixture
+async def project(client):
+    """测试用户的项目"""
+    response = await client.post("/api/v1/projects/", json={"name": "test", "initial_prompt": "snake game"})
+    assert response.status_code == 200
+    return response.json()
@@ -0,0 +1,201 @@
+"""AI 响应缓存：内存与 Redis 两级缓存、Redis 故障回退与绕过缓存"""
+import json
+import time
+
+import pytest
+
+from app.core.ai.base import AIErrorMessage
+from app.core.ai.cache import AI_CACHE_BYPASS_HEADER, CachedAIClient, ResponseCache, set_cache_bypass
+from app.core.ai.factory import AIClientFactory
+
+TTLS = {"generate_code": 60, "analyze_requirements": 60, "chat": 0}
+
+
+class FakeRedis:
+    """实现缓存用到的 get/set 的异步 Redis；failing 为 True 时每次调用都抛出连接错误"""
+    
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.calls = 0
+        self.failing = False
+    
+    def _check(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("redis unavailable")
+    
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+    
+    async def set(self, key, value, ex=None):
+        self._check()
+        self.data[key] = value
+        self.expiry[key] = ex
+    
+    async def close(self):
+        pass
+
+
+class Upstream:
+    """记录调用次数的上游"""
+    
+    def __init__(self, value="code"):
+        self.value = value
+        self.calls = 0
+    
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(redis):
+    return ResponseCache(redis=redis, ttls=TTLS, similarity_threshold=0.0)
+
+
+async def test_memory_hit_skips_upstream(cache):
+    upstream = Upstream()
+    
+    assert await cache.get_or_call("generate_code", "m", "prompt", {"a": 1}, upstream) == "code"
+    assert await cache.get_or_call("generate_code", "m", "prompt", {"a": 1}, upstream) == "code"
+    
+    assert upstream.calls == 1
+    stats = cache.stats["generate_code"]
+    assert (stats.misses, stats.memory_hits, stats.redis_hits) == (1, 1, 0)
+
+
+async def test_key_covers_model_context_and_case(cache):
+    upstream = Upstream()
+    
+    await cache.get_or_call("generate_code", "m", "prompt", {"a": 1}, upstream)
+    # 空白差异视为同一提示
+    await cache.get_or_call("generate_code", "m", "  prompt\n", {"a": 1}, upstream)
+    assert upstream.calls == 1
+    
+    await cache.get_or_call("generate_code", "other", "prompt", {"a": 1}, upstream)
+    await cache.get_or_call("generate_code", "m", "prompt", {"a": 2}, upstream)
+    await cache.get_or_call("generate_code", "m", "Prompt", {"a": 1}, upstream)
+    assert upstream.calls == 4
+
+
+async def test_redis_hit_fills_memory(cache, redis):
+    upstream = Upstream()
+    await cache.get_or_call("generate_code", "m", "prompt", None, upstream)
+    assert len(redis.data) == 1
+    assert list(redis.expiry.values()) == [60]
+    assert json.loads(next(iter(redis.data.values()))) == {"value": "code"}
+    
+    # 另一个进程：内存为空，从 Redis 取得并写入内存
+    other = ResponseCache(redis=redis, ttls=TTLS, similarity_threshold=0.0)
+    assert await other.get_or_call("generate_code", "m", "prompt", None, upstream) == "code"
+    assert await other.get_or_call("generate_code", "m", "prompt", None, upstream) == "code"
+    
+    assert upstream.calls == 1
+    stats = other.stats["generate_code"]
+    assert (stats.misses, stats.redis_hits, stats.memory_hits) == (0, 1, 1)
+
+
+async def test_redis_failure_falls_back_and_backs_off(cache, redis):
+    upstream = Upstream()
+    redis.failing = True
+    
+    assert await cache.get_or_call("generate_code", "m", "one", None, upstream) == "code"
+    assert redis.calls == 1
+    assert cache._redis_retry_at > time.monotonic()
+    
+    # 暂停期间不再访问 Redis，仍使用内存缓存
+    assert await cache.get_or_call("generate_code", "m", "two", None, upstream) == "code"
+    assert await cache.get_or_call("generate_code", "m", "one", None, upstream) == "code"
+    assert redis.calls == 1
+    assert upstream.calls == 2
+    assert cache.stats["generate_code"].memory_hits == 1
+    
+    # 暂停结束后恢复使用 Redis
+    redis.failing = False
+    cache._redis_retry_at = 0.0
+    await cache.get_or_call("generate_code", "m", "three", None, upstream)
+    assert redis.calls == 3
+    assert len(redis.data) == 1
+
+
+async def test_without_redis_uses_memory_only():
+    cache = ResponseCache(redis=None, ttls=TTLS, similarity_threshold=0.0)
+    upstream = Upstream()
+    
+    await cache.get_or_call("generate_code", "m", "prompt", None, upstream)
+    await cache.get_or_call("generate_code", "m", "prompt", None, upstream)
+    
+    assert upstream.calls == 1
+
+
+async def test_bypass_calls_upstream_and_does_not_store(cache, redis):
+    upstream = Upstream()
+    set_cache_bypass(True)
+    try:
+        await cache.get_or_call("generate_code", "m", "prompt", None, upstream)
+        await cache.get_or_call("generate_code", "m", "prompt", None, upstream)
+    finally:
+        set_cache_bypass(False)
+    
+    assert upstream.calls == 2
+    assert cache.stats["generate_code"].bypassed == 2
+    assert len(cache.memory) == 0
+    assert redis.data == {}
+
+
+async def test_zero_ttl_and_error_results_are_not_cached(cache):
+    upstream = Upstream()
+    await cache.get_or_call("chat", "m", "hi", None, upstream)
+    await cache.get_or_call("chat", "m", "hi", None, upstream)
+    assert upstream.calls == 2
+    
+    failing = Upstream(AIErrorMessage("失败"))
+    for _ in range(2):
+        await cache.get_or_call("generate_code", "m", "p", None, failing, lambda value: not isinstance(value, AIErrorMessage))
+    assert failing.calls == 2
+
+
+async def test_similar_prompt_hits_when_enabled(redis):
+    cache = ResponseCache(redis=redis, ttls=TTLS, similarity_threshold=0.9)
+    upstream = Upstream()
+    
+    await cache.get_or_call("generate_code", "m", "write a snake game in python with pygame", None, upstream)
+    await cache.get_or_call("generate_code", "m", "write a snake game in python with pygame!", None, upstream)
+    
+    assert upstream.calls == 1
+    assert cache.stats["generate_code"].similar_hits == 1
+
+
+class CountingClient:
+    """只实现 analyze_requirements 的上游客户端"""
+    model_name = "counting"
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def analyze_requirements(self, description):
+        self.calls += 1
+        return {"features": [description]}
+
+
+@pytest.mark.parametrize("headers", [{AI_CACHE_BYPASS_HEADER: "1"}, {"Cache-Control": "no-cache"}])
+async def test_bypass_header_skips_cache(client, monkeypatch, headers):
+    upstream = CountingClient()
+    cached = CachedAIClient(upstream, ResponseCache(redis=None, ttls=TTLS, similarity_threshold=0.0))
+    monkeypatch.setattr(AIClientFactory, "get_default_client", classmethod(lambda cls: cached))
+    
+    for _ in range(2):
+        response = await client.post("/api/v1/projects/analyze", json={"description": "game"})
+        assert response.status_code == 200
+    assert upstream.calls == 1
+    
+    response = await client.post("/api/v1/projects/analyze", json={"description": "game"}, headers=headers)
+    assert response.json() == {"features": ["game"]}
+    assert upstream.calls == 2
@@ -0,0 +1,86 @@
+"""聊天消息的游标分页"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.chat import ChatMessage
+
+
+@pytest.fixture
+async def chat_session(client, project):
+    response = await client.post("/api/v1/chat/sessions", json={"project_id": project["id"], "title": "t"})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def add_messages(db, session_id: int, created_at: list) -> list:
+    messages = [
+        ChatMessage(session_id=session_id, role="user", content=f"m{i}", created_at=time)
+        for i, time in enumerate(created_at)
+    ]
+    db.add_all(messages)
+    await db.commit()
+    return [message.id for message in messages]
+
+
+async def read_all(client, session_id: int, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get(f"/api/v1/chat/sessions/{session_id}/messages", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([message["id"] for message in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_pages_cover_every_message_once_in_order(client, db, chat_session):
+    base = datetime(2024, 1, 1)
+    # 同一时间的消息按 id 排序，不会在两页之间重复或遗漏
+    ids = await add_messages(db, chat_session["id"], [base, base, base, base + timedelta(seconds=1), base])
+    expected = sorted(ids, key=lambda i: (base + timedelta(seconds=1) if i == ids[3] else base, i))
+    
+    pages = await read_all(client, chat_session["id"], limit=2)
+    
+    assert pages == [expected[0:2], expected[2:4], expected[4:]]
+
+
+async def test_exact_multiple_of_limit_has_no_empty_page(client, db, chat_session):
+    base = datetime(2024, 1, 1)
+    ids = await add_messages(db, chat_session["id"], [base + timedelta(seconds=i) for i in range(4)])
+    
+    assert await read_all(client, chat_session["id"], limit=2) == [ids[:2], ids[2:]]
+
+
+async def test_cursor_is_stable_when_messages_are_appended(client, db, chat_session):
+    base = datetime(2024, 1, 1)
+    ids = await add_messages(db, chat_session["id"], [base + timedelta(seconds=i) for i in range(3)])
+    url = f"/api/v1/chat/sessions/{chat_session['id']}/messages"
+    
+    first = (await client.get(url, params={"limit": 2})).json()
+    new_ids = await add_messages(db, chat_session["id"], [base + timedelta(seconds=10)])
+    second = (await client.get(url, params={"limit": 2, "cursor": first["next_cursor"]})).json()
+    
+    assert [message["id"] for message in first["items"]] == ids[:2]
+    assert [message["id"] for message in second["items"]] == [ids[2]] + new_ids
+    assert second["next_cursor"] is None
+
+
+async def test_invalid_cursor_is_rejected(client, chat_session):
+    url = f"/api/v1/chat/sessions/{chat_session['id']}/messages"
+    
+    response = await client.get(url, params={"cursor": "not-a-cursor"})
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+async def test_limit_is_bounded(client, chat_session):
+    url = f"/api/v1/chat/sessions/{chat_session['id']}/messages"
+    
+    assert (await client.get(url, params={"limit": 0})).status_code == 422
+    assert (await client.get(url, params={"limit": 201})).status_code == 422
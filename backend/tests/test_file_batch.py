@@ -0,0 +1,107 @@
+"""批量文件操作：按路径创建、更新、删除"""
+import pytest
+
+from app.core.storage.search import SEARCH_AVAILABLE
+
+
+async def batch(client, project, *operations):
+    return await client.post(f"/api/v1/projects/{project['id']}/files/batch", json={"operations": list(operations)})
+
+
+def op(action, file_path, content=None, **fields):
+    return {"action": action, "file_path": file_path, "content": content, **fields}
+
+
+def outcome(results):
+    return [(result["file_path"], result["action"], result["status"], result["version"]) for result in results]
+
+
+async def content_of(client, project, file_id):
+    return (await client.get(f"/api/v1/projects/{project['id']}/files/{file_id}")).json()["content"]
+
+
+async def test_upsert_creates_then_updates(client, project):
+    response = await batch(
+        client, project,
+        op("create", "src/a.py", "a = 1\n", language="python"),
+        op("upsert", "src/b.py", "b = 1\n"),
+    )
+    assert response.status_code == 200
+    created = response.json()
+    assert outcome(created) == [("src/a.py", "create", "created", 1), ("src/b.py", "upsert", "created", 1)]
+    
+    response = await batch(
+        client, project,
+        op("upsert", "src/a.py", "a = 1\n"),
+        op("upsert", "src/b.py", "b = 2\n"),
+        op("upsert", "src/c.py", "c = 1\n"),
+    )
+    results = response.json()
+    assert outcome(results) == [
+        ("src/a.py", "upsert", "unchanged", 1),
+        ("src/b.py", "upsert", "updated", 2),
+        ("src/c.py", "upsert", "created", 1),
+    ]
+    # 更新保留原来的文件 id
+    assert results[1]["file_id"] == created[1]["file_id"]
+    assert await content_of(client, project, created[1]["file_id"]) == "b = 2\n"
+    
+    versions_url = f"/api/v1/projects/{project['id']}/files/{created[1]['file_id']}/versions"
+    assert [version["version"] for version in (await client.get(versions_url)).json()] == [2, 1]
+    assert (await client.get(f"{versions_url}/1")).json()["content"] == "b = 1\n"
+
+
+async def test_create_update_and_delete_report_conflicts(client, project):
+    await batch(
+        client, project,
+        op("create", "keep.py", "x\n"),
+        op("create", "gone.py", "y\n"),
+        op("create", "meta.py", "z\n", language="python"),
+    )
+    
+    response = await batch(
+        client, project,
+        op("create", "keep.py", "other\n"),
+        op("update", "missing.py", "z\n"),
+        op("delete", "missing2.py"),
+        op("delete", "gone.py"),
+        op("update", "meta.py", language="text"),
+    )
+    
+    assert outcome(response.json()) == [
+        ("keep.py", "create", "exists", 1),
+        ("missing.py", "update", "not_found", None),
+        ("missing2.py", "delete", "not_found", None),
+        ("gone.py", "delete", "deleted", None),
+        # 只修改语言：不产生新版本
+        ("meta.py", "update", "updated", 1),
+    ]
+    files = (await client.get(f"/api/v1/projects/{project['id']}/files")).json()
+    assert sorted((file["file_path"], file["language"]) for file in files) == [("keep.py", None), ("meta.py", "text")]
+
+
+async def test_duplicate_paths_are_rejected_without_writing(client, project):
+    response = await batch(client, project, op("create", "a.py", "1\n"), op("upsert", "a.py", "2\n"))
+    
+    assert response.status_code == 422
+    assert (await client.get(f"/api/v1/projects/{project['id']}/files")).json() == []
+
+
+async def test_unknown_project_is_not_found(client):
+    response = await batch(client, {"id": 999999}, op("create", "a.py", "1\n"))
+    
+    assert response.status_code == 404
+
+
+@pytest.mark.skipif(not SEARCH_AVAILABLE, reason="SQLite FTS5 trigram tokenizer not available")
+async def test_batch_keeps_search_index_in_sync(client, project):
+    await batch(client, project, op("create", "a.py", "alpha_marker\n"), op("create", "b.py", "beta_marker\n"))
+    await batch(client, project, op("upsert", "a.py", "gamma_marker\n"), op("delete", "b.py"))
+    
+    async def search(term):
+        response = await client.get(f"/api/v1/projects/{project['id']}/search", params={"q": term})
+        return [hit["file_path"] for hit in response.json()]
+    
+    assert await search("gamma_marker") == ["a.py"]
+    assert await search("alpha_marker") == []
+    assert await search("beta_marker") == []
@@ -0,0 +1,106 @@
+"""后台任务队列：eager 后端的重试与退避"""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.core.ai.factory import AIClientFactory
+from app.core.jobs.handlers import JOB_HANDLERS
+from app.core.jobs.queue import JobQueue, retry_delay
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """不依赖 AI 服务提供方、退避极短的 eager 队列"""
+    monkeypatch.setattr(AIClientFactory, "get_default_provider", classmethod(lambda cls: "fake"))
+    monkeypatch.setattr(AIClientFactory, "get_client", classmethod(lambda cls, provider="gemini": object()))
+    monkeypatch.setattr(settings, "job_max_retries", 2)
+    monkeypatch.setattr(settings, "job_retry_backoff", 0.01)
+    monkeypatch.setattr(settings, "job_retry_backoff_max", 0.02)
+    return JobQueue(backend="eager")
+
+
+def flaky_handler(failures: int):
+    """前 failures 次调用失败的处理函数，calls 记录调用次数"""
+    async def handler(client, payload):
+        handler.calls += 1
+        if handler.calls <= failures:
+            raise RuntimeError(f"failure {handler.calls}")
+        return {"echo": payload["value"]}
+    handler.calls = 0
+    return handler
+
+
+def record_delays(queue: JobQueue, monkeypatch) -> list:
+    """记录每次执行返回的重试等待时间"""
+    delays = []
+    run_attempt = queue.run_attempt
+    
+    async def recording(job_id):
+        delay = await run_attempt(job_id)
+        delays.append(delay)
+        return delay
+    
+    monkeypatch.setattr(queue, "run_attempt", recording)
+    return delays
+
+
+def test_retry_delay_doubles_up_to_max(monkeypatch):
+    monkeypatch.setattr(settings, "job_retry_backoff", 2.0)
+    monkeypatch.setattr(settings, "job_retry_backoff_max", 10.0)
+    assert [retry_delay(n) for n in range(1, 6)] == [2.0, 4.0, 8.0, 10.0, 10.0]
+
+
+async def test_eager_job_retries_until_success(db, user, queue, monkeypatch):
+    handler = flaky_handler(failures=2)
+    monkeypatch.setitem(JOB_HANDLERS, "flaky", handler)
+    delays = record_delays(queue, monkeypatch)
+    
+    job = await queue.submit(db, user.id, "flaky", {"value": 1})
+    
+    assert job.status == "succeeded"
+    assert job.attempts == 3
+    assert job.result == {"echo": 1}
+    assert job.error is None
+    assert job.finished_at is not None
+    assert handler.calls == 3
+    assert delays == [0.01, 0.02, None]
+
+
+async def test_eager_job_fails_after_max_attempts(db, user, queue, monkeypatch):
+    handler = flaky_handler(failures=10)
+    monkeypatch.setitem(JOB_HANDLERS, "flaky", handler)
+    delays = record_delays(queue, monkeypatch)
+    
+    job = await queue.submit(db, user.id, "flaky", {"value": 1})
+    
+    assert job.status == "failed"
+    assert job.attempts == job.max_attempts == 3
+    assert job.error == "failure 3"
+    assert job.result is None
+    assert handler.calls == 3
+    # 最后一次失败不再等待
+    assert delays == [0.01, 0.02, None]
+
+
+async def test_eager_job_attempt_exceeding_lease_times_out(db, user, queue, monkeypatch):
+    async def slow(client, payload):
+        await asyncio.sleep(1)
+    
+    monkeypatch.setitem(JOB_HANDLERS, "slow", slow)
+    monkeypatch.setattr(settings, "job_max_retries", 0)
+    monkeypatch.setattr(settings, "job_lease_timeout", 0.05)
+    
+    job = await queue.submit(db, user.id, "slow", {})
+    
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert job.error == "TimeoutError"
+
+
+async def test_eager_job_with_unknown_kind_fails_without_retry(db, user, queue):
+    job = await queue.submit(db, user.id, "no_such_kind", {})
+    
+    assert job.status == "failed"
+    assert job.attempts == 1
+    assert "no_such_kind" in job.error
@@ -0,0 +1,128 @@
+"""按片段修改文件：片段的应用顺序与统一差异格式的转换"""
+import difflib
+
+import pytest
+
+from app.core.storage.patch import DiffFormatError, EditHunk, PatchError, apply_hunks, parse_unified_diff
+
+
+def unified_diff(old: str, new: str) -> str:
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), "a/file.py", "b/file.py"
+    ))
+
+
+def numbered(count: int) -> str:
+    return "".join(f"line {i}\n" for i in range(1, count + 1))
+
+
+def test_hunks_apply_in_order_against_updated_content():
+    content = "a = 1\nb = 2\n"
+    hunks = [EditHunk("a = 1\n", "a = 10\n"), EditHunk("a = 10\nb = 2\n", "a = 10\nb = 20\n")]
+    
+    new, applied = apply_hunks(content, hunks)
+    
+    assert new == "a = 10\nb = 20\n"
+    assert [hunk.start_line for hunk in applied] == [1, 1]
+
+
+def test_later_hunk_cannot_match_replaced_text():
+    with pytest.raises(PatchError, match="第 2 个"):
+        apply_hunks("a = 1\n", [EditHunk("a = 1\n", "a = 2\n"), EditHunk("a = 1\n", "a = 3\n")])
+
+
+def test_failed_hunk_leaves_input_untouched():
+    content = "x = 1\ny = 2\n"
+    with pytest.raises(PatchError):
+        apply_hunks(content, [EditHunk("x = 1\n", "x = 5\n"), EditHunk("missing\n", "")])
+    assert content == "x = 1\ny = 2\n"
+
+
+def test_start_lines_are_positions_in_result():
+    content = numbered(10)
+    hunks = [
+        EditHunk("line 2\n", "line 2\nextra a\nextra b\n"),
+        EditHunk("line 8\n", "LINE 8\n"),
+    ]
+    
+    new, applied = apply_hunks(content, hunks)
+    
+    lines = new.splitlines()
+    assert [(hunk.start_line, hunk.old_lines, hunk.new_lines) for hunk in applied] == [(2, 1, 3), (10, 1, 1)]
+    assert lines[applied[1].start_line - 1] == "LINE 8"
+
+
+def test_ambiguous_match_needs_line_hint():
+    content = "pass\nx = 1\npass\n"
+    with pytest.raises(PatchError, match="2 处匹配"):
+        apply_hunks(content, [EditHunk("pass\n", "return\n")])
+    
+    new, applied = apply_hunks(content, [EditHunk("pass\n", "return\n", line_hint=3)])
+    assert new == "pass\nx = 1\nreturn\n"
+    assert applied[0].start_line == 3
+
+
+def test_line_match_ignores_indentation_and_reindents_replacement():
+    content = "def f():\n    if x:\n        return 1\n"
+    hunk = EditHunk("if x:\n    return 1", "if x:\n    return 2")
+    
+    new, _ = apply_hunks(content, [hunk])
+    
+    assert new == "def f():\n    if x:\n        return 2\n"
+
+
+def test_empty_search_inserts_before_hint_or_appends():
+    new, applied = apply_hunks("a\nb", [EditHunk("", "start\n", line_hint=1), EditHunk("", "end\n")])
+    
+    assert new == "start\na\nb\nend\n"
+    assert [hunk.start_line for hunk in applied] == [1, 4]
+
+
+@pytest.mark.parametrize("old, new", [
+    (numbered(30), numbered(30).replace("line 3\n", "line three\n").replace("line 25\n", "")),
+    (numbered(20), "header\n" + numbered(20) + "footer\n"),
+    (numbered(12), numbered(12).replace("line 6\n", "line 6\nnew a\nnew b\n")),
+    # 相同的行出现多次，依靠新文件中的行号定位
+    ("x\n" * 10 + "y\n" + "x\n" * 10, "x\n" * 10 + "z\n" + "x\n" * 10),
+    ("", "created\n"),
+    (numbered(3), ""),
+])
+def test_unified_diff_round_trip(old, new):
+    hunks = parse_unified_diff(unified_diff(old, new))
+    
+    assert apply_hunks(old, hunks)[0] == new
+
+
+def test_hunk_hints_are_new_file_lines():
+    old = numbered(30)
+    new = "top\n" + old.replace("line 20\n", "line twenty\n")
+    
+    hunks = parse_unified_diff(unified_diff(old, new))
+    
+    assert [hunk.line_hint for hunk in hunks] == [1, 18]
+    _, applied = apply_hunks(old, hunks)
+    assert [hunk.start_line for hunk in applied] == [1, 18]
+
+
+def test_no_newline_marker_applies_to_previous_line():
+    diff = (
+        "--- a/f\n+++ b/f\n"
+        "@@ -1,2 +1,2 @@\n"
+        " a\n"
+        "-b\n"
+        "\\ No newline at end of file\n"
+        "+c\n"
+        "\\ No newline at end of file\n"
+    )
+    
+    hunks = parse_unified_diff(diff)
+    
+    assert hunks == [EditHunk("a\nb", "a\nc", 1)]
+    assert apply_hunks("a\nb", hunks)[0] == "a\nc"
+
+
+def test_invalid_diffs_are_rejected():
+    with pytest.raises(DiffFormatError):
+        parse_unified_diff("just some text\n")
+    with pytest.raises(DiffFormatError):
+        parse_unified_diff("@@ -1 +1 @@\n*oops\n")
@@ -0,0 +1,182 @@
+"""AI 路由：故障转移、对冲请求与熔断
+
+后端为真实的 OpenAIClient，上游由 httpx.MockTransport 按主机名模拟。
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.core.ai import transport
+from app.core.ai.base import AIErrorMessage
+from app.core.ai.openai import OpenAIClient
+from app.core.ai.router import RouterAIClient
+
+Behavior = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+def completion(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+def stream(*chunks: str) -> httpx.Response:
+    lines = [f"data: {json.dumps({'choices': [{'delta': {'content': chunk}}]})}\n\n" for chunk in chunks]
+    return httpx.Response(200, content="".join(lines) + "data: [DONE]\n\n")
+
+
+def ok(text: str, delay: float = 0.0) -> Behavior:
+    async def behavior(request):
+        await asyncio.sleep(delay)
+        if json.loads(request.content).get("stream"):
+            return stream(text)
+        return completion(text)
+    return behavior
+
+
+async def server_error(request):
+    return httpx.Response(500, json={"error": "boom"})
+
+
+class Upstream:
+    """按主机名分发的模拟上游，calls 记录每次请求的主机名"""
+    
+    def __init__(self):
+        self.behaviors: Dict[str, Behavior] = {}
+        self.calls: List[str] = []
+    
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls.append(request.url.host)
+        return await self.behaviors[request.url.host](request)
+
+
+@pytest.fixture
+async def upstream(monkeypatch):
+    upstream = Upstream()
+    await transport.close_http_client()
+    monkeypatch.setattr(transport, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(upstream)))
+    yield upstream
+    await transport.close_http_client()
+
+
+def backend(host: str, monkeypatch) -> OpenAIClient:
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    client = OpenAIClient()
+    client.base_url = f"http://{host}/v1"
+    return client
+
+
+@pytest.fixture
+def make_router(monkeypatch):
+    def make(**options) -> RouterAIClient:
+        options.setdefault("hedge", False)
+        return RouterAIClient({name: backend(name, monkeypatch) for name in ("a", "b")}, **options)
+    return make
+
+
+async def test_fails_over_to_next_backend(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": ok("from b")}
+    router = make_router()
+    
+    assert await router.chat("hi", []) == "from b"
+    assert upstream.calls == ["a", "b"]
+    assert router.stats["a"].consecutive_failures == 1
+    assert router.stats["b"].consecutive_failures == 0
+
+
+async def test_returns_last_error_when_all_backends_fail(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": server_error}
+    router = make_router()
+    
+    result = await router.chat("hi", [])
+    
+    assert isinstance(result, AIErrorMessage)
+    assert upstream.calls == ["a", "b"]
+
+
+async def test_circuit_opens_after_consecutive_failures(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": ok("from b")}
+    router = make_router(failure_threshold=2, cooldown=60)
+    
+    await router.chat("1", [])
+    assert router.stats["a"].state == "closed"
+    await router.chat("2", [])
+    assert router.stats["a"].state == "open"
+    
+    # 熔断的后端不再被调用
+    upstream.calls.clear()
+    assert await router.chat("3", []) == "from b"
+    assert upstream.calls == ["b"]
+    assert router.candidates() == ["b"]
+
+
+async def test_half_open_trial_closes_or_reopens_circuit(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": ok("from b")}
+    router = make_router(failure_threshold=1, cooldown=60)
+    await router.chat("1", [])
+    assert router.stats["a"].state == "open"
+    
+    # 冷却期结束：试探失败直接重新熔断
+    router.stats["a"].open_until = time.monotonic() - 1
+    assert router.stats["a"].state == "half_open"
+    upstream.calls.clear()
+    await router.chat("2", [])
+    assert upstream.calls[0] == "a"
+    assert router.stats["a"].state == "open"
+    
+    # 试探成功后恢复
+    router.stats["a"].open_until = time.monotonic() - 1
+    upstream.behaviors["a"] = ok("from a")
+    assert await router.chat("3", []) == "from a"
+    assert router.stats["a"].state == "closed"
+    assert router.stats["a"].consecutive_failures == 0
+
+
+async def test_all_open_backends_are_tried_by_earliest_recovery(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": server_error}
+    router = make_router(failure_threshold=1, cooldown=60)
+    await router.chat("1", [])
+    router.stats["b"].open_until = time.monotonic() + 1
+    
+    assert router.candidates() == ["b", "a"]
+
+
+async def test_hedges_slow_request_to_next_backend(upstream, make_router):
+    router = make_router(hedge=True, hedge_min_delay=0.05, min_samples=1)
+    # 没有样本的后端优先：两次调用分别为 a、b 取得样本，a 的延迟更低成为首选
+    upstream.behaviors = {"a": ok("from a"), "b": ok("from b", delay=0.02)}
+    assert await router.chat("1", []) == "from a"
+    assert await router.chat("2", []) == "from b"
+    assert router.candidates() == ["a", "b"]
+    
+    upstream.behaviors = {"a": ok("slow a", delay=2.0), "b": ok("from b")}
+    upstream.calls.clear()
+    start = time.perf_counter()
+    
+    assert await router.chat("3", []) == "from b"
+    assert time.perf_counter() - start < 1.0
+    assert upstream.calls == ["a", "b"]
+    # 落败被取消的请求不计入统计
+    assert len(router.stats["a"].outcomes) == 1
+
+
+async def test_does_not_hedge_when_disabled(upstream, make_router):
+    router = make_router(hedge=False, min_samples=1)
+    upstream.behaviors = {"a": ok("from a", delay=0.1), "b": ok("from b")}
+    
+    assert await router.chat("1", []) == "from a"
+    assert upstream.calls == ["a"]
+
+
+async def test_stream_fails_over_before_first_chunk(upstream, make_router):
+    upstream.behaviors = {"a": server_error, "b": ok("streamed")}
+    router = make_router()
+    
+    chunks = [chunk async for chunk in router.stream_chat("hi", [])]
+    
+    assert chunks == ["streamed"]
+    assert upstream.calls == ["a", "b"]
+    assert router.stats["a"].consecutive_failures == 1
@@ -0,0 +1,122 @@
+"""结构化输出：增量 JSON 解析与按字段重试"""
+import json
+
+import pytest
+
+from app.core.ai.structured import (
+    _MALFORMED,
+    IncrementalJSONParser,
+    ProjectPlan,
+    RequirementsAnalysis,
+    StructuredOutputError,
+    parse_structured,
+)
+
+DOCUMENT = {
+    "title": 'say "hi", {not a brace} [nor bracket] \\ done',
+    "count": 42,
+    "nested": {"a": [1, {"b": "}"}], "c": None},
+    "items": [[], {}, "x,y"],
+    "flag": True,
+}
+
+ANALYSIS = {
+    "tech_stack": {"frontend": "React", "backend": "FastAPI", "database": "SQLite", "styling": "CSS"},
+    "features": ["login"],
+    "complexity": "简单",
+    "estimated_time": "1 天",
+}
+
+
+def feed_all(parser: IncrementalJSONParser, chunks) -> list:
+    fields = []
+    for chunk in chunks:
+        fields.extend(parser.feed(chunk))
+    return fields
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_fields_match_json_loads_for_any_chunking(size):
+    text = json.dumps(DOCUMENT, ensure_ascii=False, indent=2)
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    
+    parser = IncrementalJSONParser()
+    
+    assert feed_all(parser, chunks) == list(DOCUMENT.items())
+    assert parser.done
+
+
+def test_field_is_returned_as_soon_as_it_ends():
+    parser = IncrementalJSONParser()
+    
+    assert parser.feed('{"a": 1') == []
+    # 数字可能还没结束，遇到逗号才返回
+    assert parser.feed('2, "b": "x') == [("a", 12)]
+    assert parser.feed('y"') == []
+    assert parser.feed('}') == [("b", "xy")]
+
+
+def test_text_around_object_is_ignored():
+    parser = IncrementalJSONParser()
+    
+    fields = feed_all(parser, ['Sure!\n```json\n{"a": ', '[1, 2]}', '\n```'])
+    
+    assert fields == [("a", [1, 2])]
+    assert parser.feed('{"b": 1}') == []
+
+
+def test_malformed_value_is_marked():
+    parser = IncrementalJSONParser()
+    
+    fields = parser.feed('{"a": nope, "b": 2}')
+    
+    assert fields == [("a", _MALFORMED), ("b", 2)]
+
+
+def test_empty_object_has_no_fields():
+    parser = IncrementalJSONParser()
+    
+    assert parser.feed("{}") == []
+    assert parser.done
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_parse_structured_retries_only_invalid_and_missing_fields():
+    broken = dict(ANALYSIS, complexity="unknown")
+    del broken["estimated_time"]
+    requested = []
+    
+    async def retry(names):
+        requested.append(sorted(names))
+        return json.dumps({name: ANALYSIS[name] for name in names}, ensure_ascii=False)
+    
+    text = json.dumps(broken, ensure_ascii=False)
+    result = await parse_structured(RequirementsAnalysis, stream(text[:20], text[20:]), retry)
+    
+    assert result.model_dump() == ANALYSIS
+    assert sorted(requested) == [["complexity"], ["estimated_time"]]
+
+
+async def test_parse_structured_validates_field_constraints():
+    async def retry(names):
+        return json.dumps({"files": []})
+    
+    with pytest.raises(StructuredOutputError, match="files"):
+        await parse_structured(ProjectPlan, stream('{"files": []}'), retry)
+
+
+async def test_parse_structured_without_retries_fails_fast():
+    async def retry(names):
+        raise AssertionError("should not retry")
+    
+    with pytest.raises(StructuredOutputError, match="estimated_time"):
+        await parse_structured(
+            RequirementsAnalysis,
+            stream(json.dumps({k: v for k, v in ANALYSIS.items() if k != "estimated_time"})),
+            retry,
+            max_retries=0,
+        )
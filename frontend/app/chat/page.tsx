@@ -1,6 +1,6 @@
 'use client'
 
-import { useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 import { ChatInterface } from '@/components/chat/ChatInterface'
 
 interface ChatMessage {
@@ -10,9 +10,73 @@ interface ChatMessage {
   timestamp: Date
 }
 
+const CHAT_WS_URL = 'ws://localhost:8000/api/v1/chat/ws'
+
 export default function ChatPage() {
   const [messages, setMessages] = useState<ChatMessage[]>([])
   const [loading, setLoading] = useState(false)
+  const socketRef = useRef<WebSocket | null>(null)
+  const readyRef = useRef<Promise<WebSocket> | null>(null)
+  const sessionIdRef = useRef<number | null>(null)
+
+  const updateMessage = (id: string, update: (content: string) => string) => {
+    setMessages(prev => prev.map(m => (m.id === id ? { ...m, content: update(m.content) } : m)))
+  }
+
+  // 建立连接并认证（只认证一次，之后每条消息只发送一帧）
+  const connect = () => {
+    if (readyRef.current && socketRef.current?.readyState === WebSocket.OPEN) {
+      return readyRef.current
+    }
+    readyRef.current = new Promise<WebSocket>((resolve, reject) => {
+      const socket = new WebSocket(CHAT_WS_URL)
+      socketRef.current = socket
+      socket.onopen = () => {
+        socket.send(JSON.stringify({ type: 'auth', token: localStorage.getItem('token') || '' }))
+      }
+      socket.onmessage = (event) => {
+        const frame = JSON.parse(event.data)
+        if (frame.type === 'ready') {
+          resolve(socket)
+        } else if (frame.type === 'ping') {
+          socket.send(JSON.stringify({ type: 'pong' }))
+        } else {
+          handleFrame(frame)
+        }
+      }
+      socket.onerror = () => reject(new Error('WebSocket error'))
+      socket.onclose = () => {
+        readyRef.current = null
+        reject(new Error('WebSocket closed'))
+        setLoading(false)
+      }
+    })
+    return readyRef.current
+  }
+
+  const handleFrame = (frame: any) => {
+    const id = frame.request_id
+    switch (frame.type) {
+      case 'session':
+        sessionIdRef.current = frame.session_id
+        break
+      case 'token':
+        updateMessage(id, content => content + frame.delta)
+        break
+      case 'error':
+        updateMessage(id, content => content || '抱歉，发生了错误，请稍后重试。')
+        setLoading(false)
+        break
+      case 'done':
+      case 'cancelled':
+        setLoading(false)
+        break
+    }
+  }
+
+  useEffect(() => {
+    return () => socketRef.current?.close()
+  }, [])
 
   const handleSendMessage = async (message: string) => {
     const userMessage: ChatMessage = {
@@ -21,51 +85,30 @@ export default function ChatPage() {
       content: message,
       timestamp: new Date()
     }
+    // 助手消息的 id 同时作为本轮的 request_id，token 帧逐段追加到该消息
+    const requestId = (Date.now() + 1).toString()
+    const assistantMessage: ChatMessage = {
+      id: requestId,
+      role: 'assistant',
+      content: '',
+      timestamp: new Date()
+    }
 
-    setMessages(prev => [...prev, userMessage])
+    setMessages(prev => [...prev, userMessage, assistantMessage])
     setLoading(true)
 
     try {
-      const response = await fetch('http://localhost:8000/api/v1/chat/chat', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          message: message,
-          session_id: null,
-          context: {}
-        })
-      })
-
-      if (response.ok) {
-        const data = await response.json()
-        const assistantMessage: ChatMessage = {
-          id: (Date.now() + 1).toString(),
-          role: 'assistant',
-          content: data.message?.content || '抱歉，我无法处理您的请求。',
-          timestamp: new Date()
-        }
-        setMessages(prev => [...prev, assistantMessage])
-      } else {
-        const errorMessage: ChatMessage = {
-          id: (Date.now() + 1).toString(),
-          role: 'assistant',
-          content: '抱歉，发生了错误，请稍后重试。',
-          timestamp: new Date()
-        }
-        setMessages(prev => [...prev, errorMessage])
-      }
+      const socket = await connect()
+      socket.send(JSON.stringify({
+        type: 'chat',
+        request_id: requestId,
+        message: message,
+        session_id: sessionIdRef.current,
+        context: {}
+      }))
     } catch (error) {
       console.error('聊天请求失败:', error)
-      const errorMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: '网络错误，请检查连接后重试。',
-        timestamp: new Date()
-      }
-      setMessages(prev => [...prev, errorMessage])
-    } finally {
+      updateMessage(requestId, () => '网络错误，请检查连接后重试。')
       setLoading(false)
     }
   }